@@ -0,0 +1,166 @@
+# actuator.py
+
+import threading
+import time
+from collections import deque
+
+from metrics import METRICS, STARTUP
+
+# ========================= BACKENDS ========================= #
+class PyAutoGuiBackend:
+    """Sends commands through pyautogui. Every call skips pyautogui's PAUSE sleep;
+    the actuator thread already decouples timing from the frame loop."""
+
+    def __init__(self):
+        import pyautogui
+        pyautogui.FAILSAFE = False
+        self.pyautogui = pyautogui
+
+    def move_to(self, x, y):
+        self.pyautogui.moveTo(x, y, duration=0, _pause=False)
+
+    def mouse_down(self, button):
+        self.pyautogui.mouseDown(button=button, _pause=False)
+
+    def mouse_up(self, button):
+        self.pyautogui.mouseUp(button=button, _pause=False)
+
+    def click(self, button):
+        self.pyautogui.click(button=button, _pause=False)
+
+    def double_click(self):
+        self.pyautogui.doubleClick(_pause=False)
+
+    def scroll(self, amount):
+        self.pyautogui.scroll(amount, _pause=False)
+
+    def hotkey(self, *keys):
+        self.pyautogui.hotkey(*keys, _pause=False)
+
+    def scroll_horizontal(self, amount):
+        # Shift+Ctrl+wheel scrolls horizontally in most Windows apps.
+        self.pyautogui.keyDown('shift', _pause=False)
+        self.pyautogui.keyDown('ctrl', _pause=False)
+        self.pyautogui.scroll(amount, _pause=False)
+        self.pyautogui.keyUp('ctrl', _pause=False)
+        self.pyautogui.keyUp('shift', _pause=False)
+
+class RecordingBackend:
+    """Records every command with its execution time instead of touching the real mouse."""
+
+    def __init__(self):
+        self.calls = []
+
+    def _record(self, name, *args):
+        self.calls.append((time.perf_counter(), name, args))
+
+    def move_to(self, x, y):
+        self._record("move_to", x, y)
+
+    def mouse_down(self, button):
+        self._record("mouse_down", button)
+
+    def mouse_up(self, button):
+        self._record("mouse_up", button)
+
+    def click(self, button):
+        self._record("click", button)
+
+    def double_click(self):
+        self._record("double_click")
+
+    def scroll(self, amount):
+        self._record("scroll", amount)
+
+    def scroll_horizontal(self, amount):
+        self._record("scroll_horizontal", amount)
+
+    def hotkey(self, *keys):
+        self._record("hotkey", *keys)
+
+# ========================= ACTUATOR ========================= #
+class Actuator(threading.Thread):
+    """Executes mouse commands on its own thread so a slow input backend never stalls frame processing.
+
+    Moves coalesce: a move queued behind another move replaces it, so only the
+    latest target is executed. Every other command (button transitions, clicks,
+    scrolls) is kept and executed in order; a pending move is executed before
+    a later click so the click lands where the hand was. Enqueue-to-execute
+    latency is recorded per command as "actuator.<command>"; when the producer
+    sets `origin` (the capture time of the frame being handled), the time from
+    capture to execution is recorded as "gesture.end_to_end".
+    """
+
+    def __init__(self, backend=None, metrics=METRICS):
+        super().__init__(name="actuator", daemon=True)
+        self.backend = backend or PyAutoGuiBackend()
+        self.metrics = metrics
+        self.origin = None
+        self.coalesced_moves = 0
+        self._commands = deque()
+        self._wakeup = threading.Condition()
+        self._stopping = False
+
+    def submit(self, name, *args):
+        with self._wakeup:
+            if name == "move_to" and self._commands and self._commands[-1][0] == "move_to":
+                # Keep the original enqueue time so latency reflects the oldest waiting move.
+                self._commands[-1] = (name, args) + self._commands[-1][2:]
+                self.coalesced_moves += 1
+            else:
+                self._commands.append((name, args, time.perf_counter(), self.origin))
+            self._wakeup.notify()
+
+    def move_to(self, x, y):
+        self.submit("move_to", x, y)
+
+    def mouse_down(self, button="left"):
+        self.submit("mouse_down", button)
+
+    def mouse_up(self, button="left"):
+        self.submit("mouse_up", button)
+
+    def click(self, button="left"):
+        self.submit("click", button)
+
+    def double_click(self):
+        self.submit("double_click")
+
+    def scroll(self, amount):
+        self.submit("scroll", amount)
+
+    def scroll_horizontal(self, amount):
+        self.submit("scroll_horizontal", amount)
+
+    def hotkey(self, *keys):
+        self.submit("hotkey", *keys)
+
+    def run(self):
+        while True:
+            with self._wakeup:
+                while not self._commands and not self._stopping:
+                    self._wakeup.wait()
+                if not self._commands:
+                    return
+                name, args, queued_at, origin = self._commands.popleft()
+            try:
+                getattr(self.backend, name)(*args)
+            except Exception as e:
+                print(f"[actuator] {name} failed: {e}")
+            done = self.metrics.since("actuator." + name, queued_at)
+            if origin is not None:
+                self.metrics.observe("gesture.end_to_end", done - origin)
+                STARTUP.mark("first gesture command")
+
+    def stop(self, timeout=1.0):
+        """Executes whatever is still queued, then ends the thread."""
+        with self._wakeup:
+            self._stopping = True
+            self._wakeup.notify()
+        if self.is_alive():
+            self.join(timeout)
+
+    def latency_stats(self):
+        """Returns {command: {"count", "p50_ms", "p95_ms", "p99_ms"}} over the recent history."""
+        latency = self.metrics.snapshot()["latency"]
+        return {stage.split(".", 1)[1]: stats for stage, stats in latency.items() if stage.startswith("actuator.")}
@@ -0,0 +1,251 @@
+# app_catalog.py
+
+import argparse
+import configparser
+import difflib
+import os
+import shlex
+import subprocess
+import time
+from collections import namedtuple
+
+from file_index import tokenize
+from settings import config_path, load_json, load_settings, save_json
+
+# ========================= SOURCES ========================= #
+# kind "shortcut": a .lnk/.exe (or any file on Windows) opened with os.startfile.
+# kind "desktop": a freedesktop .desktop entry; command is its Exec line.
+# kind "path": an executable found on $PATH.
+App = namedtuple("App", ["name", "target", "kind", "command"])
+
+KIND_PRIORITY = {"shortcut": 0, "desktop": 0, "path": 1}
+
+DEFAULT_APP_CATALOG_SETTINGS = {"extra_paths": [], "include_path": True, "min_ratio": 0.75}
+
+CACHE_VERSION = 1
+
+def _xdg_application_dirs():
+    data_home = os.environ.get("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share")
+    data_dirs = os.environ.get("XDG_DATA_DIRS") or "/usr/local/share:/usr/share"
+    return [os.path.join(d, "applications") for d in [data_home] + data_dirs.split(os.pathsep) if d]
+
+def default_sources(settings=None, home=None):
+    """Returns (directory, kind, recursive) for every place apps are collected from on this platform."""
+    settings = {**DEFAULT_APP_CATALOG_SETTINGS, **(settings or {})}
+    home = home or os.path.expanduser("~")
+    desktops = [os.path.join(home, "Desktop")]
+    sources = []
+    if os.name == "nt":
+        desktops.append(os.path.join(os.environ.get("PUBLIC", "C:\\Users\\Public"), "Desktop"))
+        start_menus = [os.path.join(os.environ.get(var, ""), "Microsoft", "Windows", "Start Menu", "Programs")
+                       for var in ("APPDATA", "PROGRAMDATA") if os.environ.get(var)]
+        sources += [(d, "shortcut", False) for d in desktops]
+        sources += [(d, "shortcut", True) for d in start_menus]
+    else:
+        sources += [(d, "desktop", False) for d in desktops]
+        sources += [(d, "desktop", True) for d in _xdg_application_dirs()]
+        if settings["include_path"]:
+            sources += [(d, "path", False) for d in os.environ.get("PATH", "").split(os.pathsep) if d]
+    sources += [(os.path.expanduser(d), "shortcut" if os.name == "nt" else "desktop", False)
+                for d in settings["extra_paths"]]
+    return sources
+
+def _read_desktop_entry(path):
+    """Returns (name, command) of a launchable .desktop entry, or None."""
+    parser = configparser.ConfigParser(interpolation=None, strict=False)
+    try:
+        parser.read(path, encoding="utf-8")
+        entry = parser["Desktop Entry"]
+    except (configparser.Error, KeyError, OSError, UnicodeDecodeError):
+        return None
+    if entry.get("Type", "Application") != "Application" or "Exec" not in entry or "Name" not in entry:
+        return None
+    if entry.get("NoDisplay", "false").lower() == "true" or entry.get("Hidden", "false").lower() == "true":
+        return None
+    return entry["Name"], entry["Exec"]
+
+def _scan_dir(path, kind):
+    """Lists the apps directly inside one directory. Returns (apps, subdirectories)."""
+    apps, subdirs = [], []
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                if entry.is_dir():
+                    subdirs.append(entry.path)
+                    continue
+                if not entry.is_file():
+                    continue
+            except OSError:
+                continue
+            stem, ext = os.path.splitext(entry.name)
+            ext = ext.lower()
+            if kind == "shortcut":
+                if ext in (".lnk", ".exe", ".url", ".appref-ms"):
+                    apps.append(App(stem, entry.path, kind, None))
+            elif ext == ".desktop":
+                parsed = _read_desktop_entry(entry.path)
+                if parsed:
+                    apps.append(App(parsed[0], entry.path, "desktop", parsed[1]))
+            elif kind == "path" and os.access(entry.path, os.X_OK):
+                apps.append(App(entry.name, entry.path, kind, None))
+    return apps, subdirs
+
+# ========================= MATCHING ========================= #
+_SOUNDEX = {c: d for d, letters in {"1": "bfpv", "2": "cgjkqsxz", "3": "dt", "4": "l", "5": "mn", "6": "r"}.items()
+            for c in letters}
+
+def soundex(word):
+    """Classic four-character Soundex code; words that sound alike ("crome", "chrome") share a code."""
+    word = "".join(c for c in word.lower() if c.isalpha())
+    if not word:
+        return word
+    code, last = word[0].upper(), _SOUNDEX.get(word[0])
+    for c in word[1:]:
+        digit = _SOUNDEX.get(c)
+        if digit and digit != last:
+            code += digit
+        if c not in "hw":
+            last = digit
+    return (code + "000")[:4]
+
+class _Candidate:
+    __slots__ = ("app", "joined", "keys", "joined_key")
+
+    def __init__(self, app):
+        tokens = tokenize(app.name)
+        self.app = app
+        self.joined = "".join(tokens)
+        self.keys = [soundex(t) for t in tokens]
+        self.joined_key = soundex(self.joined)
+
+def _contains_run(keys, run):
+    n = len(run)
+    return any(keys[i:i + n] == run for i in range(len(keys) - n + 1))
+
+class AppCatalog:
+    """Applications found at startup, matched in memory against spoken names.
+
+    Each source directory's apps are cached in ~/.gesture_mouse/app_catalog.json
+    together with the directory mtime; on later starts only directories whose
+    mtime changed (an app was installed or removed) are listed again.
+
+    Matching ignores spaces and punctuation and tolerates recognition errors.
+    From best to worst: the whole name, a name prefix, a substring (the
+    original rule), the same Soundex codes ("fire fox", "crome"), and finally a
+    difflib similarity of at least min_ratio.
+    """
+
+    def __init__(self, sources=None, cache_path=None, min_ratio=0.75):
+        self.sources = default_sources() if sources is None else sources
+        self.cache_path = cache_path or config_path("app_catalog.json")
+        self.min_ratio = min_ratio
+        self.apps = []
+        self._candidates = []
+
+    def load(self, rebuild=False):
+        started = time.perf_counter()
+        cache = {} if rebuild else load_json(self.cache_path, {})
+        cached = cache.get("dirs", {}) if isinstance(cache, dict) and cache.get("version") == CACHE_VERSION else {}
+        dirs, rescanned = {}, 0
+        for root, kind, recursive in self.sources:
+            stack = [root]
+            while stack:
+                path = stack.pop()
+                if path in dirs:
+                    continue
+                try:
+                    mtime = os.stat(path).st_mtime
+                except OSError:
+                    continue
+                entry = cached.get(path)
+                if entry is None or entry["mtime"] != mtime or entry["kind"] != kind:
+                    try:
+                        apps, subdirs = _scan_dir(path, kind)
+                    except OSError:
+                        continue
+                    entry = {"mtime": mtime, "kind": kind, "apps": [list(a) for a in apps], "subdirs": subdirs}
+                    rescanned += 1
+                dirs[path] = entry
+                if recursive:
+                    stack.extend(entry["subdirs"])
+        if rescanned or set(dirs) != set(cached):
+            try:
+                save_json(self.cache_path, {"version": CACHE_VERSION, "dirs": dirs})
+            except OSError as e:
+                print(f"[voice] Could not write app catalog cache: {e}")
+        # Like a shell, only the first $PATH entry of a name is reachable.
+        self.apps, on_path = [], set()
+        for app in (App(*a) for entry in dirs.values() for a in entry["apps"]):
+            if app.kind == "path":
+                if app.name in on_path:
+                    continue
+                on_path.add(app.name)
+            self.apps.append(app)
+        self._candidates = [_Candidate(app) for app in self.apps]
+        print(f"[voice] App catalog: {len(self.apps)} apps from {len(dirs)} folders "
+              f"({rescanned} rescanned) in {time.perf_counter() - started:.2f}s")
+        return self
+
+    def _score(self, joined, keys, candidate):
+        if joined == candidate.joined:
+            return 5.0
+        if candidate.joined.startswith(joined):
+            return 4.0 + len(joined) / len(candidate.joined)
+        if joined in candidate.joined:
+            return 3.0 + len(joined) / len(candidate.joined)
+        if soundex(joined) == candidate.joined_key or _contains_run(candidate.keys, keys):
+            return 2.0
+        matcher = difflib.SequenceMatcher(None, joined, candidate.joined)
+        if matcher.real_quick_ratio() < self.min_ratio or matcher.quick_ratio() < self.min_ratio:
+            return 0.0
+        ratio = matcher.ratio()
+        return ratio if ratio >= self.min_ratio else 0.0
+
+    def match(self, spoken, limit=1):
+        """Returns up to `limit` apps for a spoken name, best first."""
+        tokens = tokenize(spoken)
+        if not tokens:
+            return []
+        joined = "".join(tokens)
+        keys = [soundex(t) for t in tokens]
+        scored = []
+        for candidate in self._candidates:
+            score = self._score(joined, keys, candidate)
+            if score > 0.0:
+                app = candidate.app
+                scored.append((-score, KIND_PRIORITY[app.kind], len(app.name), app.name, app))
+        scored.sort(key=lambda row: row[:4])
+        return [row[-1] for row in scored[:limit]]
+
+def launch_app(app):
+    if app.kind == "shortcut":
+        os.startfile(app.target)
+        return
+    if app.kind == "desktop":
+        # Drop the field codes (%f, %U, ...) that stand for files passed by a file manager.
+        args = [a for a in shlex.split(app.command) if not (len(a) == 2 and a[0] == "%")]
+    else:
+        args = [app.target]
+    subprocess.Popen(args, start_new_session=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def load_catalog():
+    settings = load_settings("app_catalog", DEFAULT_APP_CATALOG_SETTINGS)
+    return AppCatalog(default_sources(settings), min_ratio=settings["min_ratio"]).load()
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the launcher catalog and match a spoken app name")
+    parser.add_argument("name", help="app name as it would be heard, e.g. 'fire fox'")
+    parser.add_argument("--rebuild", action="store_true", help="ignore the cached catalog and list every folder")
+    parser.add_argument("--limit", type=int, default=5, help="number of matches to show (default: %(default)s)")
+    args = parser.parse_args()
+
+    settings = load_settings("app_catalog", DEFAULT_APP_CATALOG_SETTINGS)
+    catalog = AppCatalog(default_sources(settings), min_ratio=settings["min_ratio"]).load(rebuild=args.rebuild)
+    started = time.perf_counter()
+    matches = catalog.match(args.name, args.limit)
+    print(f"{len(matches)} matches in {(time.perf_counter() - started) * 1000:.2f}ms")
+    for app in matches:
+        print(f"  {app.name:<30} {app.kind:<9} {app.target}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+# benchmark.py
+
+import argparse
+import json
+import os
+import platform
+import queue
+import threading
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from actuator import Actuator, RecordingBackend
+from cursor_filter import DEFAULT_CURSOR_SETTINGS, build_cursor_filter
+from gesture_engine import DISPLAY_MODES, Controller, GestureEngine
+from metrics import METRICS
+from system_control import FakeSystemControl, SystemControlWriter
+
+SCREEN = (1920, 1080)
+STAGES = ["gesture.capture", "gesture.queue_wait", "gesture.convert", "gesture.inference",
+          "gesture.classify", "gesture.actuate", "gesture.draw", "gesture.handoff"]
+THREADS = ["capture", "gesture", "actuator"]
+
+# ========================= SYNTHETIC CAMERA ========================= #
+def generate_frames(size, count=30, seed=0):
+    """Returns `count` deterministic BGR noise frames of size (width, height)."""
+    rng = np.random.default_rng(seed)
+    w, h = size
+    return [rng.integers(0, 256, (h, w, 3), dtype=np.uint8) for _ in range(count)]
+
+class SyntheticCapture:
+    """Drop-in for cv2.VideoCapture(0) that plays a video file or generated frames.
+
+    Frames are resized to `size` (width, height) and delivered at `fps`, or as
+    fast as they are read when fps is 0. A video loops when it reaches its end.
+    Like a camera, every read returns a fresh array.
+    """
+
+    def __init__(self, source=None, size=(640, 480), fps=0.0):
+        self.size = size
+        self.fps = fps
+        self.frames_read = 0
+        self._video = None
+        self._generated = None
+        if source:
+            self._video = cv2.VideoCapture(source)
+            if not self._video.isOpened():
+                raise ValueError(f"cannot open video {source!r}")
+        else:
+            self._generated = generate_frames(size)
+        self._props = {cv2.CAP_PROP_FRAME_WIDTH: size[0], cv2.CAP_PROP_FRAME_HEIGHT: size[1], cv2.CAP_PROP_FPS: fps}
+        self._next_at = None
+
+    def isOpened(self):
+        return True
+
+    def set(self, prop, value):
+        self._props[prop] = value
+        return True
+
+    def get(self, prop):
+        return float(self._props.get(prop, 0))
+
+    def _read_video(self):
+        ok, frame = self._video.read()
+        if not ok:
+            self._video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self._video.read()
+            if not ok:
+                raise RuntimeError("video has no readable frames")
+        if (frame.shape[1], frame.shape[0]) != self.size:
+            frame = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        return frame
+
+    def read(self, image=None):
+        if self.fps:
+            now = time.perf_counter()
+            if self._next_at is not None and now < self._next_at:
+                time.sleep(self._next_at - now)
+            # A late frame does not make the following ones come early.
+            self._next_at = max(self._next_at or now, now) + 1.0 / self.fps
+        if self._video is not None:
+            frame = self._read_video()
+        else:
+            frame = self._generated[self.frames_read % len(self._generated)]
+        self.frames_read += 1
+        if image is not None and image.shape == frame.shape:
+            np.copyto(image, frame)
+            return True, image
+        return True, frame.copy() if self._video is None else frame
+
+    def release(self):
+        if self._video is not None:
+            self._video.release()
+
+# ========================= ENGINE HARNESS ========================= #
+class _FrameProbe:
+    """Detector decorator counting frames with hands and, when tracemalloc is on,
+    sampling the transient memory each frame cycle allocates above the live baseline."""
+
+    def __init__(self, detector):
+        self.detector = detector
+        self.hand_frames = 0
+        self.transient = []
+
+    def reset(self):
+        self.hand_frames = 0
+        self.transient = []
+
+    def detect(self, rgb_image):
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            self.transient.append(peak - current)
+            tracemalloc.reset_peak()
+        landmarks, handedness = self.detector.detect(rgb_image)
+        if len(landmarks):
+            self.hand_frames += 1
+        return landmarks, handedness
+
+    def close(self):
+        self.detector.close()
+
+class BenchmarkEngine(GestureEngine):
+    def build_detector(self):
+        self.probe = _FrameProbe(super().build_detector())
+        return self.probe
+
+def _thread_cpu():
+    """CPU seconds consumed so far by each pipeline thread (POSIX only)."""
+    if not hasattr(time, "pthread_getcpuclockid"):
+        return {}
+    cpu = {}
+    for thread in threading.enumerate():
+        if thread.name in THREADS and thread.ident is not None:
+            try:
+                cpu[thread.name] = time.clock_gettime(time.pthread_getcpuclockid(thread.ident))
+            except OSError:
+                pass
+    return cpu
+
+def _wait_for(engine, thread, frames, timeout):
+    deadline = time.perf_counter() + timeout
+    while engine.frames_processed < frames:
+        if not thread.is_alive() or time.perf_counter() > deadline:
+            raise RuntimeError(f"engine processed only {engine.frames_processed} of {frames} frames")
+        # Stand in for the display loop so the preview queue keeps draining.
+        try:
+            engine.image_queue.get(timeout=0.01)
+        except queue.Empty:
+            pass
+
+def run_benchmark(source=None, size=(640, 480), max_num_hands=2, frames=300, warmup=30, fps=0.0,
+                  memory=False, timeout=300.0, **engine_options):
+    """Runs GestureEngine on a synthetic camera with a recording mouse backend and returns one result row."""
+    backend = RecordingBackend()
+    actuator = Actuator(backend)
+    actuator.start()
+    system = SystemControlWriter(FakeSystemControl())
+    system.start()
+    controller = Controller(cursor=build_cursor_filter(DEFAULT_CURSOR_SETTINGS, SCREEN),
+                            actuator=actuator, system=system)
+
+    camera = SyntheticCapture(source, size, fps)
+    stop_event = threading.Event()
+    engine = BenchmarkEngine(stop_event, queue.Queue(maxsize=1), camera=camera, controller=controller,
+                             hands_options={"max_num_hands": max_num_hands}, **engine_options)
+    thread = threading.Thread(target=engine.run, name="gesture", daemon=True)
+    if memory:
+        tracemalloc.start()
+    thread.start()
+    try:
+        _wait_for(engine, thread, warmup, timeout)
+        METRICS.reset()
+        engine.probe.reset()
+        commands = len(backend.calls)
+        processed, cpu_start, start = engine.frames_processed, _thread_cpu(), time.perf_counter()
+        _wait_for(engine, thread, warmup + frames, timeout)
+        processed = engine.frames_processed - processed
+        elapsed = time.perf_counter() - start
+        cpu_end = _thread_cpu()
+        traced = tracemalloc.get_traced_memory()[0] if memory else None
+    finally:
+        stop_event.set()
+        thread.join(timeout=10.0)
+        if memory:
+            tracemalloc.stop()
+
+    snapshot = METRICS.snapshot()
+    transient = engine.probe.transient
+    return {
+        "resolution": f"{size[0]}x{size[1]}",
+        "max_num_hands": max_num_hands,
+        "frames": processed,
+        "fps": processed / elapsed,
+        "hand_frames": engine.probe.hand_frames,
+        "dropped": snapshot["counters"].get("gesture.dropped", 0),
+        "commands": len(backend.calls) - commands,
+        "frame_allocations": snapshot["counters"].get("gesture.frame_allocations", 0),
+        "end_to_end": snapshot["latency"].get("gesture.end_to_end"),
+        "stages": {stage: snapshot["latency"][stage] for stage in STAGES if stage in snapshot["latency"]},
+        "cpu_ms_per_frame": {name: (cpu_end[name] - cpu_start[name]) * 1000.0 / processed
+                             for name in cpu_end if name in cpu_start},
+        "transient_kb_per_frame": float(np.mean(transient)) / 1024.0 if transient else None,
+        "traced_mb": traced / 2**20 if traced is not None else None,
+    }
+
+# ========================= REPORT ========================= #
+def machine_info():
+    return {"platform": platform.platform(), "processor": platform.processor(), "cpus": os.cpu_count(),
+            "python": platform.python_version(), "opencv": cv2.__version__, "numpy": np.__version__}
+
+def _fmt(value, spec):
+    return "-" if value is None else format(value, spec)
+
+def print_report(rows):
+    print(f"{'resolution':>10} {'hands':>5} {'fps':>7} {'e2e p50':>8} {'e2e p95':>8} {'infer p50':>9} "
+          f"{'cpu ms/frame (capture/gesture/actuator)':>40} {'KB/frame':>9} {'allocs':>6}")
+    for row in rows:
+        e2e = row["end_to_end"] or {}
+        infer = row["stages"].get("gesture.inference", {})
+        cpu = "/".join(_fmt(row["cpu_ms_per_frame"].get(name), ".2f") for name in THREADS)
+        print(f"{row['resolution']:>10} {row['max_num_hands']:>5} {row['fps']:>7.1f} "
+              f"{_fmt(e2e.get('p50_ms'), '.1f'):>6}ms {_fmt(e2e.get('p95_ms'), '.1f'):>6}ms "
+              f"{_fmt(infer.get('p50_ms'), '.1f'):>7}ms {cpu:>40} {_fmt(row['transient_kb_per_frame'], '.0f'):>9} "
+              f"{row['frame_allocations']:>6}")
+        if not row["hand_frames"]:
+            print(f"{'':>10} no hands detected; end-to-end latency needs a --video with hands in view")
+
+def _size(text):
+    w, h = text.lower().split("x")
+    return int(w), int(h)
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end GestureEngine benchmark on a synthetic camera")
+    parser.add_argument("--video", help="video file to play as the camera (default: generated noise frames)")
+    parser.add_argument("--resolutions", default="640x480,1280x720,1920x1080",
+                        help="comma-separated WIDTHxHEIGHT list (default: %(default)s)")
+    parser.add_argument("--max-hands", default="1,2", help="comma-separated max_num_hands values (default: %(default)s)")
+    parser.add_argument("--frames", type=int, default=300, help="measured frames per run (default: %(default)s)")
+    parser.add_argument("--warmup", type=int, default=30, help="frames processed before measuring (default: %(default)s)")
+    parser.add_argument("--fps", type=float, default=0.0,
+                        help="camera frame rate to simulate; 0 delivers frames as fast as they are read")
+    parser.add_argument("--memory", action="store_true",
+                        help="trace allocations to report memory per frame (slows the pipeline down)")
+    parser.add_argument("--roi-tracking", action="store_true", help="benchmark with --roi-tracking")
+    parser.add_argument("--skip-inference", action="store_true", help="benchmark with --skip-inference")
+    parser.add_argument("--display", choices=DISPLAY_MODES, default="full",
+                        help="preview rendering mode to benchmark (default: %(default)s)")
+    parser.add_argument("--json", metavar="PATH", help="also write machine info and all results to PATH")
+    args = parser.parse_args()
+
+    rows = []
+    for size in [_size(s) for s in args.resolutions.split(",")]:
+        for max_hands in [int(n) for n in args.max_hands.split(",")]:
+            print(f"[benchmark] {size[0]}x{size[1]}, max_num_hands={max_hands}")
+            rows.append(run_benchmark(args.video, size, max_hands, args.frames, args.warmup, args.fps, args.memory,
+                                      roi_tracking=args.roi_tracking, skip_inference=args.skip_inference,
+                                      display=args.display))
+    print_report(rows)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"machine": machine_info(), "video": args.video, "runs": rows}, f, indent=2)
+        print(f"[benchmark] Wrote {args.json}")
+
+if __name__ == "__main__":
+    main()
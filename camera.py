@@ -0,0 +1,178 @@
+# camera.py
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from settings import load_settings, save_settings
+
+# ========================= CAPTURE PROFILES ========================= #
+# A capture profile lives in the "camera" section of settings.json. Unset (None)
+# fields keep the driver default; buffer_size 1 keeps the driver queue shallow
+# because the capture thread drains it continuously anyway.
+DEFAULT_CAMERA_SETTINGS = {
+    "index": 0,
+    "backend": "any",
+    "width": None,
+    "height": None,
+    "fps": None,
+    "fourcc": None,
+    "buffer_size": 1,
+}
+
+CAPTURE_BACKENDS = {
+    "any": cv2.CAP_ANY,
+    "dshow": cv2.CAP_DSHOW,
+    "msmf": cv2.CAP_MSMF,
+    "v4l2": cv2.CAP_V4L2,
+    "avfoundation": cv2.CAP_AVFOUNDATION,
+    "gstreamer": cv2.CAP_GSTREAMER,
+}
+
+def _decode_fourcc(value):
+    value = int(value)
+    return "".join(chr((value >> (8 * i)) & 0xFF) for i in range(4)).strip("\0 ") or None
+
+def open_camera(settings=None):
+    """Opens a camera configured by a capture profile shaped like DEFAULT_CAMERA_SETTINGS."""
+    settings = {**DEFAULT_CAMERA_SETTINGS, **(settings or {})}
+    backend = settings["backend"]
+    if backend not in CAPTURE_BACKENDS:
+        raise ValueError(f"unknown capture backend {backend!r}, expected one of {sorted(CAPTURE_BACKENDS)}")
+    cap = cv2.VideoCapture(settings["index"], CAPTURE_BACKENDS[backend])
+    # Many drivers only honour the pixel format if it is set before the resolution.
+    if settings["fourcc"]:
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*settings["fourcc"]))
+    if settings["width"] and settings["height"]:
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, settings["width"])
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, settings["height"])
+    if settings["fps"]:
+        cap.set(cv2.CAP_PROP_FPS, settings["fps"])
+    if settings["buffer_size"]:
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, settings["buffer_size"])
+    return cap
+
+def negotiated_mode(cap):
+    """Returns the mode the driver actually granted, which may differ from the one requested."""
+    return {
+        "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        "fps": round(cap.get(cv2.CAP_PROP_FPS), 1),
+        "fourcc": _decode_fourcc(cap.get(cv2.CAP_PROP_FOURCC)),
+    }
+
+# ========================= AUTOTUNE ========================= #
+CANDIDATE_FOURCCS = ["MJPG", "YUYV"]
+CANDIDATE_SIZES = [(1920, 1080), (1280, 720), (960, 540), (640, 480)]
+CANDIDATE_FPS = [60, 30]
+
+def measure_mode(cap, detector, frames=60, warmup=10):
+    """Reads `frames` frames through the gesture pipeline's conversion and inference.
+
+    capture_fps: rate the camera delivers frames. read_ms: median time read()
+    blocks, the wait for a fresh frame. inference_fps: rate conversion plus
+    hand inference sustains. pipeline_fps: the lower of the two, which is what
+    the gesture loop can actually run at.
+    """
+    for _ in range(warmup):
+        cap.read()
+    reads, work = [], []
+    rgb = None
+    start = time.perf_counter()
+    for _ in range(frames):
+        t0 = time.perf_counter()
+        ok, image = cap.read()
+        t1 = time.perf_counter()
+        if not ok:
+            return None
+        if rgb is None or rgb.shape != image.shape:
+            rgb = np.empty_like(image)
+        cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=rgb)
+        detector.detect(rgb)
+        reads.append(t1 - t0)
+        work.append(time.perf_counter() - t1)
+    elapsed = time.perf_counter() - start
+    capture_fps = frames / max(elapsed - sum(work), 1e-6)
+    inference_fps = 1.0 / max(float(np.mean(work)), 1e-6)
+    return {
+        "capture_fps": round(capture_fps, 1),
+        "read_ms": round(float(np.median(reads)) * 1000.0, 2),
+        "inference_fps": round(inference_fps, 1),
+        "pipeline_fps": round(min(capture_fps, inference_fps), 1),
+    }
+
+def autotune(index=0, backend="any", min_width=640, frames=60, detector=None):
+    """Probes candidate modes and returns (best profile, [(profile, measurement), ...]).
+
+    Modes the driver substitutes with one already measured are skipped. The
+    best mode has the highest pipeline FPS; modes within 5% of it are treated
+    as equal and the one with the shortest read wait wins.
+    """
+    if detector is None:
+        from hand_inference import HandDetector
+        detector = HandDetector()
+    results, seen = [], set()
+    try:
+        for fourcc in CANDIDATE_FOURCCS:
+            for width, height in CANDIDATE_SIZES:
+                if width < min_width:
+                    continue
+                for fps in CANDIDATE_FPS:
+                    profile = {**DEFAULT_CAMERA_SETTINGS, "index": index, "backend": backend,
+                               "width": width, "height": height, "fps": fps, "fourcc": fourcc}
+                    cap = open_camera(profile)
+                    try:
+                        if not cap.isOpened():
+                            raise RuntimeError(f"could not open camera {index} with backend {backend!r}")
+                        mode = negotiated_mode(cap)
+                        key = tuple(sorted(mode.items()))
+                        if key in seen:
+                            continue
+                        seen.add(key)
+                        measurement = measure_mode(cap, detector, frames)
+                    finally:
+                        cap.release()
+                    if measurement is None:
+                        continue
+                    # Persist what the driver granted so the next start asks for exactly that.
+                    granted = {**profile, **{k: v for k, v in mode.items() if v}}
+                    print(f"[camera] {granted['fourcc']} {granted['width']}x{granted['height']}@{granted['fps']}: "
+                          f"pipeline {measurement['pipeline_fps']} fps, read {measurement['read_ms']} ms")
+                    results.append((granted, measurement))
+    finally:
+        detector.close()
+    if not results:
+        raise RuntimeError("no usable camera mode found")
+    top = max(m["pipeline_fps"] for _, m in results)
+    contenders = [r for r in results if r[1]["pipeline_fps"] >= 0.95 * top]
+    best = min(contenders, key=lambda r: r[1]["read_ms"])
+    return best[0], results
+
+def main():
+    parser = argparse.ArgumentParser(description="Show or autotune the camera capture profile")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("show", help="print the saved profile and the mode the driver grants for it")
+    tune = sub.add_parser("autotune", help="measure candidate modes and save the best one")
+    tune.add_argument("--index", type=int, default=0, help="camera index (default: 0)")
+    tune.add_argument("--backend", choices=sorted(CAPTURE_BACKENDS), default="any")
+    tune.add_argument("--min-width", type=int, default=640,
+                      help="skip modes narrower than this (default: %(default)s)")
+    tune.add_argument("--frames", type=int, default=60, help="frames measured per mode (default: %(default)s)")
+    args = parser.parse_args()
+
+    if args.command == "show":
+        profile = load_settings("camera", DEFAULT_CAMERA_SETTINGS)
+        cap = open_camera(profile)
+        print(f"[camera] profile:    {profile}")
+        print(f"[camera] negotiated: {negotiated_mode(cap)}")
+        cap.release()
+        return
+    best, _ = autotune(args.index, args.backend, args.min_width, args.frames)
+    save_settings("camera", best)
+    print(f"[camera] Saved {best['fourcc']} {best['width']}x{best['height']}@{best['fps']} "
+          f"as the capture profile in settings.json")
+
+if __name__ == "__main__":
+    main()
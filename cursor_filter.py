@@ -0,0 +1,222 @@
+# cursor_filter.py
+
+import argparse
+import math
+
+import numpy as np
+
+from landmark_trace import read_trace
+
+# ========================= SMOOTHING ========================= #
+def _smoothing_factor(cutoff, dt):
+    tau = 1.0 / (2 * math.pi * cutoff)
+    return 1.0 / (1.0 + tau / dt)
+
+class PassThroughFilter:
+    """No smoothing; velocity is the raw finite difference."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._point, self._t = None, None
+
+    def __call__(self, point, t):
+        velocity = (0.0, 0.0)
+        if self._point is not None and t > self._t:
+            dt = t - self._t
+            velocity = ((point[0] - self._point[0]) / dt, (point[1] - self._point[1]) / dt)
+        self._point, self._t = point, t
+        return point, velocity
+
+class OneEuroFilter:
+    """One Euro filter over 2D points (Casiez et al., CHI 2012).
+
+    The cutoff frequency rises with speed: a still hand is smoothed heavily,
+    which removes jitter, while a fast hand is barely filtered, which keeps lag
+    low. min_cutoff is in Hz, beta in Hz per px/s.
+    """
+
+    def __init__(self, min_cutoff=1.0, beta=0.01, d_cutoff=1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.reset()
+
+    def reset(self):
+        self._point, self._velocity, self._t = None, (0.0, 0.0), None
+
+    def __call__(self, point, t):
+        if self._point is None:
+            self._point, self._t = point, t
+            return self._point, self._velocity
+        if t <= self._t:
+            return self._point, self._velocity
+        dt = t - self._t
+        a_d = _smoothing_factor(self.d_cutoff, dt)
+        vx = self._velocity[0] + a_d * ((point[0] - self._point[0]) / dt - self._velocity[0])
+        vy = self._velocity[1] + a_d * ((point[1] - self._point[1]) / dt - self._velocity[1])
+        a = _smoothing_factor(self.min_cutoff + self.beta * math.hypot(vx, vy), dt)
+        self._point = (self._point[0] + a * (point[0] - self._point[0]),
+                       self._point[1] + a * (point[1] - self._point[1]))
+        self._velocity, self._t = (vx, vy), t
+        return self._point, self._velocity
+
+# ========================= ACCELERATION ========================= #
+class SteppedCurve:
+    """The original three-band ratio: dead below 5 px, 0.1 * distance up to 30 px, then 2.8."""
+
+    def gain(self, distance, dt):
+        if distance <= 5:
+            return 0.0
+        if distance <= 30:
+            return 0.1 * distance
+        return 2.8
+
+class AccelerationCurve:
+    """Velocity-adaptive gain: precise at low hand speed, fast at high speed.
+
+    The gain moves smoothly (smoothstep) from min_gain at low_speed to max_gain
+    at high_speed, both in screen px/s. Movements under deadzone px are ignored.
+    """
+
+    def __init__(self, min_gain=0.6, max_gain=2.8, low_speed=150.0, high_speed=1800.0, deadzone=0.5):
+        self.min_gain = min_gain
+        self.max_gain = max_gain
+        self.low_speed = low_speed
+        self.high_speed = high_speed
+        self.deadzone = deadzone
+
+    def gain(self, distance, dt):
+        if distance <= self.deadzone:
+            return 0.0
+        s = (distance / dt - self.low_speed) / (self.high_speed - self.low_speed)
+        s = min(1.0, max(0.0, s))
+        return self.min_gain + (self.max_gain - self.min_gain) * s * s * (3 - 2 * s)
+
+# ========================= CURSOR FILTER ========================= #
+class CursorFilter:
+    """Turns the tracked hand point into a cursor position.
+
+    Pipeline: hand point in screen px -> smoothing -> latency compensation
+    (the smoothed point is pushed prediction_lead seconds along its velocity)
+    -> relative motion scaled by the acceleration curve. The cursor position is
+    tracked internally; it is read from `position` (e.g. pyautogui.position)
+    only after reset(), i.e. when hand tracking restarts.
+    """
+
+    def __init__(self, screen_size, smoothing=None, acceleration=None, prediction_lead=0.0, position=None):
+        self.screen_size = screen_size
+        self.smoothing = smoothing or OneEuroFilter()
+        self.acceleration = acceleration or AccelerationCurve()
+        self.prediction_lead = prediction_lead
+        self.position = position
+        self.cursor = None
+        self._target, self._t = None, None
+
+    def reset(self):
+        self.smoothing.reset()
+        self.cursor = None
+        self._target, self._t = None, None
+
+    def update(self, hand_point, timestamp):
+        w, h = self.screen_size
+        point, velocity = self.smoothing((float(hand_point[0]) * w, float(hand_point[1]) * h), timestamp)
+        target = (point[0] + velocity[0] * self.prediction_lead, point[1] + velocity[1] * self.prediction_lead)
+        if self.cursor is None:
+            self.cursor = tuple(self.position()) if self.position else (w / 2, h / 2)
+        if self._target is None:
+            self._target, self._t = target, timestamp
+            return self.cursor
+        dx, dy = target[0] - self._target[0], target[1] - self._target[1]
+        gain = self.acceleration.gain(math.hypot(dx, dy), max(timestamp - self._t, 1e-3))
+        self._target, self._t = target, timestamp
+        x = min(max(self.cursor[0] + dx * gain, 0), w - 1)
+        y = min(max(self.cursor[1] + dy * gain, 0), h - 1)
+        self.cursor = (x, y)
+        return self.cursor
+
+SMOOTHING_FILTERS = {"one_euro": OneEuroFilter, "none": PassThroughFilter}
+ACCELERATION_CURVES = {"adaptive": AccelerationCurve, "stepped": SteppedCurve}
+
+DEFAULT_CURSOR_SETTINGS = {
+    "smoothing": {"type": "one_euro", "min_cutoff": 1.0, "beta": 0.01, "d_cutoff": 1.0},
+    "acceleration": {"type": "adaptive"},
+    "prediction_lead": 0.03,
+}
+
+def _build(registry, spec):
+    spec = dict(spec)
+    kind = spec.pop("type")
+    if kind not in registry:
+        raise ValueError(f"unknown cursor filter type {kind!r}, expected one of {sorted(registry)}")
+    return registry[kind](**spec)
+
+def build_cursor_filter(settings, screen_size, position=None):
+    """Builds a CursorFilter from a settings dict shaped like DEFAULT_CURSOR_SETTINGS."""
+    settings = {**DEFAULT_CURSOR_SETTINGS, **settings}
+    return CursorFilter(screen_size,
+                        smoothing=_build(SMOOTHING_FILTERS, settings["smoothing"]),
+                        acceleration=_build(ACCELERATION_CURVES, settings["acceleration"]),
+                        prediction_lead=settings["prediction_lead"],
+                        position=position)
+
+# ========================= REPORT ========================= #
+LEGACY_CURSOR_SETTINGS = {"smoothing": {"type": "none"}, "acceleration": {"type": "stepped"}, "prediction_lead": 0.0}
+
+def cursor_report(frames, settings, screen=(1920, 1080), still_speed=60.0, max_lag=10):
+    """Replays the first hand of each trace frame through a cursor filter.
+
+    jitter_px: mean cursor step on frames where the hand moves slower than
+    still_speed px/s. lag_ms: delay that best aligns cursor velocity with hand
+    velocity (cross-correlation over up to max_lag frames).
+    """
+    cursor_filter = build_cursor_filter(settings, screen)
+    hand, cursor, times = [], [], []
+    for frame in frames:
+        if not len(frame.landmarks):
+            cursor_filter.reset()
+            continue
+        point = frame.landmarks[0][9, :2]
+        cursor.append(cursor_filter.update(point, frame.timestamp))
+        hand.append((point[0] * screen[0], point[1] * screen[1]))
+        times.append(frame.timestamp)
+    if len(hand) < 3:
+        return {"jitter_px": 0.0, "lag_ms": 0.0}
+    hand, cursor, times = np.array(hand), np.array(cursor), np.array(times)
+    dt = np.maximum(np.diff(times), 1e-3)
+    hand_v = np.diff(hand, axis=0) / dt[:, None]
+    cursor_step = np.diff(cursor, axis=0)
+    still = np.hypot(*hand_v.T) < still_speed
+    jitter = float(np.hypot(*cursor_step[still].T).mean()) if still.any() else 0.0
+
+    hand_s = np.hypot(*hand_v.T)
+    cursor_s = np.hypot(*(cursor_step / dt[:, None]).T)
+    best_lag, best_corr = 0, -np.inf
+    for lag in range(0, min(max_lag, len(hand_s) - 2) + 1):
+        a, b = hand_s[:len(hand_s) - lag], cursor_s[lag:]
+        if a.std() == 0 or b.std() == 0:
+            continue
+        corr = np.corrcoef(a, b)[0, 1]
+        if corr > best_corr:
+            best_lag, best_corr = lag, corr
+    return {"jitter_px": jitter, "lag_ms": float(best_lag * np.median(dt) * 1000.0)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare cursor filters on a recorded landmark trace")
+    parser.add_argument("trace", help="landmark trace recorded with main.py --record")
+    args = parser.parse_args()
+
+    frames = read_trace(args.trace)
+    candidates = {
+        "legacy stepped": LEGACY_CURSOR_SETTINGS,
+        "one euro + adaptive": {**DEFAULT_CURSOR_SETTINGS, "prediction_lead": 0.0},
+        "one euro + adaptive + prediction": DEFAULT_CURSOR_SETTINGS,
+    }
+    print(f"{'filter':<34} {'jitter':>8} {'lag':>7}")
+    for name, settings in candidates.items():
+        row = cursor_report(frames, settings)
+        print(f"{name:<34} {row['jitter_px']:>6.2f}px {row['lag_ms']:>5.0f}ms")
+
+if __name__ == "__main__":
+    main()
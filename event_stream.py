@@ -0,0 +1,324 @@
+# event_stream.py
+
+import argparse
+import os
+import socket
+import socketserver
+import struct
+import threading
+import time
+from collections import deque, namedtuple
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from landmark_trace import HANDEDNESS_LABELS, NUM_LANDMARKS
+from metrics import METRICS
+
+# ========================= WIRE FORMAT ========================= #
+# A connection starts with a header (magic b"GLEV", version uint16), followed by
+# messages of type (uint8) | payload length (uint32) | payload, little-endian:
+#   HANDS    seq (uint32) | timestamp (float64) | hand count n (uint8)
+#            | n handedness bytes (0 = Left, 1 = Right) | n * 21 * 3 float32 landmarks
+#   GESTURE  seq (uint32) | timestamp (float64) | gesture id (int16, -1 = no hand): a Gest
+#            value, or the raw finger-state bitmask for poses Gest has no name for
+#   ACTION   timestamp (float64) | UTF-8 action label, as shown on the preview
+#   PREVIEW  seq (uint32) | timestamp (float64) | height, width, channels (uint16)
+#            | UTF-8 name of the shared-memory block holding the frame
+# HANDS is sent for every processed frame, hands or not, like a landmark trace
+# record; GESTURE and ACTION only when the gesture or the action changes.
+# Timestamps are capture times on the time.perf_counter() clock. Readers skip
+# message types they do not know, so new types can be added without a version bump.
+STREAM_MAGIC = b"GLEV"
+STREAM_VERSION = 1
+
+HANDS, GESTURE, ACTION, PREVIEW = 1, 2, 3, 4
+
+_HEADER = struct.Struct("<4sH")
+_MESSAGE = struct.Struct("<BI")
+_HANDS = struct.Struct("<IdB")
+_GESTURE = struct.Struct("<Idh")
+_ACTION = struct.Struct("<d")
+_PREVIEW = struct.Struct("<IdHHH")
+# The shared preview starts with the sequence number of the frame in it, 2 * seq
+# once written and 2 * seq - 1 while being written (a seqlock).
+_SHM_HEADER = struct.Struct("<Q")
+
+HandsEvent = namedtuple("HandsEvent", ["seq", "timestamp", "landmarks", "handedness"])
+GestureEvent = namedtuple("GestureEvent", ["seq", "timestamp", "gesture"])
+ActionEvent = namedtuple("ActionEvent", ["timestamp", "action"])
+PreviewEvent = namedtuple("PreviewEvent", ["seq", "timestamp", "shape", "name"])
+
+# ========================= PUBLISHER ========================= #
+class _Client:
+    """Messages waiting for one subscriber; the oldest are dropped when it falls behind."""
+
+    def __init__(self, max_queue):
+        self.messages = deque(maxlen=max_queue)
+        self.cond = threading.Condition()
+        self.closed = False
+
+    def put(self, message):
+        with self.cond:
+            if len(self.messages) == self.messages.maxlen:
+                METRICS.count("events.dropped")
+            self.messages.append(message)
+            self.cond.notify()
+
+    def take(self):
+        """Blocks until messages are queued; returns them all, or None once closed."""
+        with self.cond:
+            while not self.messages and not self.closed:
+                self.cond.wait()
+            if self.closed:
+                return None
+            messages = b"".join(self.messages)
+            self.messages.clear()
+            return messages
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+
+class _ClientHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        publisher = self.server.publisher
+        client = publisher._add_client()
+        try:
+            self.request.sendall(_HEADER.pack(STREAM_MAGIC, STREAM_VERSION))
+            while True:
+                messages = client.take()
+                if messages is None:
+                    return
+                self.request.sendall(messages)
+        except OSError:
+            pass
+        finally:
+            publisher._remove_client(client)
+
+class EventPublisher:
+    """Streams landmarks, gestures and actions to any number of local subscribers over a Unix socket.
+
+    Publishing only encodes a message and queues it per subscriber; a handler
+    thread per connection does the sending, so a slow or stuck subscriber
+    loses its oldest messages (counted as events.dropped) instead of stalling
+    the gesture loop. With no subscriber connected publishing costs nothing.
+
+    With preview=True the rendered preview is copied into a shared-memory
+    block and only its PREVIEW descriptor goes over the socket, so any number
+    of subscribers can show the frame without it being sent to each.
+    """
+
+    def __init__(self, socket_path, preview=False, max_queue=256):
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        self.socket_path = socket_path
+        self.preview = preview
+        self.max_queue = max_queue
+        self._server = socketserver.ThreadingUnixStreamServer(socket_path, _ClientHandler)
+        self._server.daemon_threads = True
+        self._server.publisher = self
+        self._clients = []
+        self._lock = threading.Lock()
+        self._shm = None
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, name="event-server", daemon=True).start()
+        print(f"[events] Publishing gesture events on {self.socket_path}")
+        return self
+
+    @property
+    def subscribers(self):
+        return len(self._clients)
+
+    def _add_client(self):
+        client = _Client(self.max_queue)
+        with self._lock:
+            self._clients = self._clients + [client]
+        return client
+
+    def _remove_client(self, client):
+        client.close()
+        with self._lock:
+            self._clients = [c for c in self._clients if c is not client]
+
+    def _send(self, kind, payload):
+        message = _MESSAGE.pack(kind, len(payload)) + payload
+        for client in self._clients:
+            client.put(message)
+
+    def publish_hands(self, seq, timestamp, landmarks, handedness):
+        if not self._clients:
+            return
+        landmarks = np.ascontiguousarray(landmarks, dtype=np.float32).reshape(-1, NUM_LANDMARKS, 3)
+        labels = bytes(HANDEDNESS_LABELS.index(label) for label in handedness)
+        self._send(HANDS, _HANDS.pack(seq, timestamp, len(labels)) + labels + landmarks.tobytes())
+
+    def publish_gesture(self, seq, timestamp, gesture):
+        if self._clients:
+            self._send(GESTURE, _GESTURE.pack(seq, timestamp, -1 if gesture is None else int(gesture)))
+
+    def publish_action(self, timestamp, action):
+        if self._clients:
+            self._send(ACTION, _ACTION.pack(timestamp) + action.encode("utf-8"))
+
+    def publish_preview(self, seq, timestamp, image):
+        if not self.preview or not self._clients:
+            return
+        size = _SHM_HEADER.size + image.nbytes
+        if self._shm is None or self._shm.size < size:
+            # Subscribers attach by the name in each descriptor, so a new block is picked up as it appears.
+            self._release_preview()
+            self._shm = shared_memory.SharedMemory(create=True, size=size)
+        _SHM_HEADER.pack_into(self._shm.buf, 0, 2 * seq - 1)
+        np.copyto(np.ndarray(image.shape, dtype=np.uint8, buffer=self._shm.buf, offset=_SHM_HEADER.size), image)
+        _SHM_HEADER.pack_into(self._shm.buf, 0, 2 * seq)
+        h, w = image.shape[:2]
+        channels = image.shape[2] if image.ndim == 3 else 1
+        self._send(PREVIEW, _PREVIEW.pack(seq, timestamp, h, w, channels) + self._shm.name.encode("utf-8"))
+
+    def _release_preview(self):
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def stop(self):
+        self._server.shutdown()
+        for client in self._clients:
+            client.close()
+        self._server.server_close()
+        self._release_preview()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+# ========================= SUBSCRIBER ========================= #
+def _read_exact(stream, n):
+    data = stream.read(n)
+    if len(data) < n:
+        raise EOFError
+    return data
+
+def _decode(kind, payload):
+    if kind == HANDS:
+        seq, timestamp, count = _HANDS.unpack_from(payload)
+        offset = _HANDS.size + count
+        handedness = tuple(HANDEDNESS_LABELS[b] for b in payload[_HANDS.size:offset])
+        landmarks = np.frombuffer(payload, dtype=np.float32, count=count * NUM_LANDMARKS * 3, offset=offset)
+        return HandsEvent(seq, timestamp, landmarks.reshape(count, NUM_LANDMARKS, 3), handedness)
+    if kind == GESTURE:
+        seq, timestamp, gesture = _GESTURE.unpack(payload)
+        return GestureEvent(seq, timestamp, None if gesture < 0 else gesture)
+    if kind == ACTION:
+        return ActionEvent(_ACTION.unpack_from(payload)[0], payload[_ACTION.size:].decode("utf-8"))
+    if kind == PREVIEW:
+        seq, timestamp, h, w, channels = _PREVIEW.unpack_from(payload)
+        shape = (h, w, channels) if channels > 1 else (h, w)
+        return PreviewEvent(seq, timestamp, shape, payload[_PREVIEW.size:].decode("utf-8"))
+    return None
+
+def subscribe(socket_path):
+    """Connects to an EventPublisher and yields its events until it goes away."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        stream = sock.makefile("rb")
+        try:
+            magic, version = _HEADER.unpack(_read_exact(stream, _HEADER.size))
+            if magic != STREAM_MAGIC:
+                raise ValueError(f"{socket_path} is not a gesture event stream")
+            if version != STREAM_VERSION:
+                raise ValueError(f"unsupported event stream version {version} on {socket_path}")
+            while True:
+                kind, length = _MESSAGE.unpack(_read_exact(stream, _MESSAGE.size))
+                event = _decode(kind, _read_exact(stream, length))
+                if event is not None:
+                    yield event
+        except EOFError:
+            return
+        finally:
+            stream.close()
+
+class PreviewReader:
+    """Copies preview frames out of the publisher's shared memory, given their PREVIEW events."""
+
+    def __init__(self):
+        self._shm = None
+
+    def _attach(self, name):
+        if self._shm is not None and self._shm.name == name:
+            return
+        self.close()
+        try:
+            self._shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # Before Python 3.13 attaching registers the block with this process's resource
+            # tracker, which would unlink it on exit while the publisher still uses it.
+            from multiprocessing import resource_tracker
+            self._shm = shared_memory.SharedMemory(name=name)
+            resource_tracker.unregister(self._shm._name, "shared_memory")
+
+    def read(self, event):
+        """Returns a copy of the event's frame, or None if a newer frame already replaced it."""
+        try:
+            self._attach(event.name)
+        except FileNotFoundError:
+            return None
+        buf = self._shm.buf
+        if _SHM_HEADER.unpack_from(buf, 0)[0] != 2 * event.seq:
+            return None
+        image = np.ndarray(event.shape, dtype=np.uint8, buffer=buf, offset=_SHM_HEADER.size).copy()
+        if _SHM_HEADER.unpack_from(buf, 0)[0] != 2 * event.seq:
+            return None
+        return image
+
+    def close(self):
+        if self._shm is not None:
+            self._shm.close()
+            self._shm = None
+
+def main():
+    parser = argparse.ArgumentParser(description="Print the events of a running gesture engine "
+                                                 "(started with --event-socket)")
+    parser.add_argument("socket", help="path of the event socket")
+    parser.add_argument("--hands", action="store_true", help="print every HANDS message, not just a rate")
+    parser.add_argument("--show", action="store_true", help="show the shared preview (needs --event-preview)")
+    args = parser.parse_args()
+
+    from gesture_engine import Gest
+
+    preview = PreviewReader() if args.show else None
+    frames, since = 0, time.perf_counter()
+    try:
+        for event in subscribe(args.socket):
+            if isinstance(event, HandsEvent):
+                frames += 1
+                if args.hands:
+                    print(f"hands   #{event.seq} {', '.join(event.handedness) or '-'}")
+                elif time.perf_counter() - since >= 5.0:
+                    print(f"hands   {frames / (time.perf_counter() - since):.1f} frames/s")
+                    frames, since = 0, time.perf_counter()
+            elif isinstance(event, GestureEvent):
+                try:
+                    name = "none" if event.gesture is None else Gest(event.gesture).name
+                except ValueError:
+                    # Finger states without a Gest name come through as their bitmask.
+                    name = f"fingers {event.gesture:05b}"
+                print(f"gesture #{event.seq} {name}")
+            elif isinstance(event, ActionEvent):
+                print(f"action  {event.action}")
+            elif isinstance(event, PreviewEvent) and preview is not None:
+                image = preview.read(event)
+                if image is not None:
+                    import cv2
+                    cv2.imshow(f"Preview ({args.socket})", image)
+                    cv2.waitKey(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if preview is not None:
+            preview.close()
+    print("[events] Publisher closed the stream.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+# file_index.py
+
+import argparse
+import bisect
+import math
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+
+# ========================= TOKENIZER ========================= #
+_CAMEL = re.compile(r"([a-z])([A-Z])")
+_WORD = re.compile(r"[a-z0-9]+")
+
+def tokenize(text):
+    """Lower-case alphanumeric words; camelCase and separators (space, _, -, .) split words."""
+    return _WORD.findall(_CAMEL.sub(r"\1 \2", text).lower())
+
+# ========================= INDEX ========================= #
+Entry = namedtuple("Entry", ["name", "is_dir", "mtime", "depth"])
+
+DEFAULT_EXCLUDES = {"node_modules", "__pycache__", "appdata", "$recycle.bin", "system volume information"}
+
+class FileIndex:
+    """In-memory index of the files and folders under a set of roots.
+
+    The initial scan runs on a background thread with os.scandir, which gets
+    the type of every entry without an extra stat. Names are split into tokens;
+    a token map and a sorted token list answer exact and prefix lookups without
+    touching the disk. Afterwards the index follows changes incrementally:
+    with the optional watchdog package through native filesystem events
+    (inotify, ReadDirectoryChangesW, FSEvents), otherwise by re-listing only the
+    directories whose mtime changed, every poll_interval seconds.
+    """
+
+    def __init__(self, roots, max_depth=8, poll_interval=30.0, excludes=DEFAULT_EXCLUDES):
+        self.roots = [os.path.abspath(r) for r in roots if os.path.isdir(r)]
+        self.max_depth = max_depth
+        self.poll_interval = poll_interval
+        self.excludes = {e.lower() for e in excludes}
+        self.ready = threading.Event()
+        self._entries = {}
+        self._tokens = {}
+        self._sorted_tokens = None
+        self._dirs = {}
+        self._opened = {}
+        self._lock = threading.RLock()
+        self._done = threading.Event()
+        self._observer = None
+        self._thread = None
+
+    # --- Building ---
+    def _skip(self, name):
+        return name.startswith(".") or name.lower() in self.excludes
+
+    def _add(self, path, name, is_dir, mtime, depth):
+        if path in self._entries:
+            self._remove_entry(path)
+        self._entries[path] = Entry(name, is_dir, mtime, depth)
+        for token in set(tokenize(name)):
+            paths = self._tokens.get(token)
+            if paths is None:
+                paths = self._tokens[token] = set()
+                self._sorted_tokens = None
+            paths.add(path)
+
+    def _remove_entry(self, path):
+        entry = self._entries.pop(path, None)
+        if entry is None:
+            return
+        for token in set(tokenize(entry.name)):
+            paths = self._tokens.get(token)
+            if paths is not None:
+                paths.discard(path)
+                if not paths:
+                    del self._tokens[token]
+                    self._sorted_tokens = None
+        if entry.is_dir:
+            self._dirs.pop(path, None)
+
+    def _remove_tree(self, path):
+        prefix = path + os.sep
+        for p in [p for p in self._entries if p == path or p.startswith(prefix)]:
+            self._remove_entry(p)
+        for d in [d for d in self._dirs if d == path or d.startswith(prefix)]:
+            del self._dirs[d]
+
+    def _scan_dir(self, path, depth):
+        """Indexes the entries of one directory. Returns its subdirectories as (path, depth)."""
+        subdirs = []
+        try:
+            self._dirs[path] = os.stat(path).st_mtime
+            with os.scandir(path) as it:
+                for entry in it:
+                    if self._skip(entry.name):
+                        continue
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                        mtime = entry.stat(follow_symlinks=False).st_mtime
+                    except OSError:
+                        continue
+                    with self._lock:
+                        self._add(entry.path, entry.name, is_dir, mtime, depth)
+                    if is_dir and depth < self.max_depth:
+                        subdirs.append((entry.path, depth + 1))
+        except OSError:
+            self._dirs.pop(path, None)
+        return subdirs
+
+    def _scan_tree(self, path, depth):
+        stack = [(path, depth)]
+        while stack and not self._done.is_set():
+            stack.extend(self._scan_dir(*stack.pop()))
+
+    def build(self):
+        started = time.perf_counter()
+        for root in self.roots:
+            self._scan_tree(root, 1)
+        self.ready.set()
+        print(f"[voice] Indexed {len(self._entries)} files and folders under {len(self.roots)} roots "
+              f"in {time.perf_counter() - started:.2f}s")
+
+    # --- Watching ---
+    def _rescan_changed(self):
+        for path, mtime in list(self._dirs.items()):
+            try:
+                current = os.stat(path).st_mtime
+            except OSError:
+                with self._lock:
+                    self._remove_tree(path)
+                continue
+            if current == mtime:
+                continue
+            depth = self._entries[path].depth if path in self._entries else 0
+            prefix = path + os.sep
+            with self._lock:
+                known = {p for p in self._entries if p.startswith(prefix) and os.sep not in p[len(prefix):]}
+            new_dirs = self._scan_dir(path, depth + 1)
+            try:
+                with os.scandir(path) as it:
+                    present = {e.path for e in it}
+            except OSError:
+                present = set()
+            with self._lock:
+                for gone in known - present:
+                    self._remove_tree(gone)
+            for subdir, subdepth in new_dirs:
+                if subdir not in self._dirs:
+                    self._scan_tree(subdir, subdepth)
+
+    def _start_observer(self):
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            return False
+        index = self
+
+        class Handler(FileSystemEventHandler):
+            def on_created(self, event):
+                index._path_changed(event.src_path)
+
+            def on_deleted(self, event):
+                with index._lock:
+                    index._remove_tree(event.src_path)
+
+            def on_moved(self, event):
+                with index._lock:
+                    index._remove_tree(event.src_path)
+                index._path_changed(event.dest_path)
+
+        self._observer = Observer()
+        for root in self.roots:
+            self._observer.schedule(Handler(), root, recursive=True)
+        self._observer.start()
+        return True
+
+    def _path_changed(self, path):
+        name = os.path.basename(path)
+        parent = os.path.dirname(path)
+        if self._skip(name) or (parent not in self._dirs):
+            return
+        depth = self._entries[parent].depth + 1 if parent in self._entries else 1
+        try:
+            st = os.stat(path, follow_symlinks=False)
+        except OSError:
+            return
+        is_dir = os.path.isdir(path) and not os.path.islink(path)
+        with self._lock:
+            self._add(path, name, is_dir, st.st_mtime, depth)
+        if is_dir and depth < self.max_depth:
+            self._scan_tree(path, depth + 1)
+
+    def _run(self):
+        self.build()
+        if self._start_observer():
+            return
+        while not self._done.wait(self.poll_interval):
+            self._rescan_changed()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="file-index", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._done.set()
+        if self._observer is not None:
+            self._observer.stop()
+
+    # --- Lookup ---
+    def touch(self, path):
+        """Marks an entry as just opened, which ranks it higher for a while."""
+        self._opened[path] = time.time()
+
+    def _matches(self, word):
+        if self._sorted_tokens is None:
+            self._sorted_tokens = sorted(self._tokens)
+        matches = dict.fromkeys(self._tokens.get(word, ()), 2.0)
+        i = bisect.bisect_right(self._sorted_tokens, word)
+        while i < len(self._sorted_tokens) and self._sorted_tokens[i].startswith(word):
+            for path in self._tokens[self._sorted_tokens[i]]:
+                matches.setdefault(path, 1.0)
+            i += 1
+        return matches
+
+    def search(self, query, kind=None, near=None, limit=5):
+        """Returns up to `limit` paths ranked by match quality, proximity and recency.
+
+        kind is "file", "dir" or None for both. Every query word must be a whole
+        name token (best), a token prefix, or failing both, a substring of the
+        name. Entries in or under `near` (e.g. the current folder) and recently
+        modified or opened entries rank higher.
+        """
+        words = tokenize(query)
+        if not words:
+            return []
+        with self._lock:
+            scores = None
+            for word in words:
+                matches = self._matches(word)
+                scores = matches if scores is None else {p: s + matches[p] for p, s in scores.items() if p in matches}
+                if not scores:
+                    break
+            if not scores:
+                scores = {p: 0.5 * len(words) for p, e in self._entries.items()
+                          if all(w in e.name.lower() for w in words)}
+            candidates = [(p, s, self._entries[p]) for p, s in scores.items()]
+        if kind is not None:
+            candidates = [c for c in candidates if c[2].is_dir == (kind == "dir")]
+        now = time.time()
+        joined = "".join(words)
+        near = os.path.abspath(near) + os.sep if near else None
+        ranked = []
+        for path, score, entry in candidates:
+            if "".join(tokenize(os.path.splitext(entry.name)[0] if not entry.is_dir else entry.name)) == joined:
+                score += 1.5
+            if near and path.startswith(near):
+                score += 1.5 if os.path.dirname(path) + os.sep == near else 1.0
+            score += 0.5 * math.exp(-(now - entry.mtime) / (30 * 86400))
+            opened = self._opened.get(path)
+            if opened is not None:
+                score += math.exp(-(now - opened) / 86400)
+            score -= 0.05 * entry.depth
+            ranked.append((-score, len(entry.name), path))
+        ranked.sort()
+        return [path for _, _, path in ranked[:limit]]
+
+    def __len__(self):
+        return len(self._entries)
+
+# Voice lookups index the "roots" in the "file_index" section of settings.json, or
+# the usual user folders when it is unset.
+DEFAULT_FILE_INDEX_SETTINGS = {"roots": None, "max_depth": 8, "poll_interval": 30.0}
+
+def default_roots(home=None):
+    home = home or os.path.expanduser("~")
+    roots = [os.path.join(home, d) for d in ("Desktop", "Documents", "Downloads", "Pictures", "Music", "Videos")]
+    roots.append(os.path.join(os.environ.get("PUBLIC", "C:\\Users\\Public"), "Desktop"))
+    return [r for r in roots if os.path.isdir(r)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the voice file index and run a lookup")
+    parser.add_argument("query", help="words as they would be spoken, e.g. 'annual report'")
+    parser.add_argument("--root", action="append", help="directory to index (default: the usual user folders)")
+    parser.add_argument("--kind", choices=["file", "dir"], help="only files or only folders")
+    args = parser.parse_args()
+
+    index = FileIndex(args.root or default_roots())
+    index.build()
+    started = time.perf_counter()
+    results = index.search(args.query, kind=args.kind, limit=10)
+    print(f"{len(results)} matches in {(time.perf_counter() - started) * 1000:.2f}ms")
+    for path in results:
+        print(f"  {path}")
+
+if __name__ == "__main__":
+    main()
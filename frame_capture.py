@@ -0,0 +1,135 @@
+# frame_capture.py
+
+import threading
+import time
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+from metrics import METRICS
+
+CapturedFrame = namedtuple("CapturedFrame", ["seq", "timestamp", "image"])
+
+# ========================= BUFFER POOL ========================= #
+class BufferPool:
+    """Named image buffers reused from frame to frame.
+
+    get() returns the same array for a name for as long as the requested shape
+    and dtype match, so a pipeline running at a fixed resolution only allocates
+    on its first frame. Allocations are counted in `allocations` and in the
+    "gesture.frame_allocations" metric, which stays flat in steady state.
+    """
+
+    def __init__(self):
+        self._buffers = {}
+        self.allocations = 0
+
+    def get(self, name, shape, dtype=np.uint8):
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.shape != shape or buffer.dtype != dtype:
+            buffer = self.put(name, np.empty(shape, dtype))
+        return buffer
+
+    def peek(self, name):
+        return self._buffers.get(name)
+
+    def put(self, name, buffer):
+        """Adopts an array allocated elsewhere (e.g. by the camera driver) under `name`."""
+        self._buffers[name] = buffer
+        self.allocations += 1
+        METRICS.count("gesture.frame_allocations")
+        return buffer
+
+# ========================= LATEST FRAME SLOT ========================= #
+class LatestFrameSlot:
+    """Single-producer mailbox that only ever holds the newest frame.
+
+    The producer publishes by rebinding one attribute (atomic under the GIL), so
+    neither side takes a lock on the frame path. Consumers pass the sequence
+    number they last saw and get the newest frame after it; anything published
+    in between was overwritten and counts as dropped.
+    """
+
+    def __init__(self):
+        self._latest = None
+        self._ready = threading.Event()
+        self.seq = 0
+        # The image the consumer last took; the producer must not write into it.
+        self.in_use = None
+
+    def put(self, image, timestamp):
+        self.seq += 1
+        self._latest = CapturedFrame(self.seq, timestamp, image)
+        self._ready.set()
+
+    def _take(self, last_seq):
+        frame = self._latest
+        if frame is None or frame.seq <= last_seq:
+            return None
+        self.in_use = frame.image
+        return frame
+
+    def get(self, last_seq=0, timeout=None):
+        frame = self._take(last_seq)
+        if frame is not None:
+            return frame
+        self._ready.clear()
+        # Re-check after clearing so a put() racing with clear() is not missed.
+        frame = self._take(last_seq)
+        if frame is not None:
+            return frame
+        if not self._ready.wait(timeout):
+            return None
+        return self._take(last_seq)
+
+    def published(self):
+        frame = self._latest
+        return frame.image if frame is not None else None
+
+
+# ========================= CAPTURE THREAD ========================= #
+class CaptureThread(threading.Thread):
+    """Reads the camera as fast as it delivers and publishes into a LatestFrameSlot.
+
+    Frames are read into a ring of preallocated buffers sized to the negotiated
+    capture resolution: one being filled, one published and one being processed,
+    so the driver writes in place and steady-state capture allocates nothing.
+    Setting min_interval throttles reads (e.g. while the engine is idle).
+    """
+
+    def __init__(self, cap, stop_event, slot=None, pool=None, buffers=3):
+        super().__init__(name="capture", daemon=True)
+        self.cap = cap
+        self.stop_event = stop_event
+        self.slot = slot or LatestFrameSlot()
+        self.pool = pool or BufferPool()
+        self.names = [f"capture{i}" for i in range(buffers)]
+        self.min_interval = 0.0
+        w, h = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        if w > 0 and h > 0:
+            for name in self.names:
+                self.pool.get(name, (h, w, 3))
+
+    def _next_buffer(self):
+        busy = (self.slot.published(), self.slot.in_use)
+        for name in self.names:
+            buffer = self.pool.peek(name)
+            if buffer is None or not any(buffer is b for b in busy):
+                return name, buffer
+        raise RuntimeError("every capture buffer is in use")
+
+    def run(self):
+        while not self.stop_event.is_set():
+            name, buffer = self._next_buffer()
+            started = time.perf_counter()
+            success, image = self.cap.read(buffer) if buffer is not None else self.cap.read()
+            if not success:
+                print("[gesture] Ignoring empty camera frame.")
+                continue
+            if image is not buffer:
+                # The driver delivered a different size than negotiated; keep its array instead.
+                self.pool.put(name, image)
+            self.slot.put(image, METRICS.since("gesture.capture", started))
+            if self.min_interval:
+                self.stop_event.wait(max(0.0, self.min_interval - (time.perf_counter() - started)))
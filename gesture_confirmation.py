@@ -0,0 +1,188 @@
+# gesture_confirmation.py
+
+import argparse
+import math
+
+import numpy as np
+
+from landmark_trace import NUM_LANDMARKS, read_trace
+
+# ========================= LANDMARK HISTORY ========================= #
+class LandmarkHistory:
+    """Fixed-size ring buffer of one hand's recent landmarks and their timestamps.
+
+    Storage is preallocated; push() copies into the next slot, so keeping the
+    history costs no allocation per frame.
+    """
+
+    def __init__(self, capacity=8):
+        self.capacity = capacity
+        self.landmarks = np.zeros((capacity, NUM_LANDMARKS, 3), dtype=np.float32)
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.count = 0
+        self._next = 0
+
+    def clear(self):
+        self.count = 0
+        self._next = 0
+
+    def push(self, landmarks, timestamp):
+        self.landmarks[self._next] = landmarks
+        self.timestamps[self._next] = timestamp
+        self._next = (self._next + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def __len__(self):
+        return self.count
+
+    def get(self, age):
+        """Returns (landmarks, timestamp) from `age` frames ago (0 is the newest)."""
+        if age >= self.count:
+            raise IndexError("landmark history index out of range")
+        i = (self._next - 1 - age) % self.capacity
+        return self.landmarks[i], self.timestamps[i]
+
+    def speed(self, point=9):
+        """Speed of one landmark over the last two frames, in frame widths per second."""
+        if self.count < 2:
+            return 0.0
+        (new, t1), (old, t0) = self.get(0), self.get(1)
+        if t1 <= t0:
+            return 0.0
+        return math.hypot(new[point, 0] - old[point, 0], new[point, 1] - old[point, 1]) / (t1 - t0)
+
+# ========================= CONFIRMATION ========================= #
+# A confirmer turns the per-frame raw gesture into the gesture the controller
+# acts on. update() gets the raw gesture, its margin (how far, relative to
+# each threshold, the deciding measurements were from flipping the decision;
+# 0 is right on a threshold) and the hand speed, and returns the confirmed
+# gesture.
+class FrameDebounce:
+    """The original rule: a gesture is confirmed once it was raw for more than `frames` consecutive frames
+    after its first one, regardless of how clear it was."""
+
+    def __init__(self, frames=2, initial=None):
+        self.frames = frames
+        self.confirmed = initial
+        self._previous = initial
+        self._count = 0
+
+    def update(self, gesture, margin, speed=0.0):
+        self._count = self._count + 1 if gesture == self._previous else 0
+        self._previous = gesture
+        if self._count > self.frames:
+            self.confirmed = gesture
+        return self.confirmed
+
+class MarginConfirmer:
+    """Confirms clear gestures immediately and debounces borderline ones.
+
+    Each frame of the same raw gesture adds evidence min(1, margin / strong_margin),
+    but at least min_step; the gesture is confirmed once the evidence reaches 1.
+    A gesture whose margin is at least strong_margin fires on its first frame,
+    while one that sits on a threshold needs 1 / min_step frames (4 by default,
+    as long as the original debounce). Switching raw gestures restarts the
+    evidence, which gives the confirmed gesture temporal hysteresis. Above
+    fast_speed (frame widths per second) motion blur makes margins unreliable,
+    so only min_step counts.
+    """
+
+    def __init__(self, strong_margin=0.8, min_step=0.25, fast_speed=1.5, initial=None):
+        self.strong_margin = strong_margin
+        self.min_step = min_step
+        self.fast_speed = fast_speed
+        self.confirmed = initial
+        self._candidate = initial
+        self._evidence = 0.0
+
+    def update(self, gesture, margin, speed=0.0):
+        if speed > self.fast_speed:
+            step = self.min_step
+        else:
+            step = max(self.min_step, min(1.0, margin / self.strong_margin))
+        if gesture == self._candidate:
+            self._evidence += step
+        else:
+            self._candidate, self._evidence = gesture, step
+        if self._evidence >= 1.0 - 1e-9:
+            self.confirmed = gesture
+        return self.confirmed
+
+CONFIRMERS = {"frames": FrameDebounce, "margin": MarginConfirmer}
+
+DEFAULT_CONFIRMATION_SETTINGS = {"type": "margin", "strong_margin": 0.8, "min_step": 0.25, "fast_speed": 1.5}
+
+def build_confirmer(settings, initial=None):
+    """Builds a confirmer from a settings dict shaped like DEFAULT_CONFIRMATION_SETTINGS."""
+    spec = dict(settings)
+    kind = spec.pop("type")
+    if kind not in CONFIRMERS:
+        raise ValueError(f"unknown confirmation type {kind!r}, expected one of {sorted(CONFIRMERS)}")
+    if kind != "margin":
+        spec = {k: v for k, v in spec.items() if k == "frames"}
+    return CONFIRMERS[kind](initial=initial, **spec)
+
+# ========================= REPORT ========================= #
+def confirmation_stats(samples, confirmer, targets, min_run=3):
+    """Replays (timestamp, raw gesture, margin, speed) samples through a confirmer.
+
+    Every change of the confirmed gesture is a trigger. Its latency runs from the
+    first frame of the raw run that caused it to the frame it was confirmed on.
+    A trigger counts as false when that raw run lasted fewer than min_run frames,
+    i.e. a flicker no hand actually held. Latencies are reported for triggers
+    into `targets` (e.g. the click gestures).
+    """
+    triggers, false_triggers, latencies = 0, 0, []
+    confirmed = confirmer.confirmed
+    pending = None
+    run_start, run_gesture, run_length = 0, None, 0
+    for i, (timestamp, gesture, margin, speed) in enumerate(samples):
+        if gesture != run_gesture:
+            if pending is not None and run_length < min_run:
+                false_triggers += 1
+            pending = None
+            run_start, run_gesture, run_length = i, gesture, 0
+        run_length += 1
+        result = confirmer.update(gesture, margin, speed)
+        if result != confirmed:
+            confirmed = result
+            triggers += 1
+            pending = i
+            if result in targets:
+                latencies.append((i - run_start, timestamp - samples[run_start][0]))
+    if pending is not None and run_length < min_run:
+        false_triggers += 1
+    return {
+        "triggers": triggers,
+        "false_triggers": false_triggers,
+        "false_rate": false_triggers / triggers if triggers else 0.0,
+        "clicks": len(latencies),
+        "click_frames": float(np.mean([f for f, _ in latencies])) if latencies else 0.0,
+        "click_ms": float(np.mean([s for _, s in latencies])) * 1000.0 if latencies else 0.0,
+    }
+
+def main():
+    from gesture_engine import CLICK_GESTURES, trace_gesture_samples
+
+    parser = argparse.ArgumentParser(description="Compare gesture confirmation rules on a recorded landmark trace")
+    parser.add_argument("trace", help="landmark trace recorded with main.py --record")
+    parser.add_argument("--min-run", type=int, default=3,
+                        help="raw runs shorter than this many frames count as false triggers")
+    parser.add_argument("--strong-margin", type=float, default=DEFAULT_CONFIRMATION_SETTINGS["strong_margin"],
+                        help="margin at which the margin rule confirms on the first frame")
+    parser.add_argument("--min-step", type=float, default=DEFAULT_CONFIRMATION_SETTINGS["min_step"],
+                        help="evidence a borderline frame adds under the margin rule")
+    args = parser.parse_args()
+
+    samples = trace_gesture_samples(read_trace(args.trace))
+    print(f"{len(samples)} major-hand frames from {args.trace}")
+    print(f"{'rule':<8} {'triggers':>8} {'false':>6} {'rate':>6} {'clicks':>6} {'latency':>14}")
+    candidates = {"frames": FrameDebounce(),
+                  "margin": MarginConfirmer(strong_margin=args.strong_margin, min_step=args.min_step)}
+    for name, confirmer in candidates.items():
+        row = confirmation_stats(samples, confirmer, CLICK_GESTURES, args.min_run)
+        print(f"{name:<8} {row['triggers']:>8} {row['false_triggers']:>6} {row['false_rate']:>6.1%} "
+              f"{row['clicks']:>6} {row['click_frames']:>4.1f}fr {row['click_ms']:>5.0f}ms")
+
+if __name__ == "__main__":
+    main()
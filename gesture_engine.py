@@ -1,21 +1,24 @@
 # gesture_engine.py
 
 import cv2
-import mediapipe as mp
-import pyautogui
-import math
+import numpy as np
 import queue
 import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from enum import IntEnum
-from ctypes import cast, POINTER
-from comtypes import CLSCTX_ALL
-from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume
-from google.protobuf.json_format import MessageToDict
-import screen_brightness_control as sbcontrol
-
-pyautogui.FAILSAFE = False
-mp_drawing = mp.solutions.drawing_utils
-mp_hands = mp.solutions.hands
+from actuator import Actuator
+from camera import DEFAULT_CAMERA_SETTINGS, negotiated_mode, open_camera
+from cursor_filter import DEFAULT_CURSOR_SETTINGS, build_cursor_filter
+from frame_capture import BufferPool, CaptureThread
+from gesture_confirmation import DEFAULT_CONFIRMATION_SETTINGS, LandmarkHistory, build_confirmer
+from hand_inference import (HandDetector, ProcessHandDetector, RoiHandDetector, SkippingHandDetector,
+                            draw_landmarks, mirror_hands)
+from idle_gate import IdleGate
+from landmark_trace import TraceWriter, landmarks_to_array, read_trace
+from metrics import METRICS, STARTUP, draw_overlay
+from settings import load_json, load_settings
+from system_control import SystemControlWriter
 
 # ========================= ENUMS ========================= #
 class Gest(IntEnum):
@@ -39,312 +42,729 @@ class HLabel(IntEnum):
     MINOR = 0
     MAJOR = 1
 
+# ========================= LANDMARK MATH ========================= #
+# All helpers take landmarks shaped (..., 21, 3), so the same code classifies a
+# single hand (21, 3) or a batch of N frames (N, 21, 3) in one vectorized pass.
+# Every distance the classifier needs is gathered as one (from, to) pair table:
+#   0-3  finger tip -> MCP      4-7  finger MCP -> wrist
+#   8    index tip -> thumb tip 9    index tip -> middle tip
+#   10   index MCP -> middle MCP 11  thumb tip -> pinky MCP
+_PAIR_FROM = np.array([8, 12, 16, 20, 5, 9, 13, 17, 8, 8, 5, 4])
+_PAIR_TO = np.array([5, 9, 13, 17, 0, 0, 0, 0, 4, 12, 9, 17])
+_FINGER_BITS = np.array([8, 4, 2, 1], dtype=np.int32)
+
+PINCH_DIST = 0.05
+V_GEST_RATIO = 1.7
+CLOSED_DZ = 0.1
+VOL_BRIGHT_DIST = 0.05
+
+def hand_to_array(hand_result):
+    """Returns hand landmarks as a (21, 3) float32 array (accepts MediaPipe lists or arrays)."""
+    if hand_result is None or isinstance(hand_result, np.ndarray):
+        return hand_result
+    return np.array([(lm.x, lm.y, lm.z) for lm in hand_result.landmark], dtype=np.float32)
+
+def _pair_distances(landmarks):
+    src = landmarks[..., _PAIR_FROM, :]
+    dst = landmarks[..., _PAIR_TO, :]
+    delta = src[..., :2] - dst[..., :2]
+    dist = np.sqrt(np.einsum('...i,...i->...', delta, delta))
+    signed = np.where(src[..., :8, 1] < dst[..., :8, 1], dist[..., :8], -dist[..., :8])
+    return dist, signed
+
+def _finger_ratios(signed):
+    mcp_to_wrist = np.where(signed[..., 4:] == 0, 0.01, signed[..., 4:])
+    return signed[..., :4] / mcp_to_wrist
+
+def _finger_states(signed):
+    extended = np.round(_finger_ratios(signed), 1) > 0.5
+    return extended.astype(np.int32) @ _FINGER_BITS
+
+def _raw_gestures(landmarks, dist, fingers, hand_label):
+    tips_ratio = dist[..., 9] / np.where(dist[..., 10] != 0, dist[..., 10], 1)
+    tips_ratio = np.where(dist[..., 10] != 0, tips_ratio, 10)
+    tips_dz = np.abs(landmarks[..., 8, 2] - landmarks[..., 12, 2])
+
+    pinch = ((fingers == Gest.LAST3) | (fingers == Gest.LAST4)) & (dist[..., 8] < PINCH_DIST)
+    first2 = fingers == Gest.FIRST2
+    vol_bright = (fingers == 0b1110) & (dist[..., 11] < VOL_BRIGHT_DIST)
+    pinch_gesture = Gest.PINCH_MINOR if hand_label == HLabel.MINOR else Gest.PINCH_MAJOR
+    return np.select(
+        [pinch, first2 & (tips_ratio > V_GEST_RATIO), first2 & (tips_dz < CLOSED_DZ), first2, vol_bright],
+        [pinch_gesture, Gest.V_GEST, Gest.TWO_FINGER_CLOSED, Gest.MID, Gest.VOLUME_BRIGHTNESS],
+        default=fingers,
+    )
+
+def _raw_gesture(landmarks, dist, finger, hand_label):
+    # Scalar twin of _raw_gestures for the per-frame path, where np.select costs
+    # more than the decision itself. Both must agree (see classify_batch).
+    if finger in (Gest.LAST3, Gest.LAST4) and dist[8] < PINCH_DIST:
+        return Gest.PINCH_MINOR if hand_label == HLabel.MINOR else Gest.PINCH_MAJOR
+    if finger == Gest.FIRST2:
+        ratio = dist[9] / dist[10] if dist[10] != 0 else 10
+        if ratio > V_GEST_RATIO:
+            return Gest.V_GEST
+        if abs(landmarks[8, 2] - landmarks[12, 2]) < CLOSED_DZ:
+            return Gest.TWO_FINGER_CLOSED
+        return Gest.MID
+    if finger == 0b1110 and dist[11] < VOL_BRIGHT_DIST:
+        return Gest.VOLUME_BRIGHTNESS
+    return finger
+
+# A ratio rounds above 0.5 (extended) from 0.55 up.
+_FINGER_THRESHOLD = 0.55
+
+def _margin(value, threshold):
+    return abs(value - threshold) / threshold
+
+def _gesture_margin(landmarks, dist, finger, finger_margin):
+    # Follows the decision path of _raw_gesture: the margin is the smallest relative
+    # distance to any threshold the decision consulted, finger states included.
+    margin = finger_margin
+    if finger in (Gest.LAST3, Gest.LAST4):
+        margin = min(margin, _margin(dist[8], PINCH_DIST))
+    elif finger == Gest.FIRST2:
+        ratio = dist[9] / dist[10] if dist[10] != 0 else 10
+        margin = min(margin, _margin(ratio, V_GEST_RATIO))
+        if ratio <= V_GEST_RATIO:
+            margin = min(margin, _margin(abs(landmarks[8, 2] - landmarks[12, 2]), CLOSED_DZ))
+    elif finger == 0b1110:
+        margin = min(margin, _margin(dist[11], VOL_BRIGHT_DIST))
+    return margin
+
+def finger_states(landmarks):
+    """Finger bitmask (index=8, middle=4, ring=2, pinky=1) for each hand in the batch."""
+    return _finger_states(_pair_distances(landmarks)[1])
+
+def classify_batch(landmarks, hand_label):
+    """Classifies N frames of one hand at once. Returns (finger bitmasks, raw gestures)."""
+    landmarks = np.asarray(landmarks, dtype=np.float32)
+    dist, signed = _pair_distances(landmarks)
+    fingers = _finger_states(signed)
+    return fingers, _raw_gestures(landmarks, dist, fingers, hand_label)
+
 # ========================= HAND RECOGNITION ========================= #
 class HandRecog:
-    def __init__(self, hand_label):
+    def __init__(self, hand_label, confirmer=None):
         self.finger = 0
         self.ori_gesture = Gest.PALM
-        self.prev_gesture = Gest.PALM
-        self.frame_count = 0
+        self.raw_gesture = Gest.PALM
+        self.margin = 0.0
         self.hand_result = None
         self.hand_label = hand_label
+        self.history = LandmarkHistory()
+        # Decides when a raw gesture becomes ori_gesture; see gesture_confirmation.py.
+        if confirmer is None:
+            confirmer = build_confirmer(load_settings("confirmation", DEFAULT_CONFIRMATION_SETTINGS), Gest.PALM)
+        self.confirmer = confirmer
+        self._dist = None
+        self._finger_margin = 0.0
 
-    def update_hand_result(self, hand_result):
-        self.hand_result = hand_result
-
-    def get_signed_dist(self, point):
-        sign = -1
-        if self.hand_result.landmark[point[0]].y < self.hand_result.landmark[point[1]].y:
-            sign = 1
-        dist = (self.hand_result.landmark[point[0]].x - self.hand_result.landmark[point[1]].x) ** 2
-        dist += (self.hand_result.landmark[point[0]].y - self.hand_result.landmark[point[1]].y) ** 2
-        dist = math.sqrt(dist)
-        return dist * sign
-
-    def get_dist(self, point):
-        dist = (self.hand_result.landmark[point[0]].x - self.hand_result.landmark[point[1]].x) ** 2
-        dist += (self.hand_result.landmark[point[0]].y - self.hand_result.landmark[point[1]].y) ** 2
-        dist = math.sqrt(dist)
-        return dist
-
-    def get_dz(self, point):
-        return abs(self.hand_result.landmark[point[0]].z - self.hand_result.landmark[point[1]].z)
+    def update_hand_result(self, hand_result, timestamp=None):
+        self.hand_result = hand_to_array(hand_result)
+        self._dist = None
+        if self.hand_result is None:
+            self.history.clear()
+        else:
+            self.history.push(self.hand_result, time.perf_counter() if timestamp is None else timestamp)
 
     def set_finger_state(self):
         if self.hand_result is None:
             return
-        points = [[8, 5, 0], [12, 9, 0], [16, 13, 0], [20, 17, 0]]
-        self.finger = 0
-        self.finger = self.finger | 0
-        for idx, point in enumerate(points):
-            dist = self.get_signed_dist(point[:2])
-            dist2 = self.get_signed_dist(point[1:])
-            try:
-                ratio = round(dist / dist2, 1)
-            except Exception:
-                ratio = round(dist / 0.01, 1)
-            self.finger = self.finger << 1
-            if ratio > 0.5:
-                self.finger = self.finger | 1
+        dist, signed = _pair_distances(self.hand_result)
+        self._dist = dist.tolist()
+        ratios = _finger_ratios(signed)
+        self.finger = int(_finger_states(signed))
+        self._finger_margin = float(np.abs(ratios - _FINGER_THRESHOLD).min()) / _FINGER_THRESHOLD
 
     def get_gesture(self):
         if self.hand_result is None:
             return Gest.PALM
-        current_gesture = Gest.PALM
-        if self.finger in [Gest.LAST3, Gest.LAST4] and self.get_dist([8, 4]) < 0.05:
-            if self.hand_label == HLabel.MINOR:
-                current_gesture = Gest.PINCH_MINOR
-            else:
-                current_gesture = Gest.PINCH_MAJOR
-        elif Gest.FIRST2 == self.finger:
-            point = [[8, 12], [5, 9]]
-            dist1 = self.get_dist(point[0])
-            dist2 = self.get_dist(point[1])
-            ratio = dist1 / dist2 if dist2 != 0 else 10
-            if ratio > 1.7:
-                current_gesture = Gest.V_GEST
-            else:
-                if self.get_dz([8, 12]) < 0.1:
-                    current_gesture = Gest.TWO_FINGER_CLOSED
-                else:
-                    current_gesture = Gest.MID
-        elif (self.finger & 0b1110) == 0b1110 and not (self.finger & 0b0001) and self.get_dist([4, 17]) < 0.05:
-            current_gesture = Gest.VOLUME_BRIGHTNESS
-        else:
-            current_gesture = self.finger
-
-        if current_gesture == self.prev_gesture:
-            self.frame_count += 1
-        else:
-            self.frame_count = 0
-        self.prev_gesture = current_gesture
-        if self.frame_count > 2:
-            self.ori_gesture = current_gesture
+        if self._dist is None:
+            self.set_finger_state()
+        current_gesture = _raw_gesture(self.hand_result, self._dist, self.finger, self.hand_label)
+        self.raw_gesture = current_gesture
+        self.margin = _gesture_margin(self.hand_result, self._dist, self.finger, self._finger_margin)
+        self.ori_gesture = self.confirmer.update(current_gesture, self.margin, self.history.speed())
         return self.ori_gesture
 
+CLICK_GESTURES = (Gest.MID, Gest.INDEX, Gest.TWO_FINGER_CLOSED)
+
+class _RawGestures:
+    """Confirmer stand-in that confirms every raw gesture, for offline analysis."""
+
+    def __init__(self):
+        self.confirmed = Gest.PALM
+
+    def update(self, gesture, margin, speed=0.0):
+        self.confirmed = gesture
+        return gesture
+
+def trace_gesture_samples(frames, dom_hand=True):
+    """Classifies the major hand of each trace frame. Returns [(timestamp, raw gesture, margin, speed)]."""
+    hand = HandRecog(HLabel.MAJOR, confirmer=_RawGestures())
+    major_label = "Right" if dom_hand else "Left"
+    samples = []
+    for frame in frames:
+        major = next((h for h, label in zip(frame.landmarks, frame.handedness) if label == major_label), None)
+        hand.update_hand_result(major, frame.timestamp)
+        if major is None:
+            continue
+        hand.set_finger_state()
+        hand.get_gesture()
+        samples.append((frame.timestamp, hand.raw_gesture, hand.margin, hand.history.speed()))
+    return samples
+
 # ========================= CONTROLLER ========================= #
+# Every gesture is bound to an action, and every action is an (enter, hold, exit)
+# triple of Controller method names ("" for nothing): enter runs on the first frame
+# of the gesture, hold on each of its frames (the first included) and exit on the
+# first frame of a different gesture. "hotkey:ctrl+c" style actions press a key
+# combination on enter.
+ACTIONS = {
+    "none": ("", "", ""),
+    "move": ("", "_move", ""),
+    "drag": ("_drag_start", "_drag", "_drag_end"),
+    "left_click": ("_left_click", "", ""),
+    "right_click": ("_right_click", "", ""),
+    "middle_click": ("_middle_click", "", ""),
+    "double_click": ("_double_click", "", ""),
+    "scroll": ("_pinch_start", "_scroll", ""),
+    "system_level": ("_system_start", "_system_level", ""),
+}
+HOTKEY_PREFIX = "hotkey:"
+
+DEFAULT_BINDINGS = {
+    "V_GEST": "move",
+    "FIST": "drag",
+    "MID": "left_click",
+    "INDEX": "right_click",
+    "TWO_FINGER_CLOSED": "double_click",
+    "PINCH_MINOR": "scroll",
+    "PINCH_MAJOR": "system_level",
+    "VOLUME_BRIGHTNESS": "system_level",
+}
+
+# Raw gestures are Gest members or any other finger bitmask.
+GESTURE_IDS = sorted(set(range(16)) | {int(g) for g in Gest})
+
+def _gesture_id(name):
+    if name in Gest.__members__:
+        return int(Gest[name])
+    if str(name).isdigit() and int(name) in GESTURE_IDS:
+        return int(name)
+    raise ValueError(f"unknown gesture {name!r}, expected one of {list(Gest.__members__)} or a finger bitmask 0-15")
+
+def validate_bindings(bindings):
+    """Returns {gesture id: action} for a {gesture name: action} mapping, rejecting unknown names."""
+    resolved = {}
+    for name, action in bindings.items():
+        if action not in ACTIONS and not (isinstance(action, str) and action.startswith(HOTKEY_PREFIX)):
+            raise ValueError(f"unknown action {action!r} for {name}, expected one of {sorted(ACTIONS)} "
+                             f"or '{HOTKEY_PREFIX}<key>+<key>'")
+        resolved[_gesture_id(name)] = action
+    return resolved
+
+def load_bindings(path=None):
+    """DEFAULT_BINDINGS, overlaid with the "bindings" settings section and then with a JSON file, if given."""
+    bindings = load_settings("bindings", DEFAULT_BINDINGS)
+    if path:
+        extra = load_json(path)
+        if not isinstance(extra, dict):
+            raise ValueError(f"{path}: expected a JSON object mapping gesture names to actions")
+        bindings.update(extra)
+    return bindings
+
 class Controller:
-    tx_old, ty_old = 0, 0
-    flag, grabflag, pinchmajorflag, pinchminorflag, volbrightflag = False, False, False, False, False
-    pinchstartxcoord, pinchstartycoord, pinchdirectionflag = None, None, None
-    prevpinchlv, pinchlv, framecount = 0, 0, 0
-    prev_hand = None
+    """Turns confirmed gestures into mouse and system actions.
+
+    All state lives on the instance, so every hand pipeline (camera) can own a
+    controller. Dispatch goes through a table, built once from the bindings,
+    that maps (previous gesture, gesture) to the handlers to run, so handling a
+    frame is one lookup.
+    """
+
+    __slots__ = ("bindings", "cursor", "actuator", "system", "current_action", "armed", "previous",
+                 "pinchstartxcoord", "pinchstartycoord", "pinchdirectionflag", "prevpinchlv", "pinchlv",
+                 "framecount", "_table")
+
+    SCROLL_SPEED = 120
     pinch_threshold = 0.3
-    startbrightness, startvolume = 0, 0.0
-    current_action = ""
 
-    def getpinchylv(hand_result):
-        return round((Controller.pinchstartycoord - hand_result.landmark[8].y) * 10, 1)
+    def __init__(self, bindings=None, cursor=None, actuator=None, system=None):
+        self.bindings = validate_bindings(DEFAULT_BINDINGS if bindings is None else bindings)
+        self.cursor = cursor
+        self.actuator = actuator
+        self.system = system
+        self.current_action = ""
+        # Set by the move action; a click only fires once per move.
+        self.armed = False
+        self.previous = None
+        self.pinchstartxcoord, self.pinchstartycoord, self.pinchdirectionflag = None, None, None
+        self.prevpinchlv, self.pinchlv, self.framecount = 0, 0, 0
+        self._table = self._build_table()
 
-    def getpinchxlv(hand_result):
-        return round((hand_result.landmark[8].x - Controller.pinchstartxcoord) * 10, 1)
+    def _handlers(self, action):
+        if action.startswith(HOTKEY_PREFIX):
+            keys = tuple(action[len(HOTKEY_PREFIX):].split("+"))
+            return (lambda hand_result, position: self._hotkey(keys),), (), ()
+        return tuple((getattr(self, name),) if name else () for name in ACTIONS[action])
 
-    def changesystembrightness():
-        change = Controller.pinchlv * 10
-        new = Controller.startbrightness + change
-        new = max(0, min(100, new))
-        try:
-            sbcontrol.set_brightness(int(new))
-        except Exception as e:
-            print(f"[brightness] error: {e}")
+    def _build_table(self):
+        actions = {gesture: self._handlers(self.bindings.get(gesture, "none")) for gesture in GESTURE_IDS}
+        table = {}
+        for gesture in GESTURE_IDS:
+            enter, hold, _ = actions[gesture]
+            # The cursor filter follows the hand for every gesture but an open palm.
+            track = gesture != Gest.PALM
+            table[None, gesture] = (track, enter + hold)
+            for previous in GESTURE_IDS:
+                if previous == gesture:
+                    table[previous, gesture] = (track, hold)
+                else:
+                    table[previous, gesture] = (track, actions[previous][2] + enter + hold)
+        return table
 
-    def changesystemvolume():
-        try:
-            devices = AudioUtilities.GetSpeakers()
-            interface = devices.Activate(IAudioEndpointVolume._iid_, CLSCTX_ALL, None)
-            volume = cast(interface, POINTER(IAudioEndpointVolume))
-            change = Controller.pinchlv / 10.0
-            new = Controller.startvolume + change
-            new = max(0.0, min(1.0, new))
-            volume.SetMasterVolumeLevelScalar(new, None)
-        except Exception as e:
-            print(f"[volume] error: {e}")
+    def handle_controls(self, gesture, hand_result, timestamp=None):
+        track, handlers = self._table[self.previous, gesture]
+        position = self.get_position(hand_result, timestamp) if track else None
+        self.current_action = ""
+        for handler in handlers:
+            handler(hand_result, position)
+        self.previous = gesture
 
-    SCROLL_SPEED = 120
+    # --- Output ---
+    def get_actuator(self):
+        if self.actuator is None:
+            self.actuator = Actuator()
+            self.actuator.start()
+        return self.actuator
+
+    def get_system(self):
+        if self.system is None:
+            self.system = SystemControlWriter()
+            self.system.start()
+        return self.system
 
-    def scrollVertical():
-        pyautogui.scroll(Controller.SCROLL_SPEED if Controller.pinchlv > 0.0 else -Controller.SCROLL_SPEED)
+    def stop(self):
+        """Flushes and stops the actuator and system-control threads."""
+        if self.actuator is not None:
+            self.actuator.stop()
+            for name, stats in self.actuator.latency_stats().items():
+                print(f"[gesture] {name}: {stats['count']} commands, p50 {stats['p50_ms']:.1f}ms, "
+                      f"p95 {stats['p95_ms']:.1f}ms, p99 {stats['p99_ms']:.1f}ms")
+            print(f"[gesture] {self.actuator.coalesced_moves} moves coalesced into later targets")
+            self.actuator = None
+        if self.system is not None:
+            self.system.stop()
+            self.system = None
 
-    def scrollHorizontal():
-        pyautogui.keyDown('shift')
-        pyautogui.keyDown('ctrl')
-        pyautogui.scroll(-Controller.SCROLL_SPEED if Controller.pinchlv > 0.0 else Controller.SCROLL_SPEED)
-        pyautogui.keyUp('ctrl')
-        pyautogui.keyUp('shift')
+    def get_position(self, hand_result, timestamp=None):
+        if self.cursor is None:
+            import pyautogui
 
-    def get_position(hand_result):
+            # Screen geometry is read once; the cursor position is tracked by the filter.
+            settings = load_settings("cursor", DEFAULT_CURSOR_SETTINGS)
+            self.cursor = build_cursor_filter(settings, pyautogui.size(), position=pyautogui.position)
         point = 9
-        pos = [hand_result.landmark[point].x, hand_result.landmark[point].y]
-        sx, sy = pyautogui.size()
-        x_old, y_old = pyautogui.position()
-        x, y = int(pos[0] * sx), int(pos[1] * sy)
-        if Controller.prev_hand is None:
-            Controller.prev_hand = x, y
-        delta_x, delta_y = x - Controller.prev_hand[0], y - Controller.prev_hand[1]
-        distsq = delta_x ** 2 + delta_y ** 2
-        ratio = 1
-        Controller.prev_hand = [x, y]
-        if distsq <= 25:
-            ratio = 0
-        elif distsq <= 900:
-            ratio = 0.1 * (distsq ** 0.5)
-        else:
-            ratio = 2.8
-        return (x_old + delta_x * ratio, y_old + delta_y * ratio)
+        if timestamp is None:
+            timestamp = time.perf_counter()
+        return self.cursor.update(hand_result[point, :2], timestamp)
 
-    def pinch_control_init(hand_result):
-        Controller.pinchstartxcoord = hand_result.landmark[8].x
-        Controller.pinchstartycoord = hand_result.landmark[8].y
-        Controller.pinchlv, Controller.prevpinchlv, Controller.framecount = 0, 0, 0
-        try:
-            Controller.startbrightness = sbcontrol.get_brightness(display=0)[0]
-        except Exception:
-            Controller.startbrightness = 50
-        try:
-            devices = AudioUtilities.GetSpeakers()
-            interface = devices.Activate(IAudioEndpointVolume._iid_, CLSCTX_ALL, None)
-            volume = cast(interface, POINTER(IAudioEndpointVolume))
-            Controller.startvolume = volume.GetMasterVolumeLevelScalar()
-        except Exception:
-            Controller.startvolume = 0.5
-
-    def pinch_control(hand_result, controlHorizontal, controlVertical):
-        if Controller.framecount == 3:
-            Controller.framecount = 0
-            Controller.pinchlv = Controller.prevpinchlv
-            if Controller.pinchdirectionflag is True:
+    def reset_position(self):
+        """Called when no hand is in view."""
+        if self.cursor is not None:
+            self.cursor.reset()
+        self.current_action = ""
+
+    # --- Pinch levels ---
+    def getpinchylv(self, hand_result):
+        return round((self.pinchstartycoord - float(hand_result[8, 1])) * 10, 1)
+
+    def getpinchxlv(self, hand_result):
+        return round((float(hand_result[8, 0]) - self.pinchstartxcoord) * 10, 1)
+
+    def pinch_control_init(self, hand_result):
+        # Python floats, like the MediaPipe landmark fields these replaced: in float32 the rounded
+        # levels tie differently with pinch_threshold (abs(-0.9 - -1.2) is not below 0.3).
+        self.pinchstartxcoord = float(hand_result[8, 0])
+        self.pinchstartycoord = float(hand_result[8, 1])
+        self.pinchlv, self.prevpinchlv, self.framecount = 0, 0, 0
+
+    def pinch_control(self, hand_result, controlHorizontal, controlVertical):
+        if self.framecount == 3:
+            self.framecount = 0
+            self.pinchlv = self.prevpinchlv
+            if self.pinchdirectionflag is True:
                 controlHorizontal()
-            elif Controller.pinchdirectionflag is False:
+            elif self.pinchdirectionflag is False:
                 controlVertical()
-        lvx, lvy = Controller.getpinchxlv(hand_result), Controller.getpinchylv(hand_result)
-        if abs(lvy) > abs(lvx) and abs(lvy) > Controller.pinch_threshold:
-            Controller.pinchdirectionflag = False
-            if abs(Controller.prevpinchlv - lvy) < Controller.pinch_threshold:
-                Controller.framecount += 1
+        lvx, lvy = self.getpinchxlv(hand_result), self.getpinchylv(hand_result)
+        if abs(lvy) > abs(lvx) and abs(lvy) > self.pinch_threshold:
+            self.pinchdirectionflag = False
+            if abs(self.prevpinchlv - lvy) < self.pinch_threshold:
+                self.framecount += 1
             else:
-                Controller.prevpinchlv, Controller.framecount = lvy, 0
-        elif abs(lvx) > Controller.pinch_threshold:
-            Controller.pinchdirectionflag = True
-            if abs(Controller.prevpinchlv - lvx) < Controller.pinch_threshold:
-                Controller.framecount += 1
+                self.prevpinchlv, self.framecount = lvy, 0
+        elif abs(lvx) > self.pinch_threshold:
+            self.pinchdirectionflag = True
+            if abs(self.prevpinchlv - lvx) < self.pinch_threshold:
+                self.framecount += 1
             else:
-                Controller.prevpinchlv, Controller.framecount = lvx, 0
-
-    def handle_controls(gesture, hand_result):
-        x, y = (None, None)
-        if gesture != Gest.PALM:
-            x, y = Controller.get_position(hand_result)
-        if gesture != Gest.FIST and Controller.grabflag:
-            Controller.grabflag, _ = False, pyautogui.mouseUp(button="left")
-        if gesture != Gest.PINCH_MAJOR and Controller.pinchmajorflag:
-            Controller.pinchmajorflag = False
-        if gesture != Gest.PINCH_MINOR and Controller.pinchminorflag:
-            Controller.pinchminorflag = False
-        if gesture != Gest.VOLUME_BRIGHTNESS and Controller.volbrightflag:
-            Controller.volbrightflag = False
-
-        Controller.current_action = ""
-        if gesture == Gest.V_GEST:
-            Controller.flag, _ = True, pyautogui.moveTo(x, y, duration=0)
-            Controller.current_action = "Mouse Control"
-        elif gesture == Gest.FIST:
-            if not Controller.grabflag:
-                Controller.grabflag, _ = True, pyautogui.mouseDown(button="left")
-            pyautogui.moveTo(x, y, duration=0)
-            Controller.current_action = "Dragging"
-        elif gesture == Gest.MID and Controller.flag:
-            Controller.flag, _, Controller.current_action = False, pyautogui.click(), "Left Click"
-        elif gesture == Gest.INDEX and Controller.flag:
-            Controller.flag, _, Controller.current_action = False, pyautogui.click(button='right'), "Right Click"
-        elif gesture == Gest.TWO_FINGER_CLOSED and Controller.flag:
-            Controller.flag, _, Controller.current_action = False, pyautogui.doubleClick(), "Double Click"
-        elif gesture == Gest.PINCH_MINOR:
-            if not Controller.pinchminorflag:
-                Controller.pinch_control_init(hand_result)
-                Controller.pinchminorflag = True
-            Controller.pinch_control(hand_result, Controller.scrollHorizontal, Controller.scrollVertical)
-            if Controller.pinchdirectionflag is not None:
-                Controller.current_action = f"{'Horizontal' if Controller.pinchdirectionflag else 'Vertical'} Scroll"
-        elif gesture in [Gest.PINCH_MAJOR, Gest.VOLUME_BRIGHTNESS]:
-            flag_attr = 'volbrightflag' if gesture == Gest.VOLUME_BRIGHTNESS else 'pinchmajorflag'
-            if not getattr(Controller, flag_attr):
-                Controller.pinch_control_init(hand_result)
-                setattr(Controller, flag_attr, True)
-            Controller.pinch_control(hand_result, Controller.changesystembrightness, Controller.changesystemvolume)
-            if Controller.pinchdirectionflag is not None:
-                action = "Brightness" if Controller.pinchdirectionflag else "Volume"
-                direction = "Increase" if Controller.pinchlv > 0 else "Decrease"
-                Controller.current_action = f"{action} {direction}"
+                self.prevpinchlv, self.framecount = lvx, 0
+
+    def scrollVertical(self):
+        self.get_actuator().scroll(self.SCROLL_SPEED if self.pinchlv > 0.0 else -self.SCROLL_SPEED)
+
+    def scrollHorizontal(self):
+        self.get_actuator().scroll_horizontal(-self.SCROLL_SPEED if self.pinchlv > 0.0 else self.SCROLL_SPEED)
+
+    def changesystembrightness(self):
+        self.get_system().adjust("brightness", self.pinchlv * 10)
+
+    def changesystemvolume(self):
+        self.get_system().adjust("volume", self.pinchlv / 10.0)
+
+    # --- Action handlers: (hand_result, cursor position or None) ---
+    def _move(self, hand_result, position):
+        self.armed = True
+        self.get_actuator().move_to(*position)
+        self.current_action = "Mouse Control"
+
+    def _drag_start(self, hand_result, position):
+        self.get_actuator().mouse_down("left")
+
+    def _drag(self, hand_result, position):
+        self.get_actuator().move_to(*position)
+        self.current_action = "Dragging"
+
+    def _drag_end(self, hand_result, position):
+        self.get_actuator().mouse_up("left")
+
+    def _click(self, button, label):
+        if self.armed:
+            self.armed = False
+            self.get_actuator().click(button)
+            self.current_action = label
+
+    def _left_click(self, hand_result, position):
+        self._click("left", "Left Click")
+
+    def _right_click(self, hand_result, position):
+        self._click("right", "Right Click")
+
+    def _middle_click(self, hand_result, position):
+        self._click("middle", "Middle Click")
+
+    def _double_click(self, hand_result, position):
+        if self.armed:
+            self.armed = False
+            self.get_actuator().double_click()
+            self.current_action = "Double Click"
+
+    def _hotkey(self, keys):
+        self.get_actuator().hotkey(*keys)
+        self.current_action = "+".join(keys)
+
+    def _pinch_start(self, hand_result, position):
+        self.pinch_control_init(hand_result)
+
+    def _scroll(self, hand_result, position):
+        self.pinch_control(hand_result, self.scrollHorizontal, self.scrollVertical)
+        if self.pinchdirectionflag is not None:
+            self.current_action = f"{'Horizontal' if self.pinchdirectionflag else 'Vertical'} Scroll"
+
+    def _system_start(self, hand_result, position):
+        self.pinch_control_init(hand_result)
+        # Start levels are read lazily by the writer thread, only for the control that changes.
+        self.get_system().begin_adjust()
+
+    def _system_level(self, hand_result, position):
+        self.pinch_control(hand_result, self.changesystembrightness, self.changesystemvolume)
+        if self.pinchdirectionflag is not None:
+            action = "Brightness" if self.pinchdirectionflag else "Volume"
+            direction = "Increase" if self.pinchlv > 0 else "Decrease"
+            self.current_action = f"{action} {direction}"
 
 # ========================= GESTURE ENGINE ========================= #
+DISPLAY_MODES = ("full", "preview", "headless")
+
 class GestureEngine:
-    def __init__(self, stop_event, image_queue):
+    def __init__(self, stop_event, image_queue, trace_path=None, inference_process=False, roi_tracking=False,
+                 skip_inference=False, metrics_overlay=False, camera=None, hands_options=None,
+                 display="full", preview_rate=10.0, preview_scale=0.5, idle_after=None, wake_latency=0.2,
+                 bindings=None, controller=None, events=None):
         self.stop_event = stop_event
         self.image_queue = image_queue
-        self.cap = cv2.VideoCapture(0)
+        # Traces are ground truth for landmark_prediction.py, so they never hold predicted landmarks.
+        if trace_path and skip_inference:
+            raise ValueError("recording a landmark trace needs inference on every frame (no skip_inference)")
+        self.trace_path = trace_path
+        self.inference_process = inference_process
+        self.roi_tracking = roi_tracking
+        self.skip_inference = skip_inference
+        self.metrics_overlay = metrics_overlay
+        # Any object with the cv2.VideoCapture read/set/release interface; defaults to the saved capture profile (see camera.py).
+        self.camera = camera
+        self.hands_options = hands_options or {}
+        # "full" renders every frame, "preview" a downscaled frame at most preview_rate
+        # times per second, and "headless" nothing at all.
+        if display not in DISPLAY_MODES:
+            raise ValueError(f"unknown display mode {display!r}, expected one of {DISPLAY_MODES}")
+        self.display = display
+        if preview_rate <= 0:
+            raise ValueError(f"preview_rate must be greater than 0, got {preview_rate}")
+        self.preview_interval = 1.0 / preview_rate
+        self.preview_scale = preview_scale
+        self._last_preview = None
+        # With idle_after set, inference pauses after that many seconds without hands until motion appears.
+        self.idle_after = idle_after
+        self.wake_latency = wake_latency
+        # Gesture bindings come from settings.json and, optionally, the JSON file at `bindings`.
+        self.controller = controller or Controller(load_bindings(bindings))
+        # An event_stream.EventPublisher that other processes subscribe to, or None.
+        self.events = events
+        self._published = (None, "")
+        # Frame-sized buffers are reused across frames; see _render for the display ring.
+        self.pool = BufferPool()
+        self._display_index = 0
+        self.cap = None
         self.dom_hand = True
+        self.frames_processed = 0
+        self.frames_dropped = 0
 
-    def _classify_hands(self, results):
+    def _classify_hands(self, hands, handedness):
         left, right = None, None
-        try:
-            handedness = MessageToDict(results.multi_handedness[0])
-            if handedness['classification'][0]['label'] == 'Right':
-                right = results.multi_hand_landmarks[0]
-            else:
-                left = results.multi_hand_landmarks[0]
-        except Exception:
-            pass
-        try:
-            handedness = MessageToDict(results.multi_handedness[1])
-            if handedness['classification'][0]['label'] == 'Right':
-                right = results.multi_hand_landmarks[1]
+        for hand, label in list(zip(hands, handedness))[:2]:
+            if label == 'Right':
+                right = hand
             else:
-                left = results.multi_hand_landmarks[1]
-        except Exception:
-            pass
+                left = hand
         return (right, left) if self.dom_hand else (left, right)
 
+    def _handle_hands(self, handmajor, handminor, hands, handedness, timestamp=None):
+        t = time.perf_counter()
+        hr_major, hr_minor = self._classify_hands(hands, handedness)
+        handmajor.update_hand_result(hr_major, timestamp)
+        handminor.update_hand_result(hr_minor, timestamp)
+        handmajor.set_finger_state()
+        handminor.set_finger_state()
+        gest_name, hand_result = handminor.get_gesture(), None
+        if gest_name in [Gest.PINCH_MINOR, Gest.VOLUME_BRIGHTNESS] and handminor.hand_result is not None:
+            hand_result = handminor.hand_result
+        elif handmajor.hand_result is not None:
+            gest_name, hand_result = handmajor.get_gesture(), handmajor.hand_result
+        t = METRICS.since("gesture.classify", t)
+        if hand_result is None:
+            return None
+        self.controller.handle_controls(gest_name, hand_result, timestamp)
+        METRICS.since("gesture.actuate", t)
+        return gest_name
+
+    def build_detector(self):
+        """Returns the hand detector stack selected by the engine options."""
+        if self.inference_process:
+            detector = ProcessHandDetector(**self.hands_options)
+        else:
+            detector = HandDetector(**self.hands_options)
+        if self.roi_tracking:
+            detector = RoiHandDetector(detector)
+        if self.skip_inference:
+            detector = SkippingHandDetector(detector)
+        return detector
+
+    def _publish(self, seq, timestamp, landmarks, handedness, gesture):
+        """Sends this frame's hands, and the gesture and action if they changed, to the event subscribers."""
+        self.events.publish_hands(seq, timestamp, landmarks, handedness)
+        last_gesture, last_action = self._published
+        action = self.controller.current_action
+        if gesture != last_gesture:
+            self.events.publish_gesture(seq, timestamp, gesture)
+        if action != last_action and action:
+            self.events.publish_action(timestamp, action)
+        self._published = gesture, action
+
+    def _preview_due(self, timestamp):
+        if self.display == "full":
+            return True
+        if self.display == "headless":
+            return False
+        if self._last_preview is not None and timestamp - self._last_preview < self.preview_interval:
+            return False
+        self._last_preview = timestamp
+        return True
+
+    def _render(self, image, landmarks):
+        """Turns the processed RGB frame into the mirrored BGR preview, with landmarks and status drawn on.
+
+        Previews rotate through three buffers: the one queued for display, the one the
+        display loop took last, and the one being drawn, so none is overwritten while in use.
+        """
+        text_scale = 1
+        if self.display == "preview":
+            # Downscale before converting so the preview never pays for full-resolution work.
+            h, w = image.shape[:2]
+            size = (max(1, round(w * self.preview_scale)), max(1, round(h * self.preview_scale)))
+            image = cv2.resize(image, size, dst=self.pool.get("preview", (size[1], size[0], 3)),
+                               interpolation=cv2.INTER_NEAREST)
+            text_scale = self.preview_scale
+        out = cv2.flip(image, 1, dst=self.pool.get(f"display{self._display_index}", image.shape))
+        image = cv2.cvtColor(out, cv2.COLOR_RGB2BGR, dst=out)
+        if len(landmarks):
+            draw_landmarks(image, landmarks)
+        
+        # Add status text to the image
+        cv2.putText(image, self.controller.current_action, (int(50 * text_scale), int(50 * text_scale)),
+                    cv2.FONT_HERSHEY_SIMPLEX, text_scale, (0, 0, 0), 2, cv2.LINE_AA)
+        if self.metrics_overlay:
+            draw_overlay(image)
+        return image
+
+    def _open_camera(self):
+        cap = open_camera(load_settings("camera", DEFAULT_CAMERA_SETTINGS))
+        STARTUP.mark("camera opened")
+        return cap
+
     def run(self):
         handmajor = HandRecog(HLabel.MAJOR)
         handminor = HandRecog(HLabel.MINOR)
-        with mp_hands.Hands(max_num_hands=2, min_detection_confidence=0.5, min_tracking_confidence=0.5) as hands:
+        # Opening the camera mostly waits on the driver, and starting the mouse backend
+        # on its import; both happen while the hand model loads.
+        with ThreadPoolExecutor(2, thread_name_prefix="gesture-init") as init:
+            opening = None
+            if self.camera is None:
+                opening = init.submit(self._open_camera)
+            actuator = init.submit(self.controller.get_actuator)
+            detector = self.build_detector()
+            STARTUP.mark("hand detector loaded")
+            self.cap = self.camera if opening is None else opening.result()
+            actuator.result()
+        if self.camera is None:
+            mode = negotiated_mode(self.cap)
+            print(f"[gesture] Camera mode: {mode['fourcc']} {mode['width']}x{mode['height']} @ {mode['fps']} fps")
+        capture = CaptureThread(self.cap, self.stop_event, pool=self.pool)
+        capture.start()
+        writer = TraceWriter(self.trace_path) if self.trace_path else None
+        if writer:
+            print(f"[gesture] Recording landmark trace to {self.trace_path}")
+        last_seq = 0
+        gate = IdleGate(self.idle_after, self.wake_latency) if self.idle_after is not None else None
+        no_hands = landmarks_to_array(None), []
+        try:
             while not self.stop_event.is_set():
-                success, image = self.cap.read()
-                if not success:
-                    print("[gesture] Ignoring empty camera frame.")
+                frame = capture.slot.get(last_seq, timeout=0.1)
+                if frame is None:
                     continue
-                
-                image = cv2.cvtColor(cv2.flip(image, 1), cv2.COLOR_BGR2RGB)
-                image.flags.writeable = False
-                results = hands.process(image)
-                image.flags.writeable = True
-                image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
-
-                if results.multi_hand_landmarks:
-                    hr_major, hr_minor = self._classify_hands(results)
-                    handmajor.update_hand_result(hr_major)
-                    handminor.update_hand_result(hr_minor)
-                    handmajor.set_finger_state()
-                    handminor.set_finger_state()
-                    gest_name = handminor.get_gesture()
-                    if gest_name in [Gest.PINCH_MINOR, Gest.VOLUME_BRIGHTNESS] and handminor.hand_result:
-                        Controller.handle_controls(gest_name, handminor.hand_result)
-                    elif handmajor.hand_result:
-                        gest_name = handmajor.get_gesture()
-                        Controller.handle_controls(gest_name, handmajor.hand_result)
-                    
-                    for hand_landmarks in results.multi_hand_landmarks:
-                        mp_drawing.draw_landmarks(image, hand_landmarks, mp_hands.HAND_CONNECTIONS)
+                t = METRICS.since("gesture.queue_wait", frame.timestamp)
+                # Frames published while the previous one was being processed were overwritten.
+                dropped = frame.seq - last_seq - 1
+                self.frames_dropped += dropped
+                self.frames_processed += 1
+                last_seq = frame.seq
+                METRICS.count("gesture.frames")
+                if dropped:
+                    METRICS.count("gesture.dropped", dropped)
+                METRICS.tick("gesture")
+
+                # While idle only the gate's motion check runs: no conversion, inference or preview.
+                infer = gate is None or gate.should_infer(frame.image, frame.timestamp)
+                if infer:
+                    image = cv2.cvtColor(frame.image, cv2.COLOR_BGR2RGB, dst=self.pool.get("rgb", frame.image.shape))
+                    t = METRICS.since("gesture.convert", t)
+                    # The frame is not flipped into selfie view; the hands are mirrored instead.
+                    landmarks, handedness = mirror_hands(*detector.detect(image))
+                    METRICS.since("gesture.inference", t)
+                    if self.frames_processed == 1:
+                        STARTUP.mark("first frame inferred")
                 else:
-                    Controller.prev_hand, Controller.current_action = None, ""
-                
-                # Add status text to the image
-                cv2.putText(image, Controller.current_action, (50, 50),
-                            cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 0), 2, cv2.LINE_AA)
+                    landmarks, handedness = no_hands
+                if gate is not None:
+                    if infer:
+                        gate.update(len(landmarks), frame.timestamp)
+                    capture.min_interval = gate.capture_interval
+
+                if writer:
+                    writer.write(frame.timestamp, landmarks, handedness)
+
+                gesture = None
+                if len(landmarks):
+                    # Commands queued for this frame report capture-to-execution latency.
+                    self.controller.get_actuator().origin = frame.timestamp
+                    gesture = self._handle_hands(handmajor, handminor, landmarks, handedness, frame.timestamp)
+                else:
+                    self.controller.reset_position()
+                if self.events:
+                    self._publish(frame.seq, frame.timestamp, landmarks, handedness, gesture)
+
+                if not infer or not self._preview_due(frame.timestamp):
+                    continue
+                t = time.perf_counter()
+                image = self._render(image, landmarks)
+                t = METRICS.since("gesture.draw", t)
+                if self.events:
+                    self.events.publish_preview(frame.seq, frame.timestamp, image)
                 
                 # Put the processed image into the queue for the main thread to display
                 if not self.image_queue.full():
                     self.image_queue.put(image)
+                    self._display_index = (self._display_index + 1) % 3
+                METRICS.since("gesture.handoff", t)
+        finally:
+            detector.close()
+            if writer:
+                writer.close()
+        self._report_detector(detector)
         
+        if writer:
+            print(f"[gesture] Wrote {writer.frames} frames to {self.trace_path}")
+        capture.join(timeout=1.0)
         self.cap.release()
-        print("[gesture] Gesture engine stopped.")
\ No newline at end of file
+        self.controller.stop()
+        print(f"[gesture] Processed {self.frames_processed} frames, dropped {self.frames_dropped} stale frames, "
+              f"allocated {self.pool.allocations} frame buffers.")
+        print("[gesture] Gesture engine stopped.")
+
+    def _report_detector(self, detector):
+        while detector is not None:
+            if isinstance(detector, RoiHandDetector):
+                print(f"[gesture] ROI inference on {detector.roi_frames} frames, "
+                      f"full-frame on {detector.full_frames}.")
+            elif isinstance(detector, SkippingHandDetector):
+                print(f"[gesture] Inference ran on {detector.inferred_frames} frames, "
+                      f"predicted {detector.predicted_frames} (final interval k={detector.skip}).")
+            elif isinstance(detector, ProcessHandDetector) and (detector.timeouts or detector.restarts):
+                print(f"[gesture] Inference worker missed {detector.timeouts} replies, "
+                      f"restarted {detector.restarts} times.")
+            detector = getattr(detector, "detector", None)
+
+    def replay(self, trace_path, realtime=False):
+        """Feeds a recorded landmark trace through HandRecog and Controller without a camera.
+
+        With realtime=True the original frame timing is reproduced; otherwise frames are
+        processed as fast as possible. Returns (frames processed, elapsed seconds).
+        """
+        frames = read_trace(trace_path)
+        handmajor = HandRecog(HLabel.MAJOR)
+        handminor = HandRecog(HLabel.MINOR)
+        print(f"[gesture] Replaying {len(frames)} frames from {trace_path}")
+        start = time.perf_counter()
+        count = 0
+        for frame in frames:
+            if self.stop_event.is_set():
+                break
+            if realtime and count:
+                delay = (frame.timestamp - frames[0].timestamp) - (time.perf_counter() - start)
+                if delay > 0:
+                    time.sleep(delay)
+            gesture = None
+            if len(frame.landmarks):
+                gesture = self._handle_hands(handmajor, handminor, frame.landmarks, frame.handedness, frame.timestamp)
+            else:
+                self.controller.reset_position()
+            count += 1
+            if self.events:
+                self._publish(count, frame.timestamp, frame.landmarks, frame.handedness, gesture)
+        elapsed = time.perf_counter() - start
+        self.controller.stop()
+        print(f"[gesture] Replay finished: {count} frames in {elapsed:.3f}s")
+        return count, elapsed
@@ -0,0 +1,337 @@
+# hand_inference.py
+
+import math
+import multiprocessing
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from landmark_prediction import LandmarkPredictor
+from landmark_trace import landmarks_to_array
+
+_mp_hands = None
+
+def mp_hands():
+    """MediaPipe's hands solution. Importing mediapipe alone takes about a second, so it waits for first use."""
+    global _mp_hands
+    if _mp_hands is None:
+        import mediapipe as mp
+        _mp_hands = mp.solutions.hands
+    return _mp_hands
+
+HANDS_OPTIONS = dict(max_num_hands=2, min_detection_confidence=0.5, min_tracking_confidence=0.5)
+
+# ========================= HELPERS ========================= #
+def _unpack_results(results):
+    landmarks = landmarks_to_array(results.multi_hand_landmarks)
+    handedness = [h.classification[0].label for h in results.multi_handedness or []]
+    return landmarks, handedness
+
+MIRRORED_LABELS = {"Left": "Right", "Right": "Left"}
+
+def mirror_hands(landmarks, handedness):
+    """Maps hands detected on an unflipped camera frame into the mirrored (selfie) view.
+
+    Mirroring the landmarks (in place) is much cheaper than flipping every frame.
+    MediaPipe labels handedness as if its input were mirrored, so the labels swap too.
+    """
+    if len(landmarks):
+        np.subtract(1.0, landmarks[..., 0], out=landmarks[..., 0])
+    return landmarks, [MIRRORED_LABELS.get(label, label) for label in handedness]
+
+def draw_landmarks(image, landmarks):
+    """Draws (n, 21, 3) normalized landmarks onto a BGR image, MediaPipe style."""
+    h, w = image.shape[:2]
+    for hand in landmarks:
+        points = [(int(x * w), int(y * h)) for x, y, _ in hand.tolist()]
+        for a, b in mp_hands().HAND_CONNECTIONS:
+            cv2.line(image, points[a], points[b], (224, 224, 224), 2)
+        for point in points:
+            cv2.circle(image, point, 2, (0, 0, 255), 2)
+
+# ========================= IN-PROCESS DETECTOR ========================= #
+class HandDetector:
+    """Runs MediaPipe Hands in the calling thread."""
+
+    def __init__(self, **options):
+        self.hands = mp_hands().Hands(**{**HANDS_OPTIONS, **options})
+
+    def detect(self, rgb_image):
+        """Returns ((n, 21, 3) float32 landmarks, list of 'Left'/'Right' labels)."""
+        rgb_image.flags.writeable = False
+        results = self.hands.process(rgb_image)
+        rgb_image.flags.writeable = True
+        return _unpack_results(results)
+
+    def close(self):
+        self.hands.close()
+
+# ========================= OUT-OF-PROCESS DETECTOR ========================= #
+def _inference_worker(conn, options):
+    shm = None
+    hands = mp_hands().Hands(**options)
+    conn.send("ready")
+    try:
+        while True:
+            msg = conn.recv()
+            if msg is None:
+                break
+            kind, payload = msg
+            if kind == "buffer":
+                if shm is not None:
+                    shm.close()
+                shm = shared_memory.SharedMemory(name=payload)
+            elif kind == "frame":
+                # The buffer is sized for the largest frame seen; payload is this frame's shape.
+                frame = np.ndarray(payload, dtype=np.uint8, buffer=shm.buf)
+                frame.flags.writeable = False
+                results = hands.process(frame)
+                frame = None
+                conn.send(_unpack_results(results))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        hands.close()
+        if shm is not None:
+            shm.close()
+
+class ProcessHandDetector:
+    """Runs MediaPipe Hands in a worker process so inference never holds this interpreter's GIL.
+
+    Frames are copied into a shared-memory buffer and only a short "frame ready"
+    message crosses the pipe; the worker sends back the landmark arrays.
+
+    Until the worker has answered one frame (MediaPipe builds its graph on the
+    first one) replies may take startup_timeout, afterwards timeout. A frame
+    whose reply is late is reported as having no hands, and frames are skipped
+    the same way until the late reply has arrived, since the worker is still
+    reading the shared buffer. A worker that exits, or is still busy after
+    startup_timeout, is restarted. timeouts and restarts count both.
+    """
+
+    def __init__(self, timeout=2.0, startup_timeout=60.0, **options):
+        self.timeout = timeout
+        self.startup_timeout = startup_timeout
+        self.options = {**HANDS_OPTIONS, **options}
+        self.timeouts = 0
+        self.restarts = 0
+        self._shm = None
+        self._start_worker()
+
+    def _start_worker(self):
+        self._ready = False
+        self._warm = False
+        self._late_since = None
+        ctx = multiprocessing.get_context("spawn")
+        self._conn, child_conn = ctx.Pipe()
+        self._process = ctx.Process(target=_inference_worker, args=(child_conn, self.options),
+                                    name="hand-inference", daemon=True)
+        self._process.start()
+        child_conn.close()
+
+    def _restart(self, reason):
+        print(f"[gesture] Hand inference worker {reason}; restarting it")
+        self.restarts += 1
+        self._stop_worker()
+        # The new worker has to be told about a buffer before its first frame.
+        self._release_buffer()
+        self._start_worker()
+
+    def _allocate(self, nbytes):
+        self._release_buffer()
+        self._shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        self._conn.send(("buffer", self._shm.name))
+
+    def _release_buffer(self):
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def _receive(self, timeout):
+        """Returns the worker's next message, or None if none arrived within timeout."""
+        if not self._conn.poll(timeout):
+            return None
+        return self._conn.recv()
+
+    def detect(self, rgb_image):
+        """Returns ((n, 21, 3) float32 landmarks, list of 'Left'/'Right' labels)."""
+        try:
+            return self._detect(rgb_image)
+        except (EOFError, OSError):
+            self._restart("exited")
+            return landmarks_to_array(None), []
+
+    def _detect(self, rgb_image):
+        if not self._ready:
+            # The worker imports MediaPipe and loads its models before answering. Only the
+            # first worker is waited for; a restarted one is polled while frames are skipped.
+            if self._receive(0 if self.restarts else self.startup_timeout) is None:
+                if not self.restarts:
+                    raise RuntimeError(f"hand inference worker did not start within {self.startup_timeout:.0f}s")
+                return landmarks_to_array(None), []
+            self._ready = True
+        if self._late_since is not None:
+            # A reply that missed its deadline is stale by now; drop it and carry on.
+            if self._receive(0) is None:
+                if time.perf_counter() - self._late_since > self.startup_timeout:
+                    self._restart("stopped answering")
+                return landmarks_to_array(None), []
+            self._late_since = None
+        if self._shm is None or self._shm.size < rgb_image.nbytes:
+            self._allocate(rgb_image.nbytes)
+        frame = np.ndarray(rgb_image.shape, dtype=np.uint8, buffer=self._shm.buf)
+        np.copyto(frame, rgb_image)
+        del frame
+        self._conn.send(("frame", rgb_image.shape))
+        reply = self._receive(self.timeout if self._warm else self.startup_timeout)
+        if reply is None:
+            self.timeouts += 1
+            self._late_since = time.perf_counter()
+            return landmarks_to_array(None), []
+        self._warm = True
+        return reply
+
+    def _stop_worker(self):
+        try:
+            self._conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self._process.join(timeout=2.0)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._conn.close()
+
+    def close(self):
+        self._stop_worker()
+        self._release_buffer()
+
+# ========================= ROI TRACKING ========================= #
+class RoiHandDetector:
+    """Wraps a detector and runs inference on a downscaled crop around the tracked hands.
+
+    The crop is the bounding box of the previous frame's landmarks plus a margin,
+    resized so its longer side is at most roi_size. Landmarks are mapped back to
+    full-frame normalized coordinates, so callers cannot tell the difference.
+    Whenever the crop loses a hand, and every redetect_interval frames so a newly
+    raised hand is found, the whole frame is searched instead (downscaled to
+    full_size). How many frames took each path is kept in roi_frames / full_frames.
+    """
+
+    def __init__(self, detector, margin=0.5, roi_size=256, full_size=640, redetect_interval=30):
+        self.detector = detector
+        self.margin = margin
+        self.roi_size = roi_size
+        self.full_size = full_size
+        self.redetect_interval = redetect_interval
+        self.roi_frames = 0
+        self.full_frames = 0
+        self._roi = None
+        self._tracked_hands = 0
+        self._frames_since_full = 0
+
+    def _detect_region(self, rgb_image, box, max_side):
+        h, w = rgb_image.shape[:2]
+        x0, y0, x1, y1 = box
+        crop = rgb_image[y0:y1, x0:x1]
+        cw, ch = x1 - x0, y1 - y0
+        scale = max_side / max(cw, ch)
+        if scale < 1:
+            crop = cv2.resize(crop, (max(1, round(cw * scale)), max(1, round(ch * scale))),
+                              interpolation=cv2.INTER_AREA)
+        else:
+            crop = np.ascontiguousarray(crop)
+        landmarks, handedness = self.detector.detect(crop)
+        if len(landmarks) and (cw, ch) != (w, h):
+            landmarks[..., 0] = (x0 + landmarks[..., 0] * cw) / w
+            landmarks[..., 1] = (y0 + landmarks[..., 1] * ch) / h
+            landmarks[..., 2] *= cw / w
+        return landmarks, handedness
+
+    def _update_roi(self, landmarks, w, h):
+        self._tracked_hands = len(landmarks)
+        if not len(landmarks):
+            self._roi = None
+            return
+        xs, ys = landmarks[..., 0] * w, landmarks[..., 1] * h
+        cx, cy = (xs.min() + xs.max()) / 2, (ys.min() + ys.max()) / 2
+        half = max(xs.max() - xs.min(), ys.max() - ys.min()) * (0.5 + self.margin)
+        half = max(half, 0.1 * min(w, h))
+        self._roi = (max(0, int(cx - half)), max(0, int(cy - half)),
+                     min(w, int(cx + half) + 1), min(h, int(cy + half) + 1))
+        if self._roi[2] - self._roi[0] < 2 or self._roi[3] - self._roi[1] < 2:
+            self._roi = None
+
+    def detect(self, rgb_image):
+        """Returns ((n, 21, 3) float32 landmarks, list of 'Left'/'Right' labels) in full-frame coordinates."""
+        h, w = rgb_image.shape[:2]
+        if self._roi is not None and self._frames_since_full < self.redetect_interval:
+            landmarks, handedness = self._detect_region(rgb_image, self._roi, self.roi_size)
+            if len(landmarks) >= self._tracked_hands:
+                self.roi_frames += 1
+                self._frames_since_full += 1
+                self._update_roi(landmarks, w, h)
+                return landmarks, handedness
+        # Tracking lost or due for a refresh: search the whole frame.
+        landmarks, handedness = self._detect_region(rgb_image, (0, 0, w, h), self.full_size)
+        self.full_frames += 1
+        self._frames_since_full = 0
+        self._update_roi(landmarks, w, h)
+        return landmarks, handedness
+
+    def close(self):
+        self.detector.close()
+
+# ========================= INFERENCE SCHEDULING ========================= #
+class SkippingHandDetector:
+    """Wraps a detector and only runs it on every k-th frame, predicting landmarks in between.
+
+    k adapts to the measured cost: it is the smallest interval that keeps average
+    inference time under max_load of the frame interval, capped at max_skip.
+    Frames without inference get landmarks extrapolated by a LandmarkPredictor,
+    so the cursor still gets an update every camera frame.
+    """
+
+    def __init__(self, detector, max_load=0.5, max_skip=4, smoothing=0.1, predictor=None):
+        self.detector = detector
+        self.max_load = max_load
+        self.max_skip = max_skip
+        self.smoothing = smoothing
+        self.predictor = predictor or LandmarkPredictor()
+        self.skip = 1
+        self.inferred_frames = 0
+        self.predicted_frames = 0
+        self._inference_time = None
+        self._frame_interval = None
+        self._last_call = None
+        self._since_inference = 0
+
+    def _average(self, current, sample):
+        return sample if current is None else current + self.smoothing * (sample - current)
+
+    def detect(self, rgb_image):
+        """Returns ((n, 21, 3) float32 landmarks, list of 'Left'/'Right' labels), measured or predicted."""
+        now = time.perf_counter()
+        if self._last_call is not None:
+            self._frame_interval = self._average(self._frame_interval, now - self._last_call)
+        self._last_call = now
+
+        self._since_inference += 1
+        if self.inferred_frames and self._since_inference < self.skip:
+            self.predicted_frames += 1
+            return self.predictor.predict(now)
+
+        landmarks, handedness = self.detector.detect(rgb_image)
+        self._inference_time = self._average(self._inference_time, time.perf_counter() - now)
+        self.predictor.update(landmarks, handedness, now)
+        self.inferred_frames += 1
+        self._since_inference = 0
+        if self._frame_interval:
+            needed = math.ceil(self._inference_time / (self.max_load * self._frame_interval))
+            self.skip = max(1, min(self.max_skip, needed))
+        return landmarks, handedness
+
+    def close(self):
+        self.detector.close()
@@ -0,0 +1,84 @@
+# idle_gate.py
+
+import cv2
+import numpy as np
+
+from metrics import METRICS
+
+# ========================= MOTION DETECTOR ========================= #
+class MotionDetector:
+    """Frame-difference motion test on a tiny grayscale copy of each frame.
+
+    A frame counts as motion when more than min_fraction of its downscaled
+    pixels changed by more than threshold grey levels since the previous frame.
+    All intermediate images are preallocated.
+    """
+
+    def __init__(self, size=(64, 48), threshold=12, min_fraction=0.01):
+        self.size = size
+        self.threshold = threshold
+        self.min_fraction = min_fraction
+        w, h = size
+        self._small = np.empty((h, w, 3), np.uint8)
+        self._gray = np.empty((h, w), np.uint8)
+        self._previous = np.empty((h, w), np.uint8)
+        self._diff = np.empty((h, w), np.uint8)
+        self._has_previous = False
+
+    def reset(self):
+        self._has_previous = False
+
+    def moved(self, bgr_image):
+        cv2.resize(bgr_image, self.size, dst=self._small, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        self._gray, self._previous = self._previous, self._gray
+        if not self._has_previous:
+            self._has_previous = True
+            return False
+        cv2.absdiff(self._gray, self._previous, dst=self._diff)
+        cv2.threshold(self._diff, self.threshold, 255, cv2.THRESH_BINARY, dst=self._diff)
+        return cv2.countNonZero(self._diff) >= self.min_fraction * self._diff.size
+
+# ========================= IDLE GATE ========================= #
+class IdleGate:
+    """Decides, frame by frame, whether full hand inference is worth running.
+
+    While active every frame is inferred. After idle_after seconds without a
+    hand the gate goes idle: the capture thread is throttled to one frame per
+    wake_latency seconds and only the motion detector looks at those frames.
+    The first frame with motion wakes the gate, so a raised hand is picked up
+    within about wake_latency (plus one inference).
+    """
+
+    def __init__(self, idle_after=5.0, wake_latency=0.2, motion=None):
+        self.idle_after = idle_after
+        self.wake_latency = wake_latency
+        self.motion = motion or MotionDetector()
+        self.idle = False
+        self._last_hand = None
+
+    @property
+    def capture_interval(self):
+        """Minimum time between camera reads: throttled while idle, unlimited otherwise."""
+        return self.wake_latency if self.idle else 0.0
+
+    def should_infer(self, bgr_image, timestamp):
+        if not self.idle:
+            return True
+        METRICS.count("gesture.idle_frames")
+        if not self.motion.moved(bgr_image):
+            return False
+        print("[gesture] Motion detected; resuming hand tracking.")
+        self.idle = False
+        self._last_hand = timestamp
+        return True
+
+    def update(self, hands, timestamp):
+        """Reports the number of hands found by the inference that should_infer() allowed."""
+        if hands or self._last_hand is None:
+            self._last_hand = timestamp
+        elif timestamp - self._last_hand >= self.idle_after:
+            print(f"[gesture] No hands for {self.idle_after:g}s; idling until motion.")
+            METRICS.count("gesture.idle_entries")
+            self.idle = True
+            self.motion.reset()
@@ -0,0 +1,109 @@
+# landmark_prediction.py
+
+import argparse
+
+import numpy as np
+
+from landmark_trace import NUM_LANDMARKS, read_trace
+
+# ========================= MOTION MODEL ========================= #
+class LandmarkPredictor:
+    """Constant-velocity model that extrapolates hand landmarks between inference runs.
+
+    Each hand is tracked by its handedness label. Measurements are taken as-is;
+    the velocity is an exponentially smoothed finite difference (weight beta on
+    the newest sample), which keeps single-frame detector noise from being
+    amplified into the prediction. Extrapolation is capped at max_age seconds.
+    """
+
+    def __init__(self, beta=0.6, max_age=0.25):
+        self.beta = beta
+        self.max_age = max_age
+        self._tracks = {}
+
+    def reset(self):
+        self._tracks = {}
+
+    def update(self, landmarks, handedness, timestamp):
+        tracks = {}
+        for hand, label in zip(landmarks, handedness):
+            hand = np.array(hand, dtype=np.float32)
+            prev = self._tracks.get(label)
+            velocity = np.zeros_like(hand)
+            if prev is not None:
+                dt = timestamp - prev[2]
+                if 0 < dt <= self.max_age:
+                    velocity = (1 - self.beta) * prev[1] + self.beta * (hand - prev[0]) / dt
+            tracks[label] = (hand, velocity, timestamp)
+        self._tracks = tracks
+
+    def predict(self, timestamp):
+        """Returns ((n, 21, 3) float32 landmarks, handedness labels) extrapolated to timestamp."""
+        if not self._tracks:
+            return np.zeros((0, NUM_LANDMARKS, 3), dtype=np.float32), []
+        labels = list(self._tracks)
+        hands = []
+        for label in labels:
+            position, velocity, measured_at = self._tracks[label]
+            dt = min(max(timestamp - measured_at, 0.0), self.max_age)
+            hands.append(position + velocity * dt)
+        return np.stack(hands).astype(np.float32), labels
+
+# ========================= ACCURACY REPORT ========================= #
+def prediction_report(frames, skips=(2, 3, 4), screen=(1920, 1080), beta=0.6):
+    """Replays a trace with inference on every k-th frame only and compares the
+    predicted landmarks against the recorded ones, next to a hold-last-result
+    baseline. Errors are mean landmark distances in screen pixels."""
+    scale = np.array(screen, dtype=np.float32)
+    if len(frames) > 1:
+        interval = (frames[-1].timestamp - frames[0].timestamp) / (len(frames) - 1)
+    else:
+        interval = 0.0
+    rows = []
+    for k in skips:
+        predictor = LandmarkPredictor(beta=beta)
+        held = {}
+        errors, hold_errors = [], []
+        for i, frame in enumerate(frames):
+            if i % k == 0:
+                predictor.update(frame.landmarks, frame.handedness, frame.timestamp)
+                held = dict(zip(frame.handedness, frame.landmarks))
+                continue
+            predicted_hands, predicted_labels = predictor.predict(frame.timestamp)
+            predicted = dict(zip(predicted_labels, predicted_hands))
+            for hand, label in zip(frame.landmarks, frame.handedness):
+                if label not in predicted:
+                    continue
+                actual = hand[:, :2] * scale
+                errors.append(np.linalg.norm(predicted[label][:, :2] * scale - actual, axis=1).mean())
+                hold_errors.append(np.linalg.norm(held[label][:, :2] * scale - actual, axis=1).mean())
+        rows.append({
+            "k": k,
+            "predicted_frames": len(errors),
+            "mean_px": float(np.mean(errors)) if errors else 0.0,
+            "p95_px": float(np.percentile(errors, 95)) if errors else 0.0,
+            "hold_mean_px": float(np.mean(hold_errors)) if hold_errors else 0.0,
+            "hold_p95_px": float(np.percentile(hold_errors, 95)) if hold_errors else 0.0,
+            "inference_share": 1.0 / k,
+            "max_added_latency_ms": (k - 1) * interval * 1000.0,
+        })
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare predicted vs. recorded landmarks on a trace")
+    parser.add_argument("trace", help="landmark trace recorded with main.py --record")
+    parser.add_argument("--skip", type=int, nargs="+", default=[2, 3, 4], help="inference intervals to evaluate")
+    parser.add_argument("--beta", type=float, default=0.6, help="velocity smoothing weight")
+    args = parser.parse_args()
+
+    frames = read_trace(args.trace)
+    print(f"{len(frames)} frames from {args.trace}")
+    print(f"{'k':>3} {'frames':>7} {'pred mean':>10} {'pred p95':>9} {'hold mean':>10} {'hold p95':>9} "
+          f"{'infer':>6} {'+latency':>9}")
+    for row in prediction_report(frames, args.skip, beta=args.beta):
+        print(f"{row['k']:>3} {row['predicted_frames']:>7} {row['mean_px']:>8.1f}px {row['p95_px']:>7.1f}px "
+              f"{row['hold_mean_px']:>8.1f}px {row['hold_p95_px']:>7.1f}px {row['inference_share']:>6.0%} "
+              f"{row['max_added_latency_ms']:>7.0f}ms")
+
+if __name__ == "__main__":
+    main()
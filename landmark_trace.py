@@ -0,0 +1,92 @@
+# landmark_trace.py
+
+import struct
+from collections import namedtuple
+
+import numpy as np
+
+# ========================= TRACE FORMAT ========================= #
+# A trace is a small header followed by one record per processed frame:
+#   timestamp (float64, capture time on the time.perf_counter() clock) | hand count n (uint8) | n handedness bytes (0 = Left, 1 = Right)
+#   | n * 21 * 3 float32 landmark values (x, y, z per landmark)
+# Frames without hands are recorded too (n = 0) so replay sees the same gaps.
+TRACE_MAGIC = b"GLTR"
+TRACE_VERSION = 1
+NUM_LANDMARKS = 21
+HANDEDNESS_LABELS = ("Left", "Right")
+
+_HEADER = struct.Struct("<4sH")
+_FRAME = struct.Struct("<dB")
+_HAND_BYTES = NUM_LANDMARKS * 3 * 4
+
+TraceFrame = namedtuple("TraceFrame", ["timestamp", "landmarks", "handedness"])
+
+
+def landmarks_to_array(multi_hand_landmarks):
+    """Converts MediaPipe hand landmark lists to an (n, 21, 3) float32 array."""
+    if not multi_hand_landmarks:
+        return np.zeros((0, NUM_LANDMARKS, 3), dtype=np.float32)
+    return np.array([[(lm.x, lm.y, lm.z) for lm in hand.landmark] for hand in multi_hand_landmarks],
+                    dtype=np.float32)
+
+
+# ========================= WRITER ========================= #
+class TraceWriter:
+    def __init__(self, path):
+        self.path = path
+        self.frames = 0
+        self._file = open(path, "wb")
+        self._file.write(_HEADER.pack(TRACE_MAGIC, TRACE_VERSION))
+
+    def write(self, timestamp, landmarks, handedness):
+        landmarks = np.ascontiguousarray(landmarks, dtype=np.float32).reshape(-1, NUM_LANDMARKS, 3)
+        count = landmarks.shape[0]
+        if len(handedness) != count:
+            raise ValueError(f"expected {count} handedness labels, got {len(handedness)}")
+        labels = bytes(HANDEDNESS_LABELS.index(label) for label in handedness)
+        self._file.write(_FRAME.pack(timestamp, count) + labels + landmarks.tobytes())
+        self.frames += 1
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+# ========================= READER ========================= #
+def read_trace(path):
+    """Loads a whole trace into memory and returns a list of TraceFrame.
+
+    A trace cut off mid-frame (the recorder was killed) ends at its last complete frame.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < _HEADER.size:
+        raise ValueError(f"{path} is not a landmark trace")
+    magic, version = _HEADER.unpack_from(data, 0)
+    if magic != TRACE_MAGIC:
+        raise ValueError(f"{path} is not a landmark trace")
+    if version != TRACE_VERSION:
+        raise ValueError(f"unsupported trace version {version} in {path}")
+
+    frames = []
+    offset = _HEADER.size
+    while offset < len(data):
+        if offset + _FRAME.size > len(data):
+            break
+        timestamp, count = _FRAME.unpack_from(data, offset)
+        offset += _FRAME.size
+        end = offset + count + count * _HAND_BYTES
+        if end > len(data):
+            break
+        handedness = tuple(HANDEDNESS_LABELS[b] for b in data[offset:offset + count])
+        offset += count
+        landmarks = np.frombuffer(data, dtype=np.float32, count=count * NUM_LANDMARKS * 3, offset=offset)
+        frames.append(TraceFrame(timestamp, landmarks.reshape(count, NUM_LANDMARKS, 3), handedness))
+        offset = end
+    return frames
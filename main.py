@@ -1,61 +1,255 @@
 # main.py
 
-import cv2
+import argparse
 import queue
 import threading
 import signal
 import sys
-from gesture_engine import GestureEngine
-from voice_engine import VoiceEngine
+import time
+from metrics import METRICS, STARTUP, JsonMetricsLogger, MetricsServer
 
-def main():
-    # Create shared resources for threads
-    stop_event = threading.Event()
-    image_queue = queue.Queue(maxsize=1)
+# Seconds the engines get, together, to shut down after the stop event is set.
+ENGINE_STOP_TIMEOUT = 5.0
+# Screen size the cursor is mapped to in --dry-run, so replays do not depend on the display.
+DRY_RUN_SCREEN = (1920, 1080)
 
-    # --- Signal Handler for Ctrl+C ---
-    def signal_handler(sig, frame):
-        print("\nCtrl+C received, stopping all processes...")
-        stop_event.set()
+def positive_float(text):
+    value = float(text)
+    if not value > 0:
+        raise argparse.ArgumentTypeError(f"must be greater than 0, got {text}")
+    return value
 
-    signal.signal(signal.SIGINT, signal_handler)
+def parse_args():
+    parser = argparse.ArgumentParser(description="Gesture controlled virtual mouse with voice assistant")
+    parser.add_argument("--record", metavar="TRACE",
+                        help="record per-frame hand landmarks to a binary trace file")
+    parser.add_argument("--replay", metavar="TRACE",
+                        help="replay a landmark trace through the gesture controls (no camera, no voice)")
+    parser.add_argument("--realtime", action="store_true",
+                        help="with --replay, reproduce the recorded frame timing")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="with --replay, record and print the mouse, keyboard and volume/brightness "
+                             "commands instead of executing them (no pyautogui or display needed)")
+    parser.add_argument("--inference-process", action="store_true",
+                        help="run MediaPipe hand inference in a separate worker process")
+    parser.add_argument("--roi-tracking", action="store_true",
+                        help="run inference on a downscaled crop around the tracked hands")
+    parser.add_argument("--skip-inference", action="store_true",
+                        help="run inference on every k-th frame (k adapts to its cost) and predict landmarks in between")
+    parser.add_argument("--bindings", metavar="PATH",
+                        help="JSON file mapping gesture names to actions, overriding the defaults")
+    parser.add_argument("--idle-after", type=float, metavar="SECONDS",
+                        help="pause hand inference after SECONDS without hands until camera motion wakes it")
+    parser.add_argument("--wake-latency", type=float, default=0.2, metavar="SECONDS",
+                        help="camera read interval while idle, i.e. how quickly motion is noticed (default: 0.2)")
+    display = parser.add_mutually_exclusive_group()
+    display.add_argument("--headless", action="store_const", const="headless", dest="display", default="full",
+                         help="no preview window; frames are never converted or drawn")
+    display.add_argument("--preview", action="store_const", const="preview", dest="display",
+                         help="show a downscaled preview at a capped rate instead of every full frame")
+    parser.add_argument("--preview-rate", type=positive_float, default=10.0, metavar="HZ",
+                        help="maximum --preview refresh rate (default: 10)")
+    parser.add_argument("--preview-scale", type=positive_float, default=0.5,
+                        help="--preview size relative to the camera frame (default: 0.5)")
+    parser.add_argument("--recalibrate", action="store_true",
+                        help="select and calibrate the microphone again instead of reusing the cached calibration")
+    parser.add_argument("--metrics-overlay", action="store_true",
+                        help="draw FPS, dropped frames and per-stage p95 latency on the preview")
+    parser.add_argument("--metrics-log", metavar="PATH",
+                        help="append a JSON metrics snapshot to PATH every --metrics-interval seconds")
+    parser.add_argument("--metrics-interval", type=float, default=10.0, metavar="SECONDS",
+                        help="interval between --metrics-log snapshots (default: 10)")
+    parser.add_argument("--metrics-port", type=int, metavar="PORT",
+                        help="serve the metrics snapshot as JSON on http://127.0.0.1:PORT/metrics")
+    parser.add_argument("--metrics-socket", metavar="PATH",
+                        help="serve the metrics snapshot as JSON on a Unix socket")
+    parser.add_argument("--event-socket", metavar="PATH",
+                        help="stream landmarks, gestures and actions to other local processes on a Unix socket")
+    parser.add_argument("--event-preview", action="store_true",
+                        help="with --event-socket, also share the preview frame through shared memory")
+    args = parser.parse_args()
+    if args.dry_run and not args.replay:
+        parser.error("--dry-run requires --replay")
+    if args.record and args.skip_inference:
+        parser.error("--record cannot be combined with --skip-inference: predicted landmarks "
+                     "would be recorded as if they were measured")
+    if args.event_preview and not args.event_socket:
+        parser.error("--event-preview requires --event-socket")
+    if args.event_preview and args.display == "headless":
+        parser.error("--event-preview shares the rendered preview, which --headless never draws")
+    return args
 
-    # --- Initialize Engines ---
-    print("Initializing Gesture Engine...")
-    gesture_engine = GestureEngine(stop_event, image_queue)
-    
-    print("Initializing Voice Engine...")
-    voice_engine = VoiceEngine(stop_event)
-
-    # --- Start Threads ---
-    gesture_thread = threading.Thread(target=gesture_engine.run, daemon=True)
-    voice_thread = threading.Thread(target=voice_engine.run, daemon=True)
-    
-    print("Starting threads...")
-    gesture_thread.start()
-    voice_thread.start()
+def start_engine(name, build, stop_event):
+    """Builds and runs an engine on its own thread, so the engines' imports and device setup overlap."""
+    def target():
+        try:
+            engine = build()
+            STARTUP.mark(f"{name} engine created")
+            engine.run()
+        except Exception:
+            stop_event.set()
+            raise
+
+    thread = threading.Thread(target=target, name=f"{name}-engine", daemon=True)
+    thread.start()
+    return thread
+
+def report_startup(milestones, timeout=30.0):
+    """Prints the startup timeline once all milestones were reached, or after timeout seconds."""
+    def target():
+        STARTUP.wait(milestones, timeout)
+        STARTUP.report()
+
+    threading.Thread(target=target, name="startup-report", daemon=True).start()
+
+def build_gesture_engine(args, stop_event, image_queue, events=None):
+    from gesture_engine import GestureEngine
+
+    return GestureEngine(stop_event, image_queue, trace_path=args.record,
+                         inference_process=args.inference_process,
+                         roi_tracking=args.roi_tracking,
+                         skip_inference=args.skip_inference,
+                         metrics_overlay=args.metrics_overlay,
+                         display=args.display,
+                         preview_rate=args.preview_rate,
+                         preview_scale=args.preview_scale,
+                         idle_after=args.idle_after,
+                         wake_latency=args.wake_latency,
+                         bindings=args.bindings,
+                         events=events)
+
+def build_dry_run_controller(args):
+    """A Controller whose commands are recorded instead of executed; returns (controller, mouse, system)."""
+    from actuator import Actuator, RecordingBackend
+    from cursor_filter import DEFAULT_CURSOR_SETTINGS, build_cursor_filter
+    from gesture_engine import Controller, load_bindings
+    from settings import load_settings
+    from system_control import FakeSystemControl, SystemControlWriter
+
+    mouse, system = RecordingBackend(), FakeSystemControl()
+    actuator = Actuator(mouse)
+    actuator.start()
+    writer = SystemControlWriter(system)
+    writer.start()
+    cursor = build_cursor_filter(load_settings("cursor", DEFAULT_CURSOR_SETTINGS), DRY_RUN_SCREEN)
+    return Controller(load_bindings(args.bindings), cursor=cursor, actuator=actuator, system=writer), mouse, system
+
+def print_dry_run(mouse, system):
+    print(f"[replay] {len(mouse.calls)} mouse/keyboard commands, {len(system.writes)} volume/brightness writes")
+    for _, name, args in mouse.calls:
+        print(f"  {name} {' '.join(f'{a:.1f}' if isinstance(a, float) else str(a) for a in args)}".rstrip())
+    for control, level in system.writes:
+        print(f"  set_{control} {level}")
+
+def build_voice_engine(args, stop_event):
+    from voice_engine import VoiceEngine
+
+    return VoiceEngine(stop_event, recalibrate=args.recalibrate)
+
+def show_previews(stop_event, image_queue):
+    """Shows the gesture engine's previews until Esc is pressed or the stop event is set.
+
+    Only called with a display: OpenCV's headless builds have no window functions.
+    """
+    import cv2
 
-    # --- Main Loop (UI) ---
-    print("Application started. Press 'Esc' in the gesture window or Ctrl+C to exit.")
     while not stop_event.is_set():
         try:
             # Get the latest frame from the gesture engine to display
             image = image_queue.get(timeout=0.1)
+            started = time.perf_counter()
             cv2.imshow("Smooth Gesture Mouse Controller", image)
+            STARTUP.mark("first preview shown")
 
             # Check for 'Esc' key to exit
-            if cv2.waitKey(5) & 0xFF == 27:
+            key = cv2.waitKey(5) & 0xFF
+            METRICS.since("display.render", started)
+            METRICS.tick("display")
+            if key == 27:
                 print("'Esc' key pressed, stopping...")
                 stop_event.set()
                 break
         except queue.Empty:
             # This is expected if the gesture engine is slower than the UI loop
             continue
-    
+    cv2.destroyAllWindows()
+
+def main():
+    args = parse_args()
+
+    # Create shared resources for threads
+    stop_event = threading.Event()
+    image_queue = queue.Queue(maxsize=1)
+
+    # --- Event Stream ---
+    events = None
+    if args.event_socket:
+        from event_stream import EventPublisher
+        events = EventPublisher(args.event_socket, preview=args.event_preview).start()
+
+    # --- Replay Mode (headless) ---
+    if args.replay:
+        from gesture_engine import GestureEngine
+        controller = mouse = system = None
+        if args.dry_run:
+            controller, mouse, system = build_dry_run_controller(args)
+        GestureEngine(stop_event, image_queue, bindings=args.bindings, controller=controller,
+                      events=events).replay(args.replay, realtime=args.realtime)
+        if events:
+            events.stop()
+        if args.dry_run:
+            print_dry_run(mouse, system)
+        sys.exit(0)
+
+    # --- Signal Handler for Ctrl+C ---
+    def signal_handler(sig, frame):
+        print("\nCtrl+C received, stopping all processes...")
+        stop_event.set()
+
+    signal.signal(signal.SIGINT, signal_handler)
+
+    # --- Metrics Exporters ---
+    metrics_logger = metrics_server = None
+    if args.metrics_log:
+        metrics_logger = JsonMetricsLogger(args.metrics_log, args.metrics_interval)
+        metrics_logger.start()
+    if args.metrics_port is not None or args.metrics_socket:
+        metrics_server = MetricsServer(port=args.metrics_port, socket_path=args.metrics_socket)
+        metrics_server.start()
+
+    # --- Start Engines (concurrently, each on its own thread) ---
+    print("Starting engines...")
+    engines = [
+        start_engine("gesture", lambda: build_gesture_engine(args, stop_event, image_queue, events), stop_event),
+        start_engine("voice", lambda: build_voice_engine(args, stop_event), stop_event),
+    ]
+    report_startup(["first frame inferred", "voice ready"])
+
+    # --- Main Loop (UI) ---
+    if args.display == "headless":
+        print("Application started headless. Press Ctrl+C or say 'stop program' to exit.")
+        while not stop_event.is_set():
+            stop_event.wait(0.1)
+    else:
+        print("Application started. Press 'Esc' in the gesture window or Ctrl+C to exit.")
+        show_previews(stop_event, image_queue)
+
     # --- Cleanup ---
     print("Cleaning up resources...")
-    # Threads will stop automatically because they are daemons
-    cv2.destroyAllWindows()
+    # Let the engines finish their loops so traces are flushed and devices released;
+    # an engine stuck in a blocking read is abandoned (the threads are daemons).
+    stop_event.set()
+    deadline = time.perf_counter() + ENGINE_STOP_TIMEOUT
+    for thread in engines:
+        thread.join(timeout=max(0.0, deadline - time.perf_counter()))
+        if thread.is_alive():
+            print(f"{thread.name} did not stop within {ENGINE_STOP_TIMEOUT:.0f}s")
+    if metrics_logger:
+        metrics_logger.stop()
+    if metrics_server:
+        metrics_server.stop()
+    if events:
+        events.stop()
     sys.exit(0)
 
 if __name__ == "__main__":
@@ -0,0 +1,224 @@
+# metrics.py
+
+import json
+import os
+import socketserver
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ========================= REGISTRY ========================= #
+class Metrics:
+    """Process-wide latency histograms, counters and frame-rate meters.
+
+    Latencies are kept as a rolling window of the last `window` samples per
+    stage (seconds in, milliseconds out). Recording is a dict lookup plus a
+    deque append, so it is cheap enough for every stage of every frame and
+    safe to call from any thread.
+    """
+
+    def __init__(self, window=1000):
+        self.window = window
+        self.started = time.time()
+        self._latencies = {}
+        self._counters = {}
+        self._ticks = {}
+        self._lock = threading.Lock()
+
+    def reset(self):
+        """Drops every sample, counter and frame-rate meter (e.g. between benchmark runs)."""
+        with self._lock:
+            self.started = time.time()
+            self._latencies.clear()
+            self._counters.clear()
+            self._ticks.clear()
+
+    def _series(self, table, name, maxlen):
+        series = table.get(name)
+        if series is None:
+            with self._lock:
+                series = table.setdefault(name, deque(maxlen=maxlen))
+        return series
+
+    def observe(self, stage, seconds):
+        self._series(self._latencies, stage, self.window).append(seconds)
+
+    def since(self, stage, start):
+        """Records the time elapsed since `start` (a perf_counter value) and returns now."""
+        now = time.perf_counter()
+        self._series(self._latencies, stage, self.window).append(now - start)
+        return now
+
+    def count(self, name, n=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def tick(self, name):
+        """Marks one frame for the `name` frame-rate meter."""
+        self._series(self._ticks, name, 120).append(time.perf_counter())
+
+    def fps(self, name):
+        ticks = list(self._ticks.get(name, ()))
+        if len(ticks) < 2 or ticks[-1] == ticks[0]:
+            return 0.0
+        return (len(ticks) - 1) / (ticks[-1] - ticks[0])
+
+    def stats(self, stage):
+        """Returns {"count", "p50_ms", "p95_ms", "p99_ms"} for a stage, or None before its first sample."""
+        # Imported here so that importing metrics (first thing main.py does) stays cheap.
+        import numpy as np
+        values = np.array(self._latencies.get(stage, ())) * 1000.0
+        if not len(values):
+            return None
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        return {"count": len(values), "p50_ms": round(float(p50), 3),
+                "p95_ms": round(float(p95), 3), "p99_ms": round(float(p99), 3)}
+
+    def snapshot(self):
+        stages = {}
+        for stage in list(self._latencies):
+            stats = self.stats(stage)
+            if stats is not None:
+                stages[stage] = stats
+        with self._lock:
+            counters = dict(self._counters)
+        return {
+            "time": time.time(),
+            "uptime_s": round(time.time() - self.started, 1),
+            "fps": {name: round(self.fps(name), 1) for name in list(self._ticks)},
+            "counters": counters,
+            "latency": stages,
+        }
+
+METRICS = Metrics()
+
+# ========================= STARTUP TIMELINE ========================= #
+class Timeline:
+    """Times at which named milestones were first reached, relative to `start` (a perf_counter value).
+
+    Only the first mark() of a name counts, and threads can wait() for
+    milestones. STARTUP starts when this module is first imported, which
+    main.py does before anything heavy.
+    """
+
+    def __init__(self, start=None):
+        self.start = time.perf_counter() if start is None else start
+        self._marks = {}
+        self._changed = threading.Condition()
+
+    def mark(self, name):
+        if name in self._marks:
+            return
+        with self._changed:
+            self._marks.setdefault(name, time.perf_counter())
+            self._changed.notify_all()
+
+    def wait(self, names, timeout=None):
+        """Blocks until every milestone in `names` was reached; returns False on timeout."""
+        with self._changed:
+            return self._changed.wait_for(lambda: all(n in self._marks for n in names), timeout)
+
+    def elapsed(self):
+        """Returns [(milestone, seconds since start)] in the order they were reached."""
+        with self._changed:
+            marks = sorted(self._marks.items(), key=lambda item: item[1])
+        return [(name, at - self.start) for name, at in marks]
+
+    def report(self, prefix="[startup]"):
+        for name, seconds in self.elapsed():
+            print(f"{prefix} {seconds * 1000.0:>7.0f}ms  {name}")
+
+STARTUP = Timeline()
+
+# ========================= OVERLAY ========================= #
+OVERLAY_STAGES = ["gesture.inference", "gesture.classify", "gesture.actuate", "gesture.end_to_end"]
+
+def draw_overlay(image, metrics=METRICS, stages=OVERLAY_STAGES):
+    """Writes FPS, dropped frames and the p95 of a few stages in the corner of a BGR frame."""
+    import cv2
+    lines = [f"FPS {metrics.fps('gesture'):.1f}  dropped {metrics._counters.get('gesture.dropped', 0)}"]
+    for stage in stages:
+        stats = metrics.stats(stage)
+        if stats is not None:
+            lines.append(f"{stage.split('.', 1)[1]} p95 {stats['p95_ms']:.1f}ms")
+    y = image.shape[0] - 10 - 18 * (len(lines) - 1)
+    for line in lines:
+        cv2.putText(image, line, (10, y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1, cv2.LINE_AA)
+        y += 18
+
+# ========================= EXPORTERS ========================= #
+class JsonMetricsLogger(threading.Thread):
+    """Appends one JSON snapshot per line to `path` every `interval` seconds."""
+
+    def __init__(self, path, interval=10.0, metrics=METRICS):
+        super().__init__(name="metrics-log", daemon=True)
+        self.path = path
+        self.interval = interval
+        self.metrics = metrics
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            self.write()
+
+    def write(self):
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(self.metrics.snapshot()) + "\n")
+        except OSError as e:
+            print(f"[metrics] Could not write {self.path}: {e}")
+
+    def stop(self):
+        self._done.set()
+        self.write()
+
+class _HttpHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = json.dumps(self.server.metrics.snapshot()).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class _UnixHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        self.wfile.write(json.dumps(self.server.metrics.snapshot()).encode("utf-8") + b"\n")
+
+class MetricsServer:
+    """Serves the current snapshot as JSON on http://127.0.0.1:<port>/metrics and/or a Unix socket.
+
+    Connecting to the Unix socket returns one JSON line, e.g. `socat - UNIX-CONNECT:<path>`.
+    """
+
+    def __init__(self, port=None, socket_path=None, metrics=METRICS):
+        self.servers = []
+        if port is not None:
+            server = ThreadingHTTPServer(("127.0.0.1", port), _HttpHandler)
+            server.metrics = metrics
+            self.servers.append(server)
+        if socket_path is not None:
+            if os.path.exists(socket_path):
+                os.unlink(socket_path)
+            server = socketserver.ThreadingUnixStreamServer(socket_path, _UnixHandler)
+            server.metrics = metrics
+            self.servers.append(server)
+        self.socket_path = socket_path
+
+    def start(self):
+        for server in self.servers:
+            threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+
+    def stop(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+        if self.socket_path and os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
@@ -0,0 +1,46 @@
+# settings.py
+
+import json
+import os
+
+# ========================= USER SETTINGS ========================= #
+# Per-user settings and caches live in ~/.gesture_mouse. settings.json holds one
+# JSON object per section (e.g. "cursor"); missing files or sections fall back
+# to the caller's defaults so a fresh install needs no configuration.
+CONFIG_DIR = os.path.join(os.path.expanduser("~"), ".gesture_mouse")
+SETTINGS_PATH = os.path.join(CONFIG_DIR, "settings.json")
+
+def config_path(name):
+    return os.path.join(CONFIG_DIR, name)
+
+def load_json(path, default=None):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+    except (OSError, ValueError) as e:
+        print(f"[settings] Could not read {path}: {e}")
+        return default
+
+def save_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+def load_settings(section, defaults=None):
+    """Returns the defaults for a section overlaid with the user's saved values."""
+    values = dict(defaults or {})
+    stored = load_json(SETTINGS_PATH, {})
+    if isinstance(stored, dict) and isinstance(stored.get(section), dict):
+        values.update(stored[section])
+    return values
+
+def save_settings(section, values):
+    stored = load_json(SETTINGS_PATH, {})
+    if not isinstance(stored, dict):
+        stored = {}
+    stored[section] = values
+    save_json(SETTINGS_PATH, stored)
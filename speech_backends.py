@@ -0,0 +1,210 @@
+# speech_backends.py
+
+import argparse
+import json
+import time
+import wave
+from collections import namedtuple
+
+from settings import load_json, load_settings
+
+# ========================= BACKENDS ========================= #
+# A backend turns speech into text. Utterance backends (streaming = False)
+# recognize a whole utterance that speech_recognition has already endpointed.
+# Streaming backends (streaming = True) take raw 16-bit mono PCM chunks as they
+# are captured; accept() returns a Hypothesis whenever the text so far is known
+# (final=False) or the utterance has ended (final=True), and None otherwise.
+Hypothesis = namedtuple("Hypothesis", ["text", "final"])
+
+DEFAULT_SPEECH_SETTINGS = {
+    "backend": "google",
+    "model_path": None,
+    "vocabulary": "free",
+    "script": None,
+    "audio": None,
+    "sample_rate": 16000,
+    "chunk_ms": 50,
+}
+
+class GoogleBackend:
+    """Google Web Speech recognition of whole utterances: the original behaviour, online only."""
+
+    streaming = False
+
+    def recognize(self, recognizer, audio):
+        return recognizer.recognize_google(audio)
+
+    def close(self):
+        pass
+
+class VoskBackend:
+    """Offline streaming recognition with a Vosk (Kaldi) model.
+
+    With a vocabulary the decoder only considers those words, which makes it
+    both faster and far less likely to mishear a command; anything else comes
+    out as unknown and is dropped. Slots such as file names need the free
+    vocabulary.
+    """
+
+    streaming = True
+
+    def __init__(self, model_path, sample_rate=16000, vocabulary=None):
+        from vosk import KaldiRecognizer, Model, SetLogLevel
+
+        if not model_path:
+            raise ValueError("the vosk backend needs model_path, a model from https://alphacephei.com/vosk/models")
+        SetLogLevel(-1)
+        model = Model(model_path)
+        if vocabulary:
+            self._recognizer = KaldiRecognizer(model, sample_rate, json.dumps(list(vocabulary) + ["[unk]"]))
+        else:
+            self._recognizer = KaldiRecognizer(model, sample_rate)
+
+    @staticmethod
+    def _clean(text):
+        return " ".join(w for w in text.split() if w != "[unk]")
+
+    def accept(self, chunk):
+        if self._recognizer.AcceptWaveform(chunk):
+            return Hypothesis(self._clean(json.loads(self._recognizer.Result()).get("text", "")), True)
+        partial = self._clean(json.loads(self._recognizer.PartialResult()).get("partial", ""))
+        return Hypothesis(partial, False) if partial else None
+
+    def close(self):
+        self._recognizer = None
+
+class FileBackend:
+    """Deterministic stand-in for a streaming recognizer, driven by a script instead of audio.
+
+    The script is a list of utterances, {"gap": chunks of silence before it,
+    "partials": [hypotheses...], "final": text}. Every accepted chunk (its
+    content is ignored) advances one step: gap steps return None, then each
+    partial and finally the final hypothesis come out one chunk apart.
+    """
+
+    streaming = True
+
+    def __init__(self, script):
+        if isinstance(script, str):
+            script = load_json(script)
+            if not isinstance(script, list):
+                raise ValueError("a speech script must be a JSON list of utterances")
+        self._events = []
+        for utterance in script:
+            self._events += [None] * int(utterance.get("gap", 0))
+            self._events += [Hypothesis(text, False) for text in utterance.get("partials", [])]
+            self._events.append(Hypothesis(utterance.get("final", ""), True))
+        self._next = 0
+
+    @property
+    def done(self):
+        return self._next >= len(self._events)
+
+    def accept(self, chunk):
+        if self.done:
+            return None
+        self._next += 1
+        return self._events[self._next - 1]
+
+    def close(self):
+        pass
+
+SPEECH_BACKENDS = {"google": GoogleBackend, "vosk": VoskBackend, "file": FileBackend}
+
+def build_backend(settings, grammar=None):
+    """Builds a backend from a settings dict shaped like DEFAULT_SPEECH_SETTINGS."""
+    settings = {**DEFAULT_SPEECH_SETTINGS, **settings}
+    kind = settings["backend"]
+    if kind not in SPEECH_BACKENDS:
+        raise ValueError(f"unknown speech backend {kind!r}, expected one of {sorted(SPEECH_BACKENDS)}")
+    if kind == "vosk":
+        vocabulary = grammar.words() if grammar is not None and settings["vocabulary"] == "commands" else None
+        return VoskBackend(settings["model_path"], settings["sample_rate"], vocabulary)
+    if kind == "file":
+        if not settings["script"]:
+            raise ValueError("the file speech backend needs a script")
+        return FileBackend(settings["script"])
+    return GoogleBackend()
+
+# ========================= AUDIO SOURCES ========================= #
+# Generators of 16-bit mono PCM chunks for streaming backends.
+def microphone_chunks(device_index, sample_rate=16000, chunk_ms=50, check=None):
+    """Reads the microphone; check(source), if given, runs on the opened sr.Microphone and may raise."""
+    import speech_recognition as sr
+
+    chunk = int(sample_rate * chunk_ms / 1000)
+    with sr.Microphone(device_index=device_index, sample_rate=sample_rate, chunk_size=chunk) as source:
+        if check is not None:
+            check(source)
+        while True:
+            yield source.stream.read(source.CHUNK)
+
+def wav_chunks(path, chunk_ms=50, realtime=False):
+    """Plays a 16-bit mono WAV file as chunks, optionally paced like a live microphone."""
+    with wave.open(path, "rb") as wav:
+        if wav.getnchannels() != 1 or wav.getsampwidth() != 2:
+            raise ValueError(f"{path}: expected 16-bit mono audio")
+        frames = int(wav.getframerate() * chunk_ms / 1000)
+        next_at = time.perf_counter()
+        while True:
+            data = wav.readframes(frames)
+            if not data:
+                return
+            if realtime:
+                next_at += chunk_ms / 1000
+                time.sleep(max(0.0, next_at - time.perf_counter()))
+            yield data
+
+def silence_chunks(sample_rate=16000, chunk_ms=50, realtime=True):
+    data = bytes(2 * int(sample_rate * chunk_ms / 1000))
+    while True:
+        if realtime:
+            time.sleep(chunk_ms / 1000)
+        yield data
+
+def main():
+    from voice_commands import CommandGrammar, load_voice_commands
+
+    parser = argparse.ArgumentParser(description="Run a streaming speech backend over a WAV file or script "
+                                                 "and show when each command would fire")
+    parser.add_argument("--backend", choices=[k for k, v in SPEECH_BACKENDS.items() if v.streaming],
+                        default="file")
+    parser.add_argument("--script", help="utterance script for the file backend")
+    parser.add_argument("--audio", help="16-bit mono WAV file to feed the backend")
+    parser.add_argument("--model-path", help="Vosk model directory")
+    parser.add_argument("--vocabulary", choices=["free", "commands"], default="free")
+    parser.add_argument("--chunk-ms", type=int, default=DEFAULT_SPEECH_SETTINGS["chunk_ms"])
+    args = parser.parse_args()
+
+    grammar = CommandGrammar(load_voice_commands())
+    settings = {**load_settings("speech", DEFAULT_SPEECH_SETTINGS), "backend": args.backend,
+                "chunk_ms": args.chunk_ms, "vocabulary": args.vocabulary}
+    if args.script:
+        settings["script"] = args.script
+    if args.model_path:
+        settings["model_path"] = args.model_path
+    backend = build_backend(settings, grammar)
+    if args.audio:
+        chunks = wav_chunks(args.audio, args.chunk_ms)
+    else:
+        chunks = silence_chunks(settings["sample_rate"], args.chunk_ms, realtime=False)
+    fired = False
+    for i, chunk in enumerate(chunks):
+        hypothesis = backend.accept(chunk)
+        if hypothesis is None:
+            if getattr(backend, "done", False):
+                break
+            continue
+        at = f"{(i + 1) * args.chunk_ms:>6}ms"
+        if not hypothesis.final:
+            match = None if fired else grammar.match_partial(hypothesis.text)
+            print(f"{at} partial {hypothesis.text!r}" + (f" -> fires {match.action} {match.slots}" if match else ""))
+            fired = fired or match is not None
+            continue
+        match = None if fired else grammar.match(hypothesis.text)
+        print(f"{at} final   {hypothesis.text!r}" + (f" -> fires {match.action} {match.slots}" if match else ""))
+        fired = False
+    backend.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+# system_control.py
+
+import glob
+import os
+import re
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+# ========================= BACKENDS ========================= #
+# A backend exposes get_/set_ pairs for each control: volume as a 0.0-1.0 scalar
+# and brightness as a 0-100 percentage. Backends are only ever called from the
+# SystemControlWriter thread, which also calls thread_init() once before use.
+CONTROL_RANGES = {"volume": (0.0, 1.0), "brightness": (0, 100)}
+CONTROL_DEFAULTS = {"volume": 0.5, "brightness": 50}
+
+class WindowsSystemControl:
+    """pycaw for the master volume, screen_brightness_control for the display.
+
+    The IAudioEndpointVolume interface is activated once and reused.
+    """
+
+    def __init__(self):
+        self._volume = None
+
+    def thread_init(self):
+        import comtypes
+        comtypes.CoInitialize()
+
+    def _endpoint(self):
+        if self._volume is None:
+            from ctypes import cast, POINTER
+            from comtypes import CLSCTX_ALL
+            from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume
+            devices = AudioUtilities.GetSpeakers()
+            interface = devices.Activate(IAudioEndpointVolume._iid_, CLSCTX_ALL, None)
+            self._volume = cast(interface, POINTER(IAudioEndpointVolume))
+        return self._volume
+
+    def get_volume(self):
+        return self._endpoint().GetMasterVolumeLevelScalar()
+
+    def set_volume(self, level):
+        self._endpoint().SetMasterVolumeLevelScalar(level, None)
+
+    def get_brightness(self):
+        import screen_brightness_control as sbcontrol
+        return sbcontrol.get_brightness(display=0)[0]
+
+    def set_brightness(self, level):
+        import screen_brightness_control as sbcontrol
+        sbcontrol.set_brightness(int(level))
+
+class LinuxSystemControl:
+    """PulseAudio/PipeWire (pactl) or ALSA (amixer) for volume; sysfs backlight or brightnessctl for brightness.
+
+    Tool and device discovery happens once, on construction.
+    """
+
+    def __init__(self):
+        self.pactl = shutil.which("pactl")
+        self.amixer = shutil.which("amixer")
+        self.brightnessctl = shutil.which("brightnessctl")
+        backlights = sorted(glob.glob("/sys/class/backlight/*"))
+        self.backlight = backlights[0] if backlights else None
+
+    def thread_init(self):
+        pass
+
+    def _run(self, *args):
+        return subprocess.run(args, capture_output=True, text=True, check=True, timeout=2).stdout
+
+    def get_volume(self):
+        if self.pactl:
+            out = self._run(self.pactl, "get-sink-volume", "@DEFAULT_SINK@")
+        elif self.amixer:
+            out = self._run(self.amixer, "get", "Master")
+        else:
+            raise RuntimeError("neither pactl nor amixer is installed")
+        match = re.search(r"(\d+)%", out)
+        if not match:
+            raise RuntimeError(f"could not parse volume from {out!r}")
+        return int(match.group(1)) / 100.0
+
+    def set_volume(self, level):
+        percent = f"{round(level * 100)}%"
+        if self.pactl:
+            self._run(self.pactl, "set-sink-volume", "@DEFAULT_SINK@", percent)
+        elif self.amixer:
+            self._run(self.amixer, "-q", "set", "Master", percent)
+        else:
+            raise RuntimeError("neither pactl nor amixer is installed")
+
+    def _read_backlight(self, name):
+        with open(os.path.join(self.backlight, name)) as f:
+            return int(f.read().strip())
+
+    def get_brightness(self):
+        if self.backlight:
+            return round(100 * self._read_backlight("brightness") / self._read_backlight("max_brightness"))
+        if self.brightnessctl:
+            # -m prints: device,class,current,percent%,max
+            return int(self._run(self.brightnessctl, "-m").split(",")[3].rstrip("%"))
+        raise RuntimeError("no backlight device or brightnessctl found")
+
+    def set_brightness(self, level):
+        if self.backlight:
+            try:
+                value = round(self._read_backlight("max_brightness") * level / 100)
+                with open(os.path.join(self.backlight, "brightness"), "w") as f:
+                    f.write(str(value))
+                return
+            except PermissionError:
+                if not self.brightnessctl:
+                    raise
+        if self.brightnessctl:
+            self._run(self.brightnessctl, "-q", "set", f"{int(level)}%")
+            return
+        raise RuntimeError("no backlight device or brightnessctl found")
+
+class FakeSystemControl:
+    """In-memory backend for tests and unsupported platforms. Every write is recorded."""
+
+    def __init__(self, volume=0.5, brightness=50):
+        self.volume = volume
+        self.brightness = brightness
+        self.writes = []
+
+    def thread_init(self):
+        pass
+
+    def get_volume(self):
+        return self.volume
+
+    def set_volume(self, level):
+        self.volume = level
+        self.writes.append(("volume", level))
+
+    def get_brightness(self):
+        return self.brightness
+
+    def set_brightness(self, level):
+        self.brightness = level
+        self.writes.append(("brightness", level))
+
+def default_backend():
+    if sys.platform == "win32":
+        return WindowsSystemControl()
+    if sys.platform.startswith("linux"):
+        return LinuxSystemControl()
+    print(f"[system] No volume/brightness backend for {sys.platform}; using an in-memory stand-in.")
+    return FakeSystemControl()
+
+# ========================= RATE-LIMITED WRITER ========================= #
+class SystemControlWriter(threading.Thread):
+    """Applies volume/brightness adjustments on a background thread.
+
+    A pinch calls begin_adjust() once and then adjust(control, delta) every time
+    its level changes; neither call blocks. The start level of a control is
+    read from the backend only when the first adjustment for it arrives, and
+    only the latest pending delta per control is written, at most max_rate
+    times per second.
+    """
+
+    def __init__(self, backend=None, max_rate=15.0):
+        super().__init__(name="system-control", daemon=True)
+        self.backend = backend or default_backend()
+        self.min_interval = 1.0 / max_rate
+        self._pending = {}
+        self._generation = 0
+        self._applied_generation = 0
+        self._start = {}
+        self._written = {}
+        self._wakeup = threading.Condition()
+        self._stopping = False
+
+    def begin_adjust(self):
+        with self._wakeup:
+            self._generation += 1
+
+    def adjust(self, control, delta):
+        with self._wakeup:
+            # Keyed by pinch generation so a new pinch never reuses the previous pinch's start level.
+            self._pending[(self._generation, control)] = delta
+            self._wakeup.notify()
+
+    def _apply(self, control, delta):
+        start = self._start.get(control)
+        if start is None:
+            try:
+                start = getattr(self.backend, "get_" + control)()
+            except Exception as e:
+                print(f"[{control}] could not read current level: {e}")
+                start = CONTROL_DEFAULTS[control]
+            self._start[control] = start
+        low, high = CONTROL_RANGES[control]
+        value = max(low, min(high, start + delta))
+        if self._written.get(control) == value:
+            return
+        try:
+            getattr(self.backend, "set_" + control)(value)
+            self._written[control] = value
+        except Exception as e:
+            print(f"[{control}] error: {e}")
+
+    def run(self):
+        self.backend.thread_init()
+        while True:
+            with self._wakeup:
+                while not self._pending and not self._stopping:
+                    self._wakeup.wait()
+                if not self._pending:
+                    return
+                pending, self._pending = self._pending, {}
+            started = time.perf_counter()
+            for (generation, control), delta in sorted(pending.items()):
+                if generation != self._applied_generation:
+                    self._applied_generation = generation
+                    self._start, self._written = {}, {}
+                self._apply(control, delta)
+            time.sleep(max(0.0, self.min_interval - (time.perf_counter() - started)))
+
+    def stop(self, timeout=1.0):
+        """Writes whatever is still pending, then ends the thread."""
+        with self._wakeup:
+            self._stopping = True
+            self._wakeup.notify()
+        if self.is_alive():
+            self.join(timeout)
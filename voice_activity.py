@@ -0,0 +1,331 @@
+# voice_activity.py
+
+import argparse
+import threading
+import time
+import wave
+from collections import deque, namedtuple
+
+import numpy as np
+
+from metrics import METRICS
+
+# ========================= VAD ========================= #
+# A VAD classifies one frame of 16-bit mono PCM as speech or not.
+class EnergyVad:
+    """Speech when a frame's RMS exceeds `ratio` times the background noise level.
+
+    The noise level starts at the mean RMS of the first calibration_frames
+    frames (or at threshold / ratio when a threshold is given) and then follows
+    non-speech frames slowly, like speech_recognition's dynamic energy threshold.
+    """
+
+    def __init__(self, ratio=3.0, min_rms=60.0, threshold=None, calibration_frames=15, adapt=0.05):
+        self.ratio = ratio
+        self.min_rms = min_rms
+        self.adapt = adapt
+        self.calibration_frames = 0 if threshold else calibration_frames
+        self._noise = threshold / ratio if threshold else None
+        self._calibration = []
+
+    @property
+    def calibrated(self):
+        return len(self._calibration) >= self.calibration_frames
+
+    @property
+    def threshold(self):
+        return None if self._noise is None else max(self.min_rms, self._noise * self.ratio)
+
+    def is_speech(self, frame):
+        samples = np.frombuffer(frame, dtype=np.int16).astype(np.float32)
+        rms = float(np.sqrt(np.mean(samples * samples))) if samples.size else 0.0
+        if len(self._calibration) < self.calibration_frames:
+            self._calibration.append(rms)
+            self._noise = float(np.mean(self._calibration))
+            return False
+        speech = rms > self.threshold
+        if not speech:
+            self._noise += self.adapt * (rms - self._noise)
+        return speech
+
+class WebRtcVad:
+    """The WebRTC GMM voice detector (pip install webrtcvad); needs 10, 20 or 30 ms frames."""
+
+    def __init__(self, sample_rate=16000, aggressiveness=2):
+        import webrtcvad
+
+        self.sample_rate = sample_rate
+        self._vad = webrtcvad.Vad(aggressiveness)
+
+    def is_speech(self, frame):
+        return self._vad.is_speech(frame, self.sample_rate)
+
+# "listener" keeps speech_recognition's own background listener instead of a VAD.
+VADS = ["energy", "webrtc", "listener"]
+
+DEFAULT_VAD_SETTINGS = {
+    "type": "energy",
+    "frame_ms": 30,
+    "onset_ms": 60,
+    "hangover_ms": 300,
+    "preroll_ms": 300,
+    "min_speech_ms": 120,
+    "max_utterance_s": 8.0,
+    "aggressiveness": 2,
+    "workers": 2,
+    "max_pending": 4,
+    "max_age": 3.0,
+}
+
+def build_vad(settings, sample_rate=16000, threshold=None):
+    kind = settings["type"]
+    if kind == "energy":
+        return EnergyVad(threshold=threshold)
+    if kind == "webrtc":
+        return WebRtcVad(sample_rate, settings["aggressiveness"])
+    raise ValueError(f"unknown VAD type {kind!r}, expected one of {VADS}")
+
+# ========================= SEGMENTER ========================= #
+# speech_end_at is the time the last speech frame was pushed, ended_at the time
+# the utterance was closed; endpointing delay is the difference.
+Utterance = namedtuple("Utterance", ["seq", "audio", "speech_end_at", "ended_at"])
+
+class UtteranceSegmenter:
+    """Cuts a stream of fixed-size frames into utterances with a frame-level VAD.
+
+    Speech starts after onset_ms of consecutive speech frames; the preroll_ms
+    of audio before that point is kept in a ring buffer and prepended, so word
+    onsets are not clipped. Speech ends after hangover_ms without a speech
+    frame (instead of speech_recognition's 0.8 s pause_threshold) or at
+    max_utterance_s. Utterances with less than min_speech_ms of speech frames
+    are discarded as noise.
+    """
+
+    def __init__(self, vad, frame_ms=30, onset_ms=60, hangover_ms=300, preroll_ms=300, min_speech_ms=120,
+                 max_utterance_s=8.0):
+        self.vad = vad
+        self.frame_ms = frame_ms
+        self.onset_frames = max(1, round(onset_ms / frame_ms))
+        self.hangover_frames = max(1, round(hangover_ms / frame_ms))
+        self.min_speech_frames = max(1, round(min_speech_ms / frame_ms))
+        self.max_frames = int(max_utterance_s * 1000 / frame_ms)
+        self.active = False
+        self._preroll = deque(maxlen=max(self.onset_frames, round(preroll_ms / frame_ms)))
+        self._frames = []
+        self._run = 0
+        self._voiced = 0
+        self._speech_end_at = None
+        self._seq = 0
+
+    @classmethod
+    def from_settings(cls, vad, settings):
+        return cls(vad, settings["frame_ms"], settings["onset_ms"], settings["hangover_ms"], settings["preroll_ms"],
+                   settings["min_speech_ms"], settings["max_utterance_s"])
+
+    def push(self, frame, now=None):
+        """Adds one frame; returns an Utterance when this frame closed one, else None."""
+        now = time.perf_counter() if now is None else now
+        speech = self.vad.is_speech(frame)
+        if not self.active:
+            self._preroll.append(frame)
+            self._run = self._run + 1 if speech else 0
+            if self._run >= self.onset_frames:
+                self.active = True
+                self._frames = list(self._preroll)
+                self._preroll.clear()
+                self._run, self._voiced, self._speech_end_at = 0, self.onset_frames, now
+            return None
+        self._frames.append(frame)
+        if speech:
+            self._run, self._speech_end_at = 0, now
+            self._voiced += 1
+        else:
+            self._run += 1
+        if self._run >= self.hangover_frames or len(self._frames) >= self.max_frames:
+            return self._close(now)
+        return None
+
+    def _close(self, now):
+        frames, voiced = self._frames, self._voiced
+        self.active, self._frames, self._run = False, [], 0
+        if voiced < self.min_speech_frames:
+            return None
+        self._seq += 1
+        return Utterance(self._seq, b"".join(frames), self._speech_end_at, now)
+
+# ========================= WORKER POOL ========================= #
+class RecognitionPool:
+    """Recognizes utterances concurrently on a few worker threads.
+
+    recognize(utterance) returns text or None; on_result(utterance, text) runs
+    on a worker thread, one at a time, in utterance order: a result that is
+    ready early is held until every earlier utterance has been recognized or
+    dropped. At most max_pending utterances wait; when another arrives the
+    oldest is dropped. Utterances that ended more than max_age seconds ago are
+    dropped as stale: before recognition, while held, or when their result
+    arrives, and they stop holding later results back from then on. Acting
+    on them would be more surprising than ignoring them.
+    """
+
+    def __init__(self, recognize, on_result, workers=2, max_pending=4, max_age=3.0):
+        self.recognize = recognize
+        self.on_result = on_result
+        self.max_pending = max_pending
+        self.max_age = max_age
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._flush = False
+        # Submitted utterances without a result yet ({seq: ended_at}), and results waiting for them.
+        self._state_lock = threading.Lock()
+        self._outstanding = {}
+        self._held = {}
+        # Serializes on_result, so results are handed on in order.
+        self._result_lock = threading.Lock()
+        self._done = False
+        self._threads = [threading.Thread(target=self._work, name=f"voice-{i}", daemon=True) for i in range(workers)]
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def submit(self, utterance):
+        with self._state_lock:
+            self._outstanding[utterance.seq] = utterance.ended_at
+        with self._cond:
+            if len(self._pending) >= self.max_pending:
+                dropped = self._pending.popleft()
+                METRICS.count("voice.dropped")
+                with self._state_lock:
+                    self._outstanding.pop(dropped.seq, None)
+                # Results it held back are handed on by a worker, not on this (audio) thread.
+                self._flush = True
+            self._pending.append(utterance)
+            self._cond.notify()
+
+    def _hold_timeout(self):
+        """Seconds until the oldest utterance holding back a result stops doing so, or None."""
+        with self._state_lock:
+            if not self._held:
+                return None
+            oldest = time.perf_counter() - self.max_age
+            blocking = [s for s, ended_at in self._outstanding.items() if ended_at >= oldest]
+            if not blocking:
+                return None
+            ended_at = self._outstanding[min(blocking)]
+        return max(0.01, ended_at + self.max_age - time.perf_counter())
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._done and not self._flush:
+                    if not self._cond.wait(self._hold_timeout()):
+                        self._flush = True
+                if self._done:
+                    return
+                flush, self._flush = self._flush, False
+                utterance = self._pending.popleft() if self._pending else None
+            if flush:
+                self._finish(None, None)
+            if utterance is None:
+                continue
+            started = METRICS.since("voice.queue_wait", utterance.ended_at)
+            if started - utterance.ended_at > self.max_age:
+                METRICS.count("voice.stale")
+                self._finish(utterance.seq, None)
+                continue
+            self._finish(utterance.seq, (utterance, self.recognize(utterance)))
+
+    def _finish(self, seq, result):
+        """Records seq as done (result None: dropped) and hands on every result no earlier utterance holds back."""
+        with self._result_lock:
+            with self._state_lock:
+                self._outstanding.pop(seq, None)
+                if result is not None:
+                    self._held[seq] = result
+                oldest = time.perf_counter() - self.max_age
+                blocking = [s for s, ended_at in self._outstanding.items() if ended_at >= oldest]
+                first_blocking = min(blocking, default=None)
+                ready = [s for s in sorted(self._held) if first_blocking is None or s < first_blocking]
+                results = [self._held.pop(s) for s in ready]
+            for utterance, text in results:
+                if time.perf_counter() - utterance.ended_at > self.max_age:
+                    METRICS.count("voice.stale")
+                    continue
+                self.on_result(utterance, text)
+
+    def stop(self):
+        with self._cond:
+            self._done = True
+            self._cond.notify_all()
+
+# ========================= WAV FIXTURES ========================= #
+def read_wav_frames(path, frame_ms=30):
+    """Returns (sample_rate, [frames]) of a 16-bit mono WAV file."""
+    with wave.open(path, "rb") as wav:
+        if wav.getnchannels() != 1 or wav.getsampwidth() != 2:
+            raise ValueError(f"{path}: expected 16-bit mono audio")
+        rate = wav.getframerate()
+        size = int(rate * frame_ms / 1000)
+        data = wav.readframes(wav.getnframes())
+    step = 2 * size
+    return rate, [data[i:i + step] for i in range(0, len(data) - step + 1, step)]
+
+def measure_fixture(path, settings, recognize=None):
+    """Segments a WAV fixture on the audio clock; returns one row per utterance.
+
+    endpoint_ms is the delay from the last speech frame to the end of the
+    utterance (the old listener waited pause_threshold, 800 ms, for this).
+    With recognize(audio_data) the recognition time is measured too, and
+    total_ms is end of speech to recognized text.
+    """
+    import speech_recognition as sr
+
+    rate, frames = read_wav_frames(path, settings["frame_ms"])
+    segmenter = UtteranceSegmenter.from_settings(build_vad(settings, rate), settings)
+    rows = []
+    for i, frame in enumerate(frames):
+        # The audio clock: a frame is available once its last sample was captured.
+        utterance = segmenter.push(frame, now=(i + 1) * settings["frame_ms"] / 1000)
+        if utterance is None:
+            continue
+        row = {"utterance": utterance.seq, "speech_end_s": round(utterance.speech_end_at, 3),
+               "endpoint_ms": (utterance.ended_at - utterance.speech_end_at) * 1000.0}
+        if recognize is not None:
+            started = time.perf_counter()
+            try:
+                row["text"] = recognize(sr.AudioData(utterance.audio, rate, 2))
+            except sr.UnknownValueError:
+                row["text"] = None
+            row["recognition_ms"] = (time.perf_counter() - started) * 1000.0
+            row["total_ms"] = row["endpoint_ms"] + row["recognition_ms"]
+        rows.append(row)
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure end-of-speech latency on recorded WAV fixtures")
+    parser.add_argument("wav", nargs="+", help="16-bit mono WAV recordings of spoken commands")
+    parser.add_argument("--vad", choices=VADS[:2], default=DEFAULT_VAD_SETTINGS["type"])
+    parser.add_argument("--hangover-ms", type=int, default=DEFAULT_VAD_SETTINGS["hangover_ms"])
+    parser.add_argument("--preroll-ms", type=int, default=DEFAULT_VAD_SETTINGS["preroll_ms"])
+    parser.add_argument("--recognize", action="store_true",
+                        help="also recognize each utterance with Google (online) and time it")
+    args = parser.parse_args()
+
+    settings = {**DEFAULT_VAD_SETTINGS, "type": args.vad, "hangover_ms": args.hangover_ms,
+                "preroll_ms": args.preroll_ms}
+    recognize = None
+    if args.recognize:
+        import speech_recognition as sr
+        recognize = sr.Recognizer().recognize_google
+    for path in args.wav:
+        rows = measure_fixture(path, settings, recognize)
+        print(f"{path}: {len(rows)} utterances")
+        for row in rows:
+            line = f"  #{row['utterance']} speech ended {row['speech_end_s']:.2f}s, endpoint {row['endpoint_ms']:.0f}ms"
+            if "total_ms" in row:
+                line += f", recognition {row['recognition_ms']:.0f}ms, total {row['total_ms']:.0f}ms: {row['text']!r}"
+            print(line)
+
+if __name__ == "__main__":
+    main()
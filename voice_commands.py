@@ -0,0 +1,185 @@
+# voice_commands.py
+
+import argparse
+import time
+from collections import namedtuple
+
+from settings import load_settings
+
+# ========================= COMMAND TABLE ========================= #
+# Each phrase maps to an action. Words in braces are slots that capture the
+# words spoken in their place, e.g. "open file {name}" heard as "open file
+# annual report" gives {"name": "annual report"}. A phrase may be spoken
+# anywhere in an utterance ("please right click" runs "right click").
+VOICE_ACTIONS = ["stop", "left_click", "right_click", "double_click", "scroll_up", "scroll_down",
+                 "close_window", "show_desktop", "open_chrome", "open_file", "open_folder", "reset_folder",
+                 "this_pc", "launch", "none"]
+HOTKEY_PREFIX = "hotkey:"
+
+DEFAULT_VOICE_COMMANDS = {
+    "stop gesture": "stop",
+    "stop program": "stop",
+    "click": "left_click",
+    "left click": "left_click",
+    "right click": "right_click",
+    "double click": "double_click",
+    "scroll up": "scroll_up",
+    "scroll down": "scroll_down",
+    "close this": "close_window",
+    "close window": "close_window",
+    "minimize": "show_desktop",
+    "show desktop": "show_desktop",
+    "open chrome": "open_chrome",
+    "open file {name}": "open_file",
+    "open folder {name}": "open_folder",
+    "go to documents": "reset_folder",
+    "reset folder": "reset_folder",
+    "launch this pc": "this_pc",
+    "launch {name}": "launch",
+}
+
+def validate_voice_commands(commands):
+    for phrase, action in commands.items():
+        if action not in VOICE_ACTIONS and not (isinstance(action, str) and action.startswith(HOTKEY_PREFIX)):
+            raise ValueError(f"unknown action {action!r} for {phrase!r}, expected one of {VOICE_ACTIONS} "
+                             f"or '{HOTKEY_PREFIX}<key>+<key>'")
+    return commands
+
+def load_voice_commands():
+    """DEFAULT_VOICE_COMMANDS overlaid with the "voice_commands" settings section."""
+    return validate_voice_commands(load_settings("voice_commands", DEFAULT_VOICE_COMMANDS))
+
+# ========================= GRAMMAR ========================= #
+CommandMatch = namedtuple("CommandMatch", ["action", "slots", "phrase"])
+
+class _Node:
+    __slots__ = ("children", "slot", "command")
+
+    def __init__(self):
+        self.children = {}
+        self.slot = None
+        self.command = None
+
+class CommandGrammar:
+    """All command phrases compiled into one word trie.
+
+    match() walks the trie from every word of the utterance, so its cost
+    depends on the utterance length and the phrase depth, not on the number
+    of commands. Of all matches the one with the most literal words wins
+    ("right click" over "click", "launch this pc" over "launch {name}"), then
+    the one covering the most words, then the earliest. Slots capture
+    as many words as the rest of their phrase allows, possibly none.
+    """
+
+    def __init__(self, commands=None):
+        self._root = _Node()
+        for phrase, action in (commands or {}).items():
+            self.add(phrase, action)
+
+    def add(self, phrase, action):
+        node = self._root
+        for word in phrase.lower().split():
+            if word.startswith("{") and word.endswith("}"):
+                if node is self._root:
+                    raise ValueError(f"{phrase!r}: a phrase must start with a word, not a slot")
+                name = word[1:-1]
+                if node.slot is None:
+                    node.slot = (name, _Node())
+                elif node.slot[0] != name:
+                    raise ValueError(f"{phrase!r}: slot {{{name}}} conflicts with {{{node.slot[0]}}} "
+                                     f"at the same position of another phrase")
+                node = node.slot[1]
+            else:
+                node = node.children.setdefault(word, _Node())
+        if node is self._root:
+            raise ValueError("empty command phrase")
+        node.command = (action, phrase)
+
+    def _walk(self, node, words, i, literals, slots):
+        """Best (literals, end, command, slots) of the matches continuing from node at word i."""
+        best = (literals, i, node.command, slots) if node.command else None
+        child = node.children.get(words[i]) if i < len(words) else None
+        if child is not None:
+            found = self._walk(child, words, i + 1, literals + 1, slots)
+            if found and (best is None or found[:2] > best[:2]):
+                best = found
+        if node.slot is not None:
+            name, slot_node = node.slot
+            for j in range(len(words), i - 1, -1):
+                found = self._walk(slot_node, words, j, literals, {**slots, name: " ".join(words[i:j])})
+                if found and (best is None or found[:2] > best[:2]):
+                    best = found
+        return best
+
+    def match(self, text):
+        """Returns the CommandMatch for an utterance, or None."""
+        words = text.lower().split()
+        best, best_key = None, None
+        for start in range(len(words)):
+            if words[start] not in self._root.children:
+                continue
+            found = self._walk(self._root.children[words[start]], words, start + 1, 1, {})
+            if found is None:
+                continue
+            key = (found[0], found[1] - start)
+            if best_key is None or key > best_key:
+                best, best_key = found, key
+        if best is None:
+            return None
+        (action, phrase), slots = best[2], best[3]
+        return CommandMatch(action, slots, phrase)
+
+    def _extendable(self, node, words, i):
+        """True when words[i:] lead from node into a phrase that more words could still extend."""
+        if i == len(words):
+            return bool(node.children) or node.slot is not None
+        child = node.children.get(words[i])
+        if child is not None and self._extendable(child, words, i + 1):
+            return True
+        # A slot can absorb the remaining words and then whatever is said next.
+        return node.slot is not None
+
+    def match_partial(self, text):
+        """Like match(), but only when no further words could change the result.
+
+        A streaming recognizer's partial hypothesis "right click" is final as far
+        as the commands go, while "open file annual" may still grow and "right"
+        may still become "right click"; those return None.
+        """
+        match = self.match(text)
+        if match is None:
+            return None
+        words = text.lower().split()
+        for start in range(len(words)):
+            node = self._root.children.get(words[start])
+            if node is not None and self._extendable(node, words, start + 1):
+                return None
+        return match
+
+    def words(self):
+        """The literal words of all phrases, e.g. to constrain a recognizer's vocabulary."""
+        words, stack = set(), [self._root]
+        while stack:
+            node = stack.pop()
+            words.update(node.children)
+            stack.extend(node.children.values())
+            if node.slot is not None:
+                stack.append(node.slot[1])
+        return sorted(words)
+
+def main():
+    parser = argparse.ArgumentParser(description="Show which voice command an utterance runs")
+    parser.add_argument("utterance", nargs="+", help="text as the recognizer would return it")
+    args = parser.parse_args()
+
+    grammar = CommandGrammar(load_voice_commands())
+    for utterance in args.utterance:
+        started = time.perf_counter()
+        match = grammar.match(utterance)
+        elapsed = (time.perf_counter() - started) * 1e6
+        early = " (fires on a partial result)" if match and grammar.match_partial(utterance) else ""
+        print(f"{utterance!r:<40} -> {match.action + ' ' + str(match.slots) if match else 'no command'} "
+              f"({elapsed:.0f}us){early}")
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,29 @@
 # voice_engine.py
 
 import speech_recognition as sr
+import itertools
 import threading
 import time
 import pyautogui
 import subprocess
 import os
 
+from app_catalog import launch_app, load_catalog
+from file_index import DEFAULT_FILE_INDEX_SETTINGS, FileIndex, default_roots
+from metrics import METRICS, STARTUP
+from settings import config_path, load_json, load_settings, save_json
+from speech_backends import (DEFAULT_SPEECH_SETTINGS, FileBackend, build_backend, microphone_chunks,
+                             silence_chunks, wav_chunks)
+from voice_activity import DEFAULT_VAD_SETTINGS, RecognitionPool, UtteranceSegmenter, build_vad
+from voice_commands import HOTKEY_PREFIX, CommandGrammar, load_voice_commands
+
+pyautogui.FAILSAFE = False
+
 # ========================= MIC SELECTION ========================= #
+# The chosen device and its calibrated energy thresholds are cached here and
+# reused on the next start as long as the device at that index keeps its name.
+CALIBRATION_PATH = config_path("voice_calibration.json")
+
 def list_input_microphones():
     mic_list = sr.Microphone.list_microphone_names()
     return list(enumerate(mic_list))
@@ -30,12 +46,21 @@ def get_preferred_microphone_index():
 
 # ========================= VOICE ENGINE ========================= #
 class VoiceEngine:
-    def __init__(self, stop_event):
+    def __init__(self, stop_event, recalibrate=False):
         self.stop_event = stop_event
         self.recognizer = sr.Recognizer()
         self.recognizer.pause_threshold = 0.8
         self.recognizer.dynamic_energy_threshold = True
-        self.mic_index = get_preferred_microphone_index()
+
+        # --- Microphone: the cached choice skips enumerating devices ---
+        calibration = {} if recalibrate else load_json(CALIBRATION_PATH, {})
+        self.calibration = calibration if isinstance(calibration, dict) else {}
+        self.mic_name = None
+        if self.calibration.get("mic_index") is not None:
+            self.mic_index = self.calibration["mic_index"]
+            print(f"[voice] Using cached mic: {self.calibration.get('mic_name')} (index {self.mic_index})")
+        else:
+            self.mic_index = get_preferred_microphone_index()
         
         # --- Define file/app paths ---
         self.user_home_dir = os.path.expanduser("~")
@@ -50,22 +75,51 @@ class VoiceEngine:
         public_desktop_path = os.path.join(os.environ.get("PUBLIC", "C:\\Users\\Public"), "Desktop")
         self.app_search_paths = [desktop_path, public_desktop_path]
 
+        # --- Command grammar and the handler for each action ---
+        self.commands = CommandGrammar(load_voice_commands())
+        self.handlers = {
+            "stop": self._stop,
+            "left_click": lambda slots: pyautogui.click(),
+            "right_click": lambda slots: pyautogui.click(button="right"),
+            "double_click": lambda slots: pyautogui.doubleClick(),
+            "scroll_up": lambda slots: pyautogui.scroll(300),
+            "scroll_down": lambda slots: pyautogui.scroll(-300),
+            "close_window": self._close_window,
+            "show_desktop": self._show_desktop,
+            "open_chrome": self._open_chrome,
+            "open_file": self._open_file,
+            "open_folder": self._open_folder,
+            "reset_folder": self._reset_folder,
+            "this_pc": self._open_this_pc,
+            "launch": lambda slots: self._find_and_launch_app(slots.get("name", "")),
+            "none": lambda slots: None,
+        }
+
+        # --- Speech backend: online utterances (google) or local streaming ---
+        self.speech_settings = load_settings("speech", DEFAULT_SPEECH_SETTINGS)
+        self.backend = build_backend(self.speech_settings, self.commands)
+        self.vad_settings = load_settings("vad", DEFAULT_VAD_SETTINGS)
+
+        # --- Launcher catalog for "launch <app>" (cached in ~/.gesture_mouse) ---
+        self.app_catalog = load_catalog()
+
+        # --- Background index for "open file" / "open folder" ---
+        index_settings = load_settings("file_index", DEFAULT_FILE_INDEX_SETTINGS)
+        self.file_index = FileIndex(index_settings["roots"] or default_roots(self.user_home_dir),
+                                    index_settings["max_depth"], index_settings["poll_interval"]).start()
+
     # --- App/Folder Helper Functions ---
     def _find_and_launch_app(self, app_name):
         if not app_name: return
-        print(f"[voice] Searching for app: '{app_name}' on Desktops...")
-        for path in self.app_search_paths:
+        matches = self.app_catalog.match(app_name)
+        if matches:
+            print(f"[voice] Found and launching: {matches[0].name} ({matches[0].target})")
             try:
-                for file in os.listdir(path):
-                    file_lower = file.lower()
-                    if app_name in file_lower and (file_lower.endswith(".lnk") or file_lower.endswith(".exe")):
-                        full_path = os.path.join(path, file)
-                        print(f"[voice] Found and launching: {full_path}")
-                        os.startfile(full_path)
-                        return
+                launch_app(matches[0])
             except Exception as e:
-                print(f"[voice] Error searching path {path}: {e}")
-        print(f"[voice] Sorry, I couldn't find an app named '{app_name}' on your desktop.")
+                print(f"[voice] Error launching {matches[0].target}: {e}")
+            return
+        print(f"[voice] Sorry, I couldn't find an app named '{app_name}'.")
 
     # --- (CHANGED) This function now returns the path of the folder it finds ---
     def _find_and_open_folder(self, folder_name):
@@ -75,126 +129,208 @@ class VoiceEngine:
             return None # Return None if no name
             
         print(f"[voice] Searching for folder: '{folder_name}'...")
-        # Search Desktop, Public Desktop, and the *current* search path
-        search_paths = self.app_search_paths + [self.current_search_path, self.documents_path]
-        search_words = folder_name.lower().split()
-        
+        item_full_path = self._lookup(folder_name, "dir")
+        if item_full_path:
+            print(f"[voice] Found and opening folder: {item_full_path}")
+            os.startfile(item_full_path)
+            self.file_index.touch(item_full_path)
+            return item_full_path # Return the path of the found folder
+
+        print(f"[voice] Sorry, I couldn't find a folder named '{folder_name}'.")
+        return None # Return None if not found
+
+    def _lookup(self, name, kind):
+        """Best indexed file or folder ("file"/"dir") for a spoken name, preferring the current folder."""
+        matches = self.file_index.search(name, kind=kind, near=self.current_search_path, limit=1)
+        if matches or self.file_index.ready.is_set():
+            return matches[0] if matches else None
+        # The first scan is still running: look directly in the folders the old search covered.
+        search_words = name.lower().split()
+        search_paths = [self.current_search_path]
+        if kind == "dir":
+            search_paths = self.app_search_paths + search_paths + [self.documents_path]
         for path in search_paths:
             try:
                 for item in os.listdir(path):
-                    item_lower = item.lower()
-                    item_full_path = os.path.join(path, item)
-                    
-                    if os.path.isdir(item_full_path) and all(word in item_lower for word in search_words):
-                        print(f"[voice] Found and opening folder: {item_full_path}")
-                        os.startfile(item_full_path)
-                        return item_full_path # Return the path of the found folder
+                    full_path = os.path.join(path, item)
+                    if os.path.isdir(full_path) == (kind == "dir") and all(w in item.lower() for w in search_words):
+                        return full_path
             except Exception as e:
                 print(f"[voice] Error searching path {path}: {e}")
-        
-        print(f"[voice] Sorry, I couldn't find a folder named '{folder_name}'.")
-        return None # Return None if not found
+        return None
+
+    # --- Command Handlers (each takes the matched slots) ---
+    def dispatch(self, cmd):
+        """Runs the command an utterance matches. Returns the CommandMatch, or None."""
+        match = self.commands.match(cmd)
+        if match is not None:
+            self.execute(match)
+        return match
+
+    def execute(self, match):
+        if match.action.startswith(HOTKEY_PREFIX):
+            pyautogui.hotkey(*match.action[len(HOTKEY_PREFIX):].split("+"))
+        else:
+            self.handlers[match.action](match.slots)
+
+    def _stop(self, slots):
+        print("[voice] Stop command received. Shutting down.")
+        self.stop_event.set()
+
+    def _close_window(self, slots):
+        print("[voice] Closing active window (Alt+F4)...")
+        pyautogui.hotkey('alt', 'f4')
+
+    def _show_desktop(self, slots):
+        print("[voice] Minimizing all windows...")
+        pyautogui.hotkey('win', 'm')
+
+    def _open_chrome(self, slots):
+        print("[voice] Opening Google Chrome...")
+        subprocess.run(['start', 'chrome'], shell=True)
+
+    def _open_file(self, slots):
+        filename = slots.get("name", "")
+        if not filename: return
+
+        # --- Ranked index lookup; files in self.current_search_path come first ---
+        print(f"[voice] Searching for file: '{filename}' near '{self.current_search_path}'")
+        try:
+            full_path = self._lookup(filename, "file")
+            if full_path:
+                print(f"[voice] Found and opening: {full_path}")
+                os.startfile(full_path)
+                self.file_index.touch(full_path)
+            else:
+                 print(f"[voice] Sorry, I couldn't find a file named '{filename}'.")
+        except Exception as e:
+            print(f"[voice] Error opening file: {e}")
+
+    def _open_folder(self, slots):
+        found_path = self._find_and_open_folder(slots.get("name", ""))
+
+        # --- This is the "memory" part ---
+        if found_path:
+            self.current_search_path = found_path
+            print(f"[voice] New search folder set to: {self.current_search_path}")
+
+    def _reset_folder(self, slots):
+        print(f"[voice] Resetting search folder to Documents.")
+        self.current_search_path = self.documents_path
+        os.startfile(self.documents_path) # Open Documents to confirm
+
+    def _open_this_pc(self, slots):
+        print("[voice] Opening This PC...")
+        subprocess.run(['explorer.exe', 'shell:MyComputerFolder'], shell=True)
+
+    # --- Microphone Calibration Cache ---
+    def _check_microphone(self, source):
+        """Runs on every opened microphone; fails if it is not the device the cached calibration was made with."""
+        audio = source.audio
+        if source.device_index is None:
+            info = audio.get_default_input_device_info()
+        else:
+            info = audio.get_device_info_by_index(source.device_index)
+        cached = self.calibration.get("mic_name")
+        if cached is not None and info["name"] != cached:
+            raise RuntimeError(f"device {self.mic_index} is now {info['name']!r}, not {cached!r}")
+        self.mic_name = info["name"]
+        STARTUP.mark("microphone opened")
+
+    def _reselect_microphone(self, error):
+        """Drops a cached microphone that failed to open and selects one again. False if nothing was cached."""
+        if not self.calibration:
+            return False
+        print(f"[voice] Cached microphone unusable ({error}); selecting one again.")
+        self.calibration = {}
+        self.mic_index = get_preferred_microphone_index()
+        return self.mic_index is not None
+
+    def _save_calibration(self, **values):
+        self.calibration.update(values, mic_index=self.mic_index, mic_name=self.mic_name)
+        try:
+            save_json(CALIBRATION_PATH, self.calibration)
+        except OSError as e:
+            print(f"[voice] Could not save microphone calibration: {e}")
+
+    def _calibrate_listener(self):
+        """Opens the microphone for the background listener and sets its energy threshold,
+        from the cache if the device is unchanged, else from 1.5 s of ambient noise."""
+        while True:
+            mic = sr.Microphone(device_index=self.mic_index)
+            try:
+                with mic as source:
+                    self._check_microphone(source)
+                    threshold = self.calibration.get("energy_threshold")
+                    if threshold:
+                        self.recognizer.energy_threshold = threshold
+                        print(f"[voice] Using cached calibration (energy threshold {threshold:.0f}). Ready. "
+                              f"(Default folder: {self.current_search_path})")
+                    else:
+                        print(f"[voice] Calibrating microphone... Please wait.")
+                        self.recognizer.adjust_for_ambient_noise(source, duration=1.5)
+                        self._save_calibration(energy_threshold=self.recognizer.energy_threshold)
+                        print(f"[voice] Microphone calibrated. Ready. (Default folder: {self.current_search_path})")
+                return mic
+            except Exception as e:
+                if not self._reselect_microphone(e):
+                    raise
+
+    def _microphone_chunks(self, rate, chunk_ms):
+        """Opens the microphone for chunked reading, selecting it again once if the cached device fails."""
+        while True:
+            if self.mic_index is None:
+                raise RuntimeError("no microphone found")
+            chunks = microphone_chunks(self.mic_index, rate, chunk_ms, check=self._check_microphone)
+            try:
+                first = next(chunks)
+            except Exception as e:
+                if not self._reselect_microphone(e):
+                    raise
+                continue
+            return itertools.chain([first], chunks)
 
     # --- Main Voice Recognition Loop ---
     def run(self):
+        if self.backend.streaming:
+            self._run_streaming()
+            return
+        if self.vad_settings["type"] != "listener":
+            self._run_segmented()
+            return
         if self.mic_index is None:
             print("[voice] No microphone found. Voice engine cannot start.")
+            self.file_index.stop()
             return
 
         try:
-            mic = sr.Microphone(device_index=self.mic_index)
-            with mic as source:
-                print(f"[voice] Calibrating microphone... Please wait.")
-                self.recognizer.adjust_for_ambient_noise(source, duration=1.5)
-                print(f"[voice] Microphone calibrated. Ready. (Default folder: {self.current_search_path})")
+            mic = self._calibrate_listener()
         except Exception as e:
             print(f"[voice] Could not open microphone: {e}")
+            self.file_index.stop()
             return
+        STARTUP.mark("voice ready")
 
         # --- Main Callback Function ---
         def callback(recognizer, audio):
+            heard_at = time.perf_counter()
+            recognized_at = None
             try:
-                cmd = recognizer.recognize_google(audio).lower()
+                cmd = self.backend.recognize(recognizer, audio).lower()
+                recognized_at = METRICS.since("voice.recognition", heard_at)
+                METRICS.count("voice.commands")
                 print(f"[voice] Heard: '{cmd}'")
                 
-                # --- System & Mouse ---
-                if "stop gesture" in cmd or "stop program" in cmd:
-                    print("[voice] Stop command received. Shutting down.")
-                    self.stop_event.set()
-                elif "click" in cmd or "left click" in cmd:
-                    pyautogui.click()
-                elif "right click" in cmd:
-                    pyautogui.click(button="right")
-                elif "double click" in cmd:
-                    pyautogui.doubleClick()
-                elif "scroll up" in cmd:
-                    pyautogui.scroll(300)
-                elif "scroll down" in cmd:
-                    pyautogui.scroll(-300)
-                elif "close this" in cmd or "close window" in cmd:
-                    print("[voice] Closing active window (Alt+F4)...")
-                    pyautogui.hotkey('alt', 'f4')
-                elif "minimize" in cmd or "show desktop" in cmd:
-                    print("[voice] Minimizing all windows...")
-                    pyautogui.hotkey('win', 'm')
-
-                # --- File/App/Folder Opening ---
-                elif "open chrome" in cmd:
-                    print("[voice] Opening Google Chrome...")
-                    subprocess.run(['start', 'chrome'], shell=True)
-                
-                # --- (CHANGED) Open File ---
-                elif "open file" in cmd:
-                    filename = cmd.replace("open file", "").strip()
-                    if not filename: return
-
-                    # --- This now uses self.current_search_path "memory" ---
-                    print(f"[voice] Searching for file: '{filename}' in '{self.current_search_path}'")
-                    try:
-                        found = False
-                        search_words = filename.lower().split()
-                        
-                        for file in os.listdir(self.current_search_path): # Uses the new path
-                            file_lower = file.lower()
-                            full_path = os.path.join(self.current_search_path, file) # Uses the new path
-                            
-                            if os.path.isfile(full_path) and all(word in file_lower for word in search_words):
-                                print(f"[voice] Found and opening: {full_path}")
-                                os.startfile(full_path) 
-                                found = True
-                                break 
-                        if not found:
-                             print(f"[voice] Sorry, I couldn't find a file named '{filename}'.")
-                    except Exception as e:
-                        print(f"[voice] Error opening file: {e}")
-
-                # --- (CHANGED) Open Folder ---
-                elif "open folder" in cmd:
-                    folder_name = cmd.replace("open folder", "").strip()
-                    found_path = self._find_and_open_folder(folder_name)
-                    
-                    # --- This is the new "memory" part ---
-                    if found_path:
-                        self.current_search_path = found_path
-                        print(f"[voice] New search folder set to: {self.current_search_path}")
-                
-                # --- (NEW) Command to reset the search path ---
-                elif "go to documents" in cmd or "reset folder" in cmd:
-                    print(f"[voice] Resetting search folder to Documents.")
-                    self.current_search_path = self.documents_path
-                    os.startfile(self.documents_path) # Open Documents to confirm
-
-                elif "launch this pc" in cmd:
-                    print("[voice] Opening This PC...")
-                    subprocess.run(['explorer.exe', 'shell:MyComputerFolder'], shell=True)
-                elif "launch" in cmd:
-                    app_name = cmd.replace("launch", "").strip()
-                    self._find_and_launch_app(app_name)
+                self.dispatch(cmd)
 
             except sr.UnknownValueError:
-                pass 
+                METRICS.count("voice.unrecognized")
             except Exception as e:
                 print(f"[voice] Callback error: {e}")
+            finally:
+                if recognized_at is not None:
+                    METRICS.since("voice.action", recognized_at)
+                    METRICS.since("voice.total", heard_at)
 
         # Start listening in the background
         stop_listening = self.recognizer.listen_in_background(mic, callback)
@@ -203,4 +339,130 @@ class VoiceEngine:
             time.sleep(0.1)
         
         stop_listening(wait_for_stop=False)
-        print("[voice] Voice engine stopped.")
\ No newline at end of file
+        self.file_index.stop()
+        print("[voice] Voice engine stopped.")
+
+    # --- Streaming Recognition Loop ---
+    def _audio_chunks(self):
+        settings = self.speech_settings
+        if settings["audio"]:
+            return wav_chunks(settings["audio"], settings["chunk_ms"], realtime=True)
+        if isinstance(self.backend, FileBackend):
+            return silence_chunks(settings["sample_rate"], settings["chunk_ms"])
+        chunks = self._microphone_chunks(settings["sample_rate"], settings["chunk_ms"])
+        self._save_calibration()
+        return chunks
+
+    def _run_streaming(self):
+        """Feeds audio chunks to a streaming backend as they are captured.
+
+        A command fires on the first partial hypothesis that matches it
+        unambiguously, without waiting for the end of the utterance; the final
+        hypothesis of that utterance is then ignored. Other utterances are
+        dispatched on their final hypothesis.
+        """
+        fired, last_partial = False, None
+        try:
+            chunks = self._audio_chunks()
+            print(f"[voice] Streaming to the {self.speech_settings['backend']} backend. Ready. "
+                  f"(Default folder: {self.current_search_path})")
+            STARTUP.mark("voice ready")
+            for chunk in chunks:
+                if self.stop_event.is_set():
+                    break
+                heard_at = time.perf_counter()
+                hypothesis = self.backend.accept(chunk)
+                if hypothesis is None:
+                    continue
+                if not hypothesis.final:
+                    if fired or hypothesis.text == last_partial:
+                        continue
+                    last_partial = hypothesis.text
+                    match = self.commands.match_partial(hypothesis.text)
+                    if match is not None:
+                        fired = True
+                        METRICS.count("voice.partial_commands")
+                        recognized_at = METRICS.since("voice.recognition", heard_at)
+                        self._run_command(hypothesis.text, match, heard_at, recognized_at)
+                    continue
+                if hypothesis.text and not fired:
+                    recognized_at = METRICS.since("voice.recognition", heard_at)
+                    self._run_command(hypothesis.text, self.commands.match(hypothesis.text), heard_at, recognized_at)
+                fired, last_partial = False, None
+        except Exception as e:
+            print(f"[voice] Could not stream audio: {e}")
+        finally:
+            self.backend.close()
+            self.file_index.stop()
+            print("[voice] Voice engine stopped.")
+
+    def _run_command(self, cmd, match, heard_at, recognized_at):
+        METRICS.count("voice.commands")
+        print(f"[voice] Heard: '{cmd}'")
+        try:
+            if match is not None:
+                self.execute(match)
+        except Exception as e:
+            print(f"[voice] Command error: {e}")
+        finally:
+            METRICS.since("voice.action", recognized_at)
+            METRICS.since("voice.total", heard_at)
+
+    # --- VAD-Segmented Recognition Loop ---
+    def _run_segmented(self):
+        """Cuts microphone audio into utterances with a frame-level VAD and recognizes them on a worker pool.
+
+        voice.endpoint times the end of speech to the end of the utterance, and
+        voice.total the end of speech to the executed command.
+        """
+        if self.mic_index is None:
+            print("[voice] No microphone found. Voice engine cannot start.")
+            self.file_index.stop()
+            return
+        settings = self.vad_settings
+        rate = self.speech_settings["sample_rate"]
+        pool = RecognitionPool(lambda utterance: self._recognize_utterance(utterance, rate), self._on_utterance,
+                               settings["workers"], settings["max_pending"], settings["max_age"]).start()
+        vad = None
+        try:
+            # A cached threshold skips the VAD's own noise calibration.
+            vad = build_vad(settings, rate, threshold=self.calibration.get("vad_threshold"))
+            segmenter = UtteranceSegmenter.from_settings(vad, settings)
+            frames = self._microphone_chunks(rate, settings["frame_ms"])
+            print(f"[voice] Listening with the {settings['type']} VAD. Ready. (Default folder: {self.current_search_path})")
+            STARTUP.mark("voice ready")
+            saved = False
+            for frame in frames:
+                if self.stop_event.is_set():
+                    break
+                utterance = segmenter.push(frame)
+                if utterance is not None:
+                    METRICS.since("voice.endpoint", utterance.speech_end_at)
+                    pool.submit(utterance)
+                if not saved and getattr(vad, "calibrated", True):
+                    self._save_calibration(vad_threshold=getattr(vad, "threshold", None))
+                    saved = True
+        except Exception as e:
+            print(f"[voice] Could not open microphone: {e}")
+        finally:
+            if self.mic_name is not None and getattr(vad, "threshold", None) is not None:
+                self._save_calibration(vad_threshold=vad.threshold)
+            pool.stop()
+            self.file_index.stop()
+            print("[voice] Voice engine stopped.")
+
+    def _recognize_utterance(self, utterance, rate):
+        started = time.perf_counter()
+        try:
+            return self.backend.recognize(self.recognizer, sr.AudioData(utterance.audio, rate, 2)).lower()
+        except sr.UnknownValueError:
+            METRICS.count("voice.unrecognized")
+        except Exception as e:
+            print(f"[voice] Recognition error: {e}")
+        finally:
+            METRICS.since("voice.recognition", started)
+        return None
+
+    def _on_utterance(self, utterance, cmd):
+        if cmd:
+            self._run_command(cmd, self.commands.match(cmd), utterance.speech_end_at, time.perf_counter())
\ No newline at end of file